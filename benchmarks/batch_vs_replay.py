@@ -0,0 +1,90 @@
+"""
+Batch-Pipeline gegen den Per-Event-Replay: Laufzeit und Gleichheit.
+
+Beide verarbeiten dieselben synthetischen Samples; verglichen werden Flow und
+Volume nach jedem Temperaturwert (müssen bit-gleich sein) sowie K am Ende.
+Zeiten: jeweils bestes von --repeat Läufen, abwechselnd gemessen.
+
+    python benchmarks/batch_vs_replay.py --days 30
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from custom_components.wasser_residuum.batch import BatchPipeline, samples_to_arrays  # noqa: E402
+from custom_components.wasser_residuum.replay import (  # noqa: E402
+    CHANNEL_TEMP,
+    ReplayClock,
+    create_controller,
+    synthetic_samples,
+)
+
+
+def run_replay(samples: list, options: dict) -> tuple[np.ndarray, np.ndarray, object]:
+    clock = ReplayClock()
+    ctrl = create_controller(options, "L", clock)
+    flow, volume = [], []
+    for ts, channel, value in samples:
+        clock.now = ts
+        if channel == CHANNEL_TEMP:
+            ctrl.process_temperature(value)
+            flow.append(ctrl._last_flow)
+            volume.append(ctrl._volume_l)
+        else:
+            ctrl.process_total(value)
+    return np.array(flow, dtype=np.float64), np.array(volume), ctrl
+
+
+def run_batch(arrays: tuple, options: dict, chunk_size: int) -> tuple[np.ndarray, np.ndarray, object]:
+    pipeline = BatchPipeline(options)
+    result = pipeline.run(*arrays, chunk_size=chunk_size)
+    return result["flow_l_min"], result["volume_l"], pipeline.ctrl
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Batch vs. Replay")
+    parser.add_argument("--days", type=float, default=30.0)
+    parser.add_argument("--interval", type=float, default=16.0, help="Sekunden zwischen Samples")
+    parser.add_argument("--seed", type=int, default=5)
+    parser.add_argument("--chunk-size", type=int, default=16384)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    samples = list(synthetic_samples(hours=args.days * 24.0, interval_s=args.interval, seed=args.seed))
+    arrays = samples_to_arrays(samples)
+    n = len(arrays[0])
+    t_replay = t_batch = float("inf")
+    for _ in range(args.repeat):
+        t, replayed = _timed(lambda: run_replay(samples, {}))
+        t_replay = min(t_replay, t)
+        t, batched = _timed(lambda: run_batch(arrays, {}, args.chunk_size))
+        t_batch = min(t_batch, t)
+
+    flow_r, volume_r, ctrl_r = replayed
+    flow_b, volume_b, ctrl_b = batched
+    same_nan = np.array_equal(np.isnan(flow_r), np.isnan(flow_b))
+    d_flow = float(np.nanmax(np.abs(flow_b - flow_r))) if n else 0.0
+    d_volume = float(np.max(np.abs(volume_b - volume_r))) if n else 0.0
+
+    print(f"{n:,} Temperaturwerte, {args.days:g} Tage, Intervall {args.interval:g} s, Chunk {args.chunk_size}")
+    print(f"Replay {t_replay:.2f} s ({n / t_replay:,.0f}/s)")
+    print(f"Batch  {t_batch:.2f} s ({n / t_batch:,.0f}/s)  → {t_replay / t_batch:.1f}x")
+    print(f"max|ΔFlow| {d_flow}  max|ΔVolume| {d_volume}  NaN gleich {same_nan}")
+    print(f"K kalt/warm: Replay {ctrl_r.k_cold:.6f}/{ctrl_r.k_warm:.6f}, Batch {ctrl_b.k_cold:.6f}/{ctrl_b.k_warm:.6f}")
+
+
+if __name__ == "__main__":
+    main()
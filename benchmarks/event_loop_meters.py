@@ -0,0 +1,100 @@
+"""
+Event-Loop-Last vieler Zähler in einem echten Home-Assistant-Core.
+
+N Controller hängen am Hub, jeder mit 15 Entity-Listenern. Pro simulierter
+Sekunde setzt ein Gateway-Burst alle Temperaturen (und alle 7 s die Zähler)
+im selben Loop-Durchlauf; gemessen wird die Loop-Zeit, bis Hub-Flush und
+Fan-out durch sind. Mit --instrumentation zusätzlich die "notify"-Stufe
+(Snapshot + Entity-Callbacks) aus den Stage-Profilern.
+
+    python benchmarks/event_loop_meters.py --meters 100 --seconds 600
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from custom_components.wasser_residuum import WasserResiduumController  # noqa: E402
+
+ENTITIES_PER_METER = 15
+
+
+async def run(meters: int, seconds: int, instrumentation: bool, seed: int) -> None:
+    hass = HomeAssistant(tempfile.mkdtemp())
+    ctrls = []
+    callbacks = 0
+
+    def on_update():
+        nonlocal callbacks
+        callbacks += 1
+
+    for i in range(meters):
+        entry = types.SimpleNamespace(
+            entry_id=f"e{i}",
+            options={"sample_cadence": 0.0, "instrumentation": instrumentation},
+            data={"temp_entity": f"sensor.t{i}", "total_entity": f"sensor.v{i}", "total_unit": "L", "name": f"W{i}"},
+        )
+        ctrl = WasserResiduumController(hass, entry)
+        for _ in range(ENTITIES_PER_METER):
+            ctrl.register_entity_listener(on_update)
+        await ctrl.async_start()
+        ctrls.append(ctrl)
+
+    rng = random.Random(seed)
+    temps = [18.0] * meters
+    totals = [1000.0] * meters
+    loop_time = 0.0
+    set_time = 0.0
+    for sec in range(seconds):
+        start = time.perf_counter()
+        for i in range(meters):
+            temps[i] += rng.gauss(0, 0.01)
+            hass.states.async_set(f"sensor.t{i}", f"{temps[i]:.3f}", force_update=True)
+            if sec % 7 == 0:
+                totals[i] += 10.0
+                hass.states.async_set(f"sensor.v{i}", f"{totals[i]:.1f}")
+        set_time += time.perf_counter() - start
+        start = time.perf_counter()
+        # State-Callbacks, Hub-Flush und Fan-out laufen in den nächsten Durchläufen
+        for _ in range(3):
+            await asyncio.sleep(0)
+        loop_time += time.perf_counter() - start
+        await asyncio.sleep(0.001)
+
+    notify = [c.profiler.stages["notify"] for c in ctrls if c.profiler is not None]
+    for ctrl in ctrls:
+        await ctrl.async_stop()
+    await hass.async_stop(force=True)
+
+    print(f"{meters} Zähler, {seconds} s, {ENTITIES_PER_METER} Entities pro Zähler")
+    print(f"Loop-Zeit {loop_time / seconds * 1e3:.2f} ms pro Sekunde "
+          f"(State-Writes des Gateways {set_time / seconds * 1e3:.2f} ms), Entity-Callbacks {callbacks:,}")
+    if notify:
+        count = sum(h.count for h in notify)
+        total = sum(h.total for h in notify)
+        worst = max(h.max for h in notify)
+        print(f"notify: {count:,} Fan-outs, Mittel {total / count * 1e6:.1f} µs, Maximum {worst * 1e6:.1f} µs")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Event-Loop-Last vieler Zähler")
+    parser.add_argument("--meters", type=int, default=100)
+    parser.add_argument("--seconds", type=int, default=600, help="simulierte Sekunden (ein Burst pro Sekunde)")
+    parser.add_argument("--instrumentation", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    asyncio.run(run(args.meters, args.seconds, args.instrumentation, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Kosten pro State-Event in einem echten Home-Assistant-Core: früheres Routing
+(zwei EVENT_STATE_CHANGED-Listener pro Eintrag, Filter auf entity_id im
+Callback) gegen das heutige (entity_id-Index über den Hub).
+
+Gemessen werden State-Änderungen fremder Entities, wie sie auf einer großen
+Instanz die Regel sind; async_set ruft die Callback-Listener direkt auf.
+
+    python benchmarks/event_routing.py --meters 1 10 100 --events 20000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from homeassistant.const import EVENT_STATE_CHANGED  # noqa: E402
+from homeassistant.core import HomeAssistant, callback  # noqa: E402
+
+from custom_components.wasser_residuum import WasserResiduumController  # noqa: E402
+
+FOREIGN_ENTITIES = 2000
+
+
+def _controllers(hass: HomeAssistant, meters: int) -> list[WasserResiduumController]:
+    ctrls = []
+    for i in range(meters):
+        entry = types.SimpleNamespace(
+            entry_id=f"e{i}",
+            options={},
+            data={"temp_entity": f"sensor.t{i}", "total_entity": f"sensor.v{i}", "total_unit": "L", "name": f"W{i}"},
+        )
+        ctrls.append(WasserResiduumController(hass, entry))
+    return ctrls
+
+
+def _listen_global(hass: HomeAssistant, ctrl: WasserResiduumController) -> list:
+    """Früheres async_start: jeder Controller filtert jedes State-Event selbst."""
+
+    @callback
+    def temp_listener(event):
+        if event.data.get("entity_id") != ctrl.temp_entity:
+            return
+        ctrl._on_temp_entity_changed(event)
+
+    @callback
+    def total_listener(event):
+        if event.data.get("entity_id") != ctrl.total_entity:
+            return
+        ctrl._on_total_entity_changed(event)
+
+    return [
+        hass.bus.async_listen(EVENT_STATE_CHANGED, temp_listener),
+        hass.bus.async_listen(EVENT_STATE_CHANGED, total_listener),
+    ]
+
+
+def _fire_foreign(hass: HomeAssistant, events: int) -> float:
+    start = time.perf_counter()
+    for i in range(events):
+        hass.states.async_set(f"sensor.other_{i % FOREIGN_ENTITIES}", str(i))
+    return (time.perf_counter() - start) / events
+
+
+async def measure(meters: int, events: int) -> tuple[float, float]:
+    hass = HomeAssistant(tempfile.mkdtemp())
+    for i in range(FOREIGN_ENTITIES):
+        hass.states.async_set(f"sensor.other_{i}", "0")
+    await hass.async_block_till_done()
+
+    ctrls = _controllers(hass, meters)
+    unsubs = [unsub for ctrl in ctrls for unsub in _listen_global(hass, ctrl)]
+    before = _fire_foreign(hass, events)
+    for unsub in unsubs:
+        unsub()
+
+    for ctrl in ctrls:
+        await ctrl.async_start()
+    after = _fire_foreign(hass, events)
+    for ctrl in ctrls:
+        await ctrl.async_stop()
+
+    await hass.async_stop(force=True)
+    return before, after
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Event-Routing: globale Listener vs. entity_id-Index")
+    parser.add_argument("--meters", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--events", type=int, default=20_000)
+    args = parser.parse_args(argv)
+
+    print(f"{FOREIGN_ENTITIES} fremde Entities, {args.events:,} State-Änderungen pro Messung")
+    for meters in args.meters:
+        before, after = asyncio.run(measure(meters, args.events))
+        print(f"{meters:>4} Einträge: vorher {before * 1e6:7.2f} µs/Event, "
+              f"nachher {after * 1e6:7.2f} µs/Event  → {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
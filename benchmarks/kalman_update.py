@@ -0,0 +1,113 @@
+"""
+Kalman pro Update: ausmultiplizierte Skalar-Version gegen die frühere NumPy-Matrix-Version.
+
+Beide filtern dieselbe Messreihe mit schwankendem dt (Funkempfang);
+verglichen werden Laufzeit von predict + update und die Schätzungen.
+Zeiten: jeweils bestes von --repeat Läufen, abwechselnd gemessen.
+
+    python benchmarks/kalman_update.py --updates 100000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from custom_components.wasser_residuum import SimpleKalman  # noqa: E402
+
+
+class MatrixKalman:
+    """Frühere Implementierung: 2x2-NumPy-Matrizen pro Aufruf (Referenz)."""
+
+    def __init__(self, init_temp=20.0):
+        self.x = np.array([init_temp, 0.0], dtype=float)
+        self.P = np.eye(2) * 1.0
+        self.Q = np.diag([0.005, 0.0005])
+        self.R = 0.08
+
+    def predict(self, dt_s):
+        if dt_s <= 0:
+            return
+        F = np.array([[1.0, dt_s], [0.0, 1.0]])
+        self.x = F @ self.x
+        self.P = F @ self.P @ F.T + self.Q
+
+    def update(self, z_temp):
+        H = np.array([[1.0, 0.0]])
+        y = z_temp - H @ self.x
+        S = (H @ self.P @ H.T + self.R).item()
+        K = (self.P @ H.T / S).ravel()
+        self.x = self.x + K * y
+        I = np.eye(2)
+        self.P = (I - np.outer(K, H)) @ self.P
+
+    def get_state(self):
+        return float(self.x[0]), float(self.x[1] * 60.0)
+
+
+def measurements(n: int, seed: int) -> list[tuple[float, float]]:
+    """(dt_s, Temperatur): 16 s ± Jitter, gelegentliche Funklücken, Rohr mit Zapfungen."""
+    rng = random.Random(seed)
+    temp = 16.0
+    out = []
+    for i in range(n):
+        dt_s = 16.0 + rng.uniform(-0.5, 0.5)
+        if rng.random() < 0.02:
+            dt_s *= rng.randint(2, 5)
+        target = 10.0 if (i // 200) % 5 == 0 else 16.0
+        temp += (target - temp) * 0.03
+        out.append((dt_s, round(temp + rng.gauss(0.0, 0.01), 2)))
+    return out
+
+
+def run(cls, data: list[tuple[float, float]]) -> tuple[float, np.ndarray]:
+    kf = cls(data[0][1])
+    states = np.empty((len(data), 2))
+    predict = kf.predict
+    update = kf.update
+    start = time.perf_counter()
+    for dt_s, z in data:
+        predict(dt_s)
+        update(z)
+    elapsed = time.perf_counter() - start
+    # Zustände in einem zweiten Lauf sammeln, damit get_state nicht mitgemessen wird
+    kf = cls(data[0][1])
+    for i, (dt_s, z) in enumerate(data):
+        kf.predict(dt_s)
+        kf.update(z)
+        states[i] = kf.get_state()
+    return elapsed, states
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Kalman-Update: Skalar vs. Matrix")
+    parser.add_argument("--updates", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    data = measurements(args.updates, args.seed)
+    t_matrix = t_scalar = float("inf")
+    for _ in range(args.repeat):
+        t, matrix = run(MatrixKalman, data)
+        t_matrix = min(t_matrix, t)
+        t, scalar = run(SimpleKalman, data)
+        t_scalar = min(t_scalar, t)
+
+    n = len(data)
+    d_temp = float(np.max(np.abs(scalar[:, 0] - matrix[:, 0])))
+    d_rate = float(np.max(np.abs(scalar[:, 1] - matrix[:, 1])))
+    print(f"{n:,} Updates (predict + update)")
+    print(f"Matrix {t_matrix / n * 1e6:.2f} µs/Update")
+    print(f"Skalar {t_scalar / n * 1e6:.2f} µs/Update  → {t_matrix / t_scalar:.1f}x")
+    print(f"max|ΔTemp| {d_temp:.3g} K  max|ΔdT/dt| {d_rate:.3g} K/min")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,203 @@
 from __future__ import annotations
 
+import base64
+import heapq
+import itertools
 import logging
+import shutil
 import time
-import numpy as np
-import statistics
-from collections import deque
+from array import array
+from dataclasses import replace
 from datetime import datetime
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant, callback, Event
-from homeassistant.const import EVENT_STATE_CHANGED, STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
 
 from .const import (
-    DOMAIN, DATA_CTRL, CONF_TEMP_ENTITY, CONF_TOTAL_ENTITY, CONF_TOTAL_UNIT,
+    DOMAIN, DATA_CTRL, CHANNEL_TEMP, CHANNEL_TOTAL, STORAGE_VERSION, STORAGE_KEY_PREFIX, CONF_TEMP_ENTITY, CONF_TOTAL_ENTITY, CONF_TOTAL_UNIT,
+    CONF_LASTSYNC_ENTITY, CONF_RSSI_ENTITY,
     CONF_K_WARM, CONF_K_COLD, CONF_T_WARM, CONF_T_COLD,
     CONF_CLIP, CONF_MAX_RES_L,
+    CONF_PUBLISH_MIN_INTERVAL, CONF_PUBLISH_HEARTBEAT, CONF_PUBLISH_DEADBAND,
+    CONF_DIAG_PUBLISH_MIN_INTERVAL, CONF_DIAG_PUBLISH_HEARTBEAT, CONF_DIAG_PUBLISH_DEADBAND,
+    CONF_INSTRUMENTATION, CONF_SAMPLE_CADENCE, CONF_IDLE_THROTTLE, CONF_JOURNAL, CONF_PROCESS_ENGINE,
+    CONF_TICK_RING_ROWS,
     DEFAULT_K_WARM, DEFAULT_K_COLD, DEFAULT_T_WARM, DEFAULT_T_COLD,
     DEFAULT_CLIP, DEFAULT_MAX_RES_L,
+    DEFAULT_PUBLISH_MIN_INTERVAL, DEFAULT_PUBLISH_HEARTBEAT, DEFAULT_PUBLISH_DEADBAND,
+    DEFAULT_DIAG_PUBLISH_MIN_INTERVAL, DEFAULT_DIAG_PUBLISH_HEARTBEAT, DEFAULT_DIAG_PUBLISH_DEADBAND,
+    DEFAULT_INSTRUMENTATION, DEFAULT_SAMPLE_CADENCE, DEFAULT_IDLE_THROTTLE, DEFAULT_JOURNAL,
+    DEFAULT_PROCESS_ENGINE, DEFAULT_TICK_RING_ROWS,
     DEFAULT_TOTAL_UNIT, PLATFORMS,
     RANGE_K,
 )
+from .decision import (
+    KMAX, KMIN, MAX_FLOW_L_MIN, decide as _decide, deep_sleep as _deep_sleep, integrate as _integrate,
+    interpolated_k as _interpolated_k, tick_flow as _tick_flow, variance_flow as _variance_flow,
+)
+from .history import async_numeric_history, state_timestamp as _state_timestamp
+from .hub import async_get_hub
+from .journal import InputJournal
+from .kfit import TickRecords, recency_weights, solve as _solve_k, temp_bin, usable as _usable_tick
+from .metrics import COUNTERS, async_register_metrics_view
+from .profiling import StageProfiler
+from .services import async_register_services, async_unregister_services
+from .snapshot import ControllerSnapshot
+from .trace import (
+    TICK_MODE_GRADIENT, TICK_MODE_IDLE, TICK_MODE_MAD_REJECTED, TICK_MODE_PLATEAU, TICK_RING_SPAN_S, TickRing,
+)
+from .stats import (
+    RingBuffer, RollingMean, RollingMedianMAD, RollingPercentile, RollingVariance,
+    SampleAggregator, TickAccumulator,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
-KMIN = float(RANGE_K.get("min", 0.5))
-KMAX = float(RANGE_K.get("max", 15.0))
+_NAN = float("nan")
+
 
 # Spezielles Limit für kalte Leitung und maximale K-Änderung pro Tick,
 # damit die Auto-Kalibrierung nachts nicht sofort auf 15 L/K hochschießt.
 KMAX_COLD = min(10.0, KMAX)
 K_ADAPT_MAX_STEP = 0.25  # max. 25 % Richtung Ziel-K pro 10L-Tick
 
+# Ab so vielen gespeicherten Tick-Records wird K per WLS über alle Records
+# gelöst statt schrittweise nachgeführt; ältere Ticks zählen weniger.
+KFIT_MIN_RECORDS = 30
+KFIT_HALF_LIFE_S = 30 * 86400.0
+KFIT_MIN_CHANGE = 0.01  # kleinere K-Änderungen nicht speichern
+KFIT_RIDGE = 0.2  # Zug zum aktuellen K, relativ zur Datenmenge
+KFIT_MAX_STEP = 0.1  # max. 10 % K-Änderung pro Neu-Lösung
+
+# Auto-kalibrierte K-Werte gesammelt speichern statt bei jedem 10L-Tick
+OPTIONS_SAVE_DELAY_S = 120.0
+
+# Journal-Puffer spätestens ab so vielen Samples schreiben (sonst mit dem Zustand)
+JOURNAL_FLUSH_RECORDS = 4096
+# Rechenrelevante Optionen im Segment-Header (Options-Key → Attribut/set_options-Argument)
+JOURNAL_OPTIONS = {
+    CONF_K_WARM: "k_warm", CONF_K_COLD: "k_cold", CONF_T_WARM: "t_warm", CONF_T_COLD: "t_cold",
+    CONF_CLIP: "clip", CONF_MAX_RES_L: "max_res_l", CONF_SAMPLE_CADENCE: "sample_cadence",
+    CONF_IDLE_THROTTLE: "idle_throttle",
+}
+
+# Nur Änderungen an diesen data-Keys erfordern ein Neuladen des Eintrags
+# (Entity-Set/Einheit); alle Options werden im laufenden Controller übernommen.
+RELOAD_DATA_KEYS = (
+    CONF_TEMP_ENTITY, CONF_TOTAL_ENTITY, CONF_TOTAL_UNIT,
+    CONF_LASTSYNC_ENTITY, CONF_RSSI_ENTITY,
+)
+
+# Persistenter Zustand (gespeichert vom Hub). Ältere Snapshots liefern nur
+# noch die langsamen Fenster (Baseline/Varianz), keinen Kalman-Zustand.
+STATE_MAX_AGE_KALMAN_S = 3600.0
+STATE_MAX_AGE_WINDOWS_S = 12 * 3600.0
+
+# Kaltstart ohne gespeicherte Fenster: so viel Temperatur-Historie aus dem Recorder
+HISTORY_PRIME_S = 12 * 3600.0
+
+# Reorder-Puffer für verspätete State-Events (Samples nach Quell-Zeitstempel)
+REORDER_MAX_SAMPLES = 32
+
+# Idle-Modus (Option idle_throttle): im Deep-Sleep nur zwei EWMAs + EWMA-Varianz pro Sample
+IDLE_ALPHA_FAST = 0.3
+IDLE_ALPHA_SLOW = 0.05
+IDLE_WAKE_DROP_K = 0.03  # schnelles EWMA so weit unter dem langsamen → aufwachen
+IDLE_WAKE_VARIANCE_RATIO = 4.0  # EWMA-Varianz / gelernte Baseline-Varianz → aufwachen
+IDLE_MIN_AWAKE_S = 600.0  # nach dem Aufwachen mindestens so lange voll rechnen
+IDLE_BASELINE_INTERVAL_S = 60.0  # Baseline-Fenster im Idle nur grob nachführen
+IDLE_NOTIFY_INTERVAL_S = 300.0  # Entities im Idle nur selten aktualisieren
+
+# Fenster für das MAD-Ausreißer-Gate auf dem baseline-korrigierten Gradienten
+MAD_WINDOW = 15
+
+# Schwellwert-Kurve für _get_dynamic_threshold (Startwerte; per sweep.py kalibrierbar)
+THRESH_TEMP_WARM = 20.0  # Ab hier normaler Schwellwert
+THRESH_TEMP_COLD = 8.0   # Ab hier maximale Sensitivität
+THRESH_WARM = -0.008  # Normaler Schwellwert bei warmem Rohr
+THRESH_COLD = -0.002  # Sensitiver Schwellwert bei kaltem Rohr
+
+def _journal_dir(hass: HomeAssistant, entry_id: str) -> str:
+    return hass.config.path(f"{DOMAIN}_journal", entry_id)
+
+
 def _m3_to_l(v: float) -> float:
     return v * 1000.0
 
 
+def _pack(values) -> str:
+    """float-Folge → base64 von float64-Bytes (kompakt statt JSON-Liste)."""
+    return base64.b64encode(array("d", values).tobytes()).decode("ascii")
+
+
+def _unpack(data: str) -> array:
+    values = array("d")
+    values.frombytes(base64.b64decode(data))
+    return values
+
+
 class SimpleKalman:
-    """1D Kalman-Filter für Temperatur + dT/dt."""
+    """
+    1D Kalman-Filter für Temperatur + dT/dt.
+
+    Konstantes-Gradient-Modell mit F = [[1, dt], [0, 1]] und H = [1, 0],
+    ausmultipliziert auf Skalare (P ist symmetrisch, daher nur p00/p01/p11).
+    Keine NumPy-Arrays pro Aufruf.
+    """
+    __slots__ = ("temp", "rate", "p00", "p01", "p11", "q_temp", "q_rate", "R")
+
     def __init__(self, init_temp=20.0):
-        self.x = np.array([init_temp, 0.0], dtype=float)
-        self.P = np.eye(2) * 1.0
-        self.Q = np.diag([0.005, 0.0005])
+        self.temp = float(init_temp)
+        self.rate = 0.0  # K/s
+        self.p00 = 1.0
+        self.p01 = 0.0
+        self.p11 = 1.0
+        self.q_temp = 0.005
+        self.q_rate = 0.0005
         self.R = 0.08
-        
+
     def predict(self, dt_s):
         if dt_s <= 0:
             return
-        F = np.array([[1.0, dt_s], [0.0, 1.0]])
-        self.x = F @ self.x
-        self.P = F @ self.P @ F.T + self.Q
-        
-    def update(self, z_temp):
-        H = np.array([[1.0, 0.0]])
-        y = z_temp - H @ self.x
-        S = (H @ self.P @ H.T + self.R).item()
-        K = (self.P @ H.T / S).ravel()
-        self.x = self.x + K * y
-        I = np.eye(2)
-        self.P = (I - np.outer(K, H)) @ self.P
-        
+        p01 = self.p01
+        p11 = self.p11
+        self.temp += dt_s * self.rate
+        # P = F P F^T + Q
+        self.p00 += dt_s * (2.0 * p01 + dt_s * p11) + self.q_temp
+        self.p01 = p01 + dt_s * p11
+        self.p11 = p11 + self.q_rate
+
+    def update(self, z_temp, n=1):
+        """Messung z_temp; bei einem Mittelwert aus n Samples Messrauschen R/n."""
+        p00 = self.p00
+        p01 = self.p01
+        s = p00 + self.R / n
+        k0 = p00 / s
+        k1 = p01 / s
+        y = z_temp - self.temp
+        self.temp += k0 * y
+        self.rate += k1 * y
+        # P = (I - K H) P
+        self.p00 = p00 - k0 * p00
+        self.p01 = p01 - k0 * p01
+        self.p11 -= k1 * p01
+
     def get_state(self):
-        temp = float(self.x[0])
-        dt_per_min = float(self.x[1] * 60.0)
-        return temp, dt_per_min
+        return self.temp, self.rate * 60.0
 
 
 class WasserResiduumController:
     """Kernlogik mit Kalman-Filter, Baseline-Korrektur, Hydrus-Fusion & Dual-K-Interpolation."""
     
-    def __init__(self, hass: HomeAssistant, entry: ConfigEntry):
+    def __init__(self, hass: HomeAssistant | None, entry: ConfigEntry, clock=time.time):
+        # hass=None + eigene clock: Offline-Replay ohne Event-Loop (siehe replay.py)
         self.hass = hass
+        self._clock = clock
         self.entry = entry
+        self._entity_config = {key: entry.data.get(key) for key in RELOAD_DATA_KEYS}
         self.temp_entity = entry.data[CONF_TEMP_ENTITY]
         self.total_entity = entry.data[CONF_TOTAL_ENTITY]
         self.total_unit = entry.data.get(CONF_TOTAL_UNIT, DEFAULT_TOTAL_UNIT).lower()
@@ -83,6 +210,68 @@ class WasserResiduumController:
 
         self.clip = entry.options.get(CONF_CLIP, DEFAULT_CLIP)
         self.max_res_l = entry.options.get(CONF_MAX_RES_L, DEFAULT_MAX_RES_L)
+
+        # Publish-Policy für die Entities (Deadband/Mindestabstand/Heartbeat)
+        self.publish_min_interval = entry.options.get(
+            CONF_PUBLISH_MIN_INTERVAL, DEFAULT_PUBLISH_MIN_INTERVAL
+        )
+        self.publish_heartbeat = entry.options.get(CONF_PUBLISH_HEARTBEAT, DEFAULT_PUBLISH_HEARTBEAT)
+        self.publish_deadband = entry.options.get(CONF_PUBLISH_DEADBAND, DEFAULT_PUBLISH_DEADBAND)
+        # Eigene Policy für die Diagnose-Sensoren (EntityCategory.DIAGNOSTIC)
+        self.diag_publish_min_interval = entry.options.get(
+            CONF_DIAG_PUBLISH_MIN_INTERVAL, DEFAULT_DIAG_PUBLISH_MIN_INTERVAL
+        )
+        self.diag_publish_heartbeat = entry.options.get(
+            CONF_DIAG_PUBLISH_HEARTBEAT, DEFAULT_DIAG_PUBLISH_HEARTBEAT
+        )
+        self.diag_publish_deadband = entry.options.get(
+            CONF_DIAG_PUBLISH_DEADBAND, DEFAULT_DIAG_PUBLISH_DEADBAND
+        )
+        self.publish_written = 0
+        self.publish_skipped = 0
+
+        # Tick-Kadenz: schnellere Samples werden gemittelt statt verworfen
+        self.sample_cadence = entry.options.get(CONF_SAMPLE_CADENCE, DEFAULT_SAMPLE_CADENCE)
+
+        # Idle-Modus: lange Zapfpausen nur mit billigem Aufwach-Detektor überbrücken
+        self.idle_throttle = entry.options.get(CONF_IDLE_THROTTLE, DEFAULT_IDLE_THROTTLE)
+        # Zwischenwerte der letzten Ticks für die Diagnose (nur mit hass; Replays haben TickTrace)
+        # Obergrenze in Zeilen (Option, 0 = aus); der Ring wächst mit der tatsächlichen Tick-Rate
+        self.tick_ring_rows = entry.options.get(CONF_TICK_RING_ROWS, DEFAULT_TICK_RING_ROWS)
+        self.tick_ring = TickRing(self.tick_ring_rows) if hass is not None and self.tick_ring_rows else None
+        # Eingangs-Journal (nur mit hass; der Replay liest Journale, schreibt keine)
+        self.journal = None
+        if hass is not None and entry.options.get(CONF_JOURNAL, DEFAULT_JOURNAL):
+            self.journal = InputJournal(_journal_dir(hass, entry.entry_id))
+        self._journal_flush_scheduled = False
+        self._idle = False
+        self._idle_fast = 0.0
+        self._idle_slow = 0.0
+        self._idle_var = 0.0
+        self._idle_last_ts = 0.0
+        self._idle_baseline_ts = 0.0
+        self._idle_notify_ts = 0.0
+        self._idle_awake_until = 0.0
+
+        # Kumulative Zähler (Prometheus-Endpunkt, Diagnose), siehe metrics.COUNTERS
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+        # Laufzeit-Messung des Hot-Paths (None = aus, kostet dann nichts)
+        self.profiler = None
+        if entry.options.get(CONF_INSTRUMENTATION, DEFAULT_INSTRUMENTATION):
+            self.profiler = StageProfiler()
+
+        # Schwellwert-Kurve (keine Option, aber vom Parameter-Sweep überschreibbar)
+        self.thresh_temp_warm = THRESH_TEMP_WARM
+        self.thresh_temp_cold = THRESH_TEMP_COLD
+        self.thresh_warm = THRESH_WARM
+        self.thresh_cold = THRESH_COLD
+        self.auto_calibrate = True  # K bei 10L-Ticks nachführen (Sweep: aus)
+
+        # Verzögertes Speichern der auto-kalibrierten Optionen
+        self._pending_options: dict = {}
+        self._persisted_options = None
+        self._unsub_options_save = None
         
         # Interne Zustände
         self._kalman = None
@@ -90,12 +279,13 @@ class WasserResiduumController:
         self._last_temp = None
         self._last_temp_relative = None
         
-        self._dt_history = deque(maxlen=15)
+        self._dt_history = RollingMedianMAD(maxlen=MAD_WINDOW)
         self._flow_active = False
         self._last_flow_time = None
         
         self._volume_l = 0.0
         self._offset_l = 0.0
+        self._restored_volume = False  # Volume via RestoreEntity übernommen
         self._volume_uncertainty = 0.0
         self._last_hydrus_total = None
         self._last_hydrus_change_time = None  # NEU: Für Hydrus-Korrelation
@@ -104,24 +294,56 @@ class WasserResiduumController:
         self._last_k_used = None
         
         # Baseline-Korrektur: 12h-Fenster für langsame Temperaturänderungen
-        self._temp_history_6h = deque(maxlen=720)
-        self._temp_history_since_tick = []
+        self._temp_history_6h = RollingPercentile(maxlen=720)
+        self._temp_since_tick = TickAccumulator()  # zeitgewichtet, O(1) Speicher
+        # Kalibrier-Records: pro 10L-Tick K=1-Volumen je Temperatur-Bin + Plateau-Volumen
+        self._tick_records = TickRecords()
+        self._tick_unit_bins: dict[int, float] = {}
+        self._tick_fixed_l = 0.0
+        # Das erste Intervall nach dem Start ist unvollständig (Volumen vor dem Start fehlt)
+        self._tick_record_partial = True
+        # Nach manueller Kalibrierung nur Records ab diesem Zeitpunkt für die Neu-Lösung
+        self._kfit_since_ts = 0.0
         self._last_temp_relative = None
 
         # Nacht-Abkühlungs-Schutz
-        self._dt_gradient_history = deque(maxlen=5)
+        self._dt_gradient_history = RingBuffer(5)
         self._last_dt_baseline_corrected = None
         self._flow_confirmation_counter = 0
         self._night_mode_active = False
 
         # Varianz-basierte Erkennung für Kalt-Wetter
-        self._temp_variance_history = deque(maxlen=30)  # 30 Sekunden Fenster
+        self._temp_variance_history = RollingVariance(maxlen=30)  # 30 Ticks, Tick-Mittelwerte
+        self._within_variance_history = RollingMean(maxlen=30)  # Varianz innerhalb der Ticks
+        self._sub_tick = SampleAggregator()  # Samples seit dem letzten Tick
         self._baseline_variance = 0.001  # Wird automatisch gelernt
+        self._variance_ratio = 0.0  # Pro Tick einmal berechnet, von Sensoren gelesen
         self._variance_flow_detected = False
         self._last_positive_flow = 3.0  # Letzter bekannter Flow für Plateau-Modus
 
-        self._remove_temp_listener = None
-        self._remove_total_listener = None
+        self._last_threshold = None  # Eintritts-Schwellwert des letzten Ticks
+
+        # Domain-Hub (Events, Speicher-Timer, gebündelte Entity-Updates); None = direkt
+        self.hub = None
+        # Prozess-Backend: Samples rechnet ein Controller-Duplikat im Worker (engine.py),
+        # dieser Controller zeigt dessen Snapshots und hält den abgeglichenen Zustand
+        self.process_engine = entry.options.get(CONF_PROCESS_ENGINE, DEFAULT_PROCESS_ENGINE)
+        self.engine_attached = False
+
+        # Samples (ts, seq, channel, value) nach Quell-Zeitstempel; einmal pro
+        # Event-Loop-Durchlauf geleert, damit Bursts zeitlich sortiert ankommen
+        self._reorder: list[tuple[float, int, int, float]] = []
+        self._reorder_seq = itertools.count()
+        self._reorder_handle = None
+        # Verarbeitungs-Zeitstempel (über beide Kanäle monoton) und Quell-Zeitstempel je Kanal
+        self._last_sample_ts = None
+        self._channel_ts: dict[int, float] = {}
+
+        self._store = None
+        if hass is not None:
+            self._store = Store(hass, STORAGE_VERSION, f"{STORAGE_KEY_PREFIX}.{entry.entry_id}")
+
+        self.snapshot = self._build_snapshot()
     
     def _get_interpolated_k(self, current_temp: float) -> float:
         """
@@ -131,33 +353,17 @@ class WasserResiduumController:
         - Unterhalb t_cold: k_cold
         - Dazwischen: lineare Interpolation
         """
-        if current_temp >= self.t_warm:
-            return self.k_warm
-        if current_temp <= self.t_cold:
-            return self.k_cold
-        
-        # Lineare Interpolation
-        temp_range = self.t_warm - self.t_cold
-        if temp_range <= 0:
-            return self.k_warm
-        
-        ratio = (current_temp - self.t_cold) / temp_range
-        k_interpolated = self.k_cold + ratio * (self.k_warm - self.k_cold)
+        return _interpolated_k(current_temp, self.k_warm, self.k_cold, self.t_warm, self.t_cold)
 
-        return max(KMIN, min(KMAX, float(k_interpolated)))
-
-    def _is_night_time(self) -> bool:
-        """Prüft ob aktuell Nacht (22:00-06:00). Strengere Schwellwerte in dieser Zeit."""
-        now = datetime.now()
+    def _is_night_time(self, ts: float | None = None) -> bool:
+        """Prüft ob Nacht (22:00-06:00) zum Zeitpunkt ts (Standard: jetzt)."""
+        now = datetime.fromtimestamp(self._clock() if ts is None else ts)
         hour = now.hour
         return hour >= 22 or hour < 6
 
-    def _is_deep_sleep_mode(self) -> bool:
+    def _is_deep_sleep_mode(self, ts: float | None = None) -> bool:
         """Prüft ob >2h keine Zapfung. Extra-strenge Schwellwerte in diesem Modus."""
-        if self._last_flow_time is None:
-            return True
-        idle_hours = (time.time() - self._last_flow_time) / 3600.0
-        return idle_hours > 2.0
+        return _deep_sleep(self._clock() if ts is None else ts, self._last_flow_time)
 
     def _get_dynamic_threshold(self, current_temp: float) -> float:
         """
@@ -168,29 +374,24 @@ class WasserResiduumController:
 
         Lösung: Sensiblerer Schwellwert bei kalten Temperaturen.
 
-        Temperatur → Schwellwert:
+        Temperatur → Schwellwert (Standardwerte, siehe THRESH_*):
         - >= 20°C (warm): -0.008 K/min (normaler Schwellwert)
         - <= 8°C (kalt):  -0.002 K/min (sehr sensitiv)
         - Dazwischen: lineare Interpolation
         """
-        TEMP_WARM = 20.0  # Ab hier normaler Schwellwert
-        TEMP_COLD = 8.0   # Ab hier maximale Sensitivität
-        THRESH_WARM = -0.008  # Normaler Schwellwert bei warmem Rohr
-        THRESH_COLD = -0.002  # Sensitiver Schwellwert bei kaltem Rohr
-
-        if current_temp >= TEMP_WARM:
-            return THRESH_WARM
-        if current_temp <= TEMP_COLD:
-            return THRESH_COLD
+        if current_temp >= self.thresh_temp_warm:
+            return self.thresh_warm
+        if current_temp <= self.thresh_temp_cold:
+            return self.thresh_cold
 
         # Lineare Interpolation
-        temp_range = TEMP_WARM - TEMP_COLD
-        ratio = (current_temp - TEMP_COLD) / temp_range
-        threshold = THRESH_COLD + ratio * (THRESH_WARM - THRESH_COLD)
+        temp_range = self.thresh_temp_warm - self.thresh_temp_cold
+        ratio = (current_temp - self.thresh_temp_cold) / temp_range
+        threshold = self.thresh_cold + ratio * (self.thresh_warm - self.thresh_cold)
 
         return threshold
 
-    def _check_variance_flow(self) -> bool:
+    def _check_variance_flow(self, current_variance: float | None) -> bool:
         """
         Varianz-basierte Flow-Erkennung für kaltes Wetter.
 
@@ -198,73 +399,29 @@ class WasserResiduumController:
         auch wenn die mittlere Temperatur sich kaum ändert.
 
         Bei kaltem Rohr ist die Varianz der einzige zuverlässige Indikator!
-        """
-        if len(self._temp_variance_history) < 10:
-            return False
-
-        # Aktuelle Varianz berechnen
-        temps = list(self._temp_variance_history)
-        current_variance = np.var(temps)
 
-        # Baseline-Varianz aktualisieren (nur wenn kein Flow aktiv)
-        if not self._flow_active and not self._variance_flow_detected:
-            # Langsam lernen: 1% Gewicht für neue Werte
-            self._baseline_variance = (
-                0.99 * self._baseline_variance + 0.01 * current_variance
-            )
-            # Minimum Baseline um Division durch 0 zu vermeiden
-            self._baseline_variance = max(0.0001, self._baseline_variance)
-
-        # Varianz-Ratio: Wie viel höher ist aktuelle Varianz vs. Baseline?
-        variance_ratio = current_variance / self._baseline_variance
-
-        # Bei kaltem Rohr (<10°C): Niedrigerer Schwellwert für Varianz-Detection
-        if self._last_temp is not None and self._last_temp < 10.0:
-            # Bei Kälte reicht 2x Baseline-Varianz
-            return variance_ratio > 2.0
-        else:
-            # Bei Wärme brauchen wir 4x Baseline (weniger Falsch-Positive)
-            return variance_ratio > 4.0
-
-    def _calculate_baseline(self) -> float:
+        current_variance: Varianz des Rohwert-Fensters, None solange < 10 Werte.
+        """
+        # Baseline-Varianz lernt nur ohne Flow; bei kaltem Rohr (<10°C) reicht 2x statt 4x
+        self._baseline_variance, self._variance_ratio, detected = _variance_flow(
+            current_variance, self._baseline_variance,
+            not self._flow_active and not self._variance_flow_detected, self._last_temp,
+        )
+        return detected
+
+    def _calculate_baseline(self, night: bool) -> float:
         """Gleitende Baseline über 12h. Nachts 1. Perzentil, tags 2. Perzentil."""
         if len(self._temp_history_6h) < 60:
             return self._last_temp if self._last_temp else 15.0
 
-        percentile = 1.0 if self._is_night_time() else 2.0
-        baseline = np.percentile(self._temp_history_6h, percentile)
-        return float(baseline)
-    
-    def _should_accept_thermal_flow(self, dt_baseline_corrected: float, dt_gradient: float = None) -> bool:
-        """
-        Gatekeeper für thermischen Flow. Berücksichtigt Hydrus-Tick-Zeit,
-        Tageszeit, Sleep-Mode und Gradient-Geschwindigkeit.
-        """
-        # Basis-Schwellwert abhängig von Zeit seit letztem Hydrus-Tick
-        if self._last_hydrus_change_time is None:
-            base_threshold = -0.10
-        else:
-            time_since_hydrus = time.time() - self._last_hydrus_change_time
-            if time_since_hydrus < 300:
-                base_threshold = -0.01
-            elif time_since_hydrus < 1800:
-                base_threshold = -0.08
-            else:
-                base_threshold = -0.20
-
-        # Deep-Sleep: minimal strengerer Schwellwert (nur 20% bei >2h Inaktivität)
-        if self._is_deep_sleep_mode():
-            base_threshold *= 1.2
-
-        # Gradient-Check: Stetige Änderungen IMMER ablehnen (Umgebungsabkühlung)
-        # Wenn d²T/dt² sehr klein ist, ist die Änderung zu konstant → Umgebung, keine Zapfung
-        if dt_gradient is not None and abs(dt_gradient) < 0.003:
-            return False
-
-        return dt_baseline_corrected < base_threshold
+        percentile = 1.0 if night else 2.0
+        return self._temp_history_6h.percentile(percentile)
     
     def set_options(self, k_warm=None, k_cold=None, t_warm=None, t_cold=None,
-                   clip=None, max_res_l=None):
+                   clip=None, max_res_l=None, publish_min_interval=None,
+                   publish_heartbeat=None, publish_deadband=None, diag_publish_min_interval=None,
+                   diag_publish_heartbeat=None, diag_publish_deadband=None, instrumentation=None,
+                   sample_cadence=None, idle_throttle=None, journal=None, tick_ring_rows=None):
         if k_warm is not None:
             self.k_warm = k_warm
         if k_cold is not None:
@@ -277,22 +434,144 @@ class WasserResiduumController:
             self.clip = clip
         if max_res_l is not None:
             self.max_res_l = max_res_l
+        if publish_min_interval is not None:
+            self.publish_min_interval = publish_min_interval
+        if publish_heartbeat is not None:
+            self.publish_heartbeat = publish_heartbeat
+        if publish_deadband is not None:
+            self.publish_deadband = publish_deadband
+        if diag_publish_min_interval is not None:
+            self.diag_publish_min_interval = diag_publish_min_interval
+        if diag_publish_heartbeat is not None:
+            self.diag_publish_heartbeat = diag_publish_heartbeat
+        if diag_publish_deadband is not None:
+            self.diag_publish_deadband = diag_publish_deadband
+        if sample_cadence is not None:
+            self.sample_cadence = sample_cadence
+        if tick_ring_rows is not None:
+            tick_ring_rows = int(tick_ring_rows)
+            self.tick_ring_rows = tick_ring_rows
+            if not tick_ring_rows:
+                self.tick_ring = None
+            elif self.tick_ring is not None:
+                self.tick_ring.set_max_rows(tick_ring_rows)
+            elif self.hass is not None:
+                self.tick_ring = TickRing(tick_ring_rows)
+        if idle_throttle is not None:
+            self.idle_throttle = idle_throttle
+            if not idle_throttle and self._idle:
+                self._wake_from_idle(self._idle_last_ts)
+        if instrumentation is not None:
+            if not instrumentation:
+                self.profiler = None
+            elif self.profiler is None:
+                self.profiler = StageProfiler()
+        if journal is not None:
+            if not journal and self.journal is not None:
+                self.hass.async_create_task(self.async_flush_journal(self.journal))
+                self.journal = None
+            elif journal and self.journal is None and self.hass is not None and not self.engine_attached:
+                self.journal = InputJournal(_journal_dir(self.hass, self.entry.entry_id))
     
-    async def _persist_options(self, new_opts: dict):
-        """Optionen im ConfigEntry speichern."""
-        data = dict(self.entry.data)
+    def apply_options(self, options) -> None:
+        """Options eines ConfigEntry im laufenden Betrieb übernehmen (ohne Reload)."""
+        # Vom Benutzer gespeicherte Werte haben Vorrang vor noch ausstehenden Auto-K-Werten
+        self._pending_options.clear()
+        self._journal_rotate()
+        self.set_options(
+            k_warm=options.get(CONF_K_WARM, DEFAULT_K_WARM),
+            k_cold=options.get(CONF_K_COLD, DEFAULT_K_COLD),
+            t_warm=options.get(CONF_T_WARM, DEFAULT_T_WARM),
+            t_cold=options.get(CONF_T_COLD, DEFAULT_T_COLD),
+            clip=options.get(CONF_CLIP, DEFAULT_CLIP),
+            max_res_l=options.get(CONF_MAX_RES_L, DEFAULT_MAX_RES_L),
+            publish_min_interval=options.get(CONF_PUBLISH_MIN_INTERVAL, DEFAULT_PUBLISH_MIN_INTERVAL),
+            publish_heartbeat=options.get(CONF_PUBLISH_HEARTBEAT, DEFAULT_PUBLISH_HEARTBEAT),
+            publish_deadband=options.get(CONF_PUBLISH_DEADBAND, DEFAULT_PUBLISH_DEADBAND),
+            diag_publish_min_interval=options.get(
+                CONF_DIAG_PUBLISH_MIN_INTERVAL, DEFAULT_DIAG_PUBLISH_MIN_INTERVAL
+            ),
+            diag_publish_heartbeat=options.get(CONF_DIAG_PUBLISH_HEARTBEAT, DEFAULT_DIAG_PUBLISH_HEARTBEAT),
+            diag_publish_deadband=options.get(CONF_DIAG_PUBLISH_DEADBAND, DEFAULT_DIAG_PUBLISH_DEADBAND),
+            instrumentation=options.get(CONF_INSTRUMENTATION, DEFAULT_INSTRUMENTATION),
+            sample_cadence=options.get(CONF_SAMPLE_CADENCE, DEFAULT_SAMPLE_CADENCE),
+            idle_throttle=options.get(CONF_IDLE_THROTTLE, DEFAULT_IDLE_THROTTLE),
+            journal=options.get(CONF_JOURNAL, DEFAULT_JOURNAL),
+            tick_ring_rows=options.get(CONF_TICK_RING_ROWS, DEFAULT_TICK_RING_ROWS),
+        )
+        self._forward("apply_options", dict(options))
+
+    def needs_reload(self, entry: ConfigEntry) -> bool:
+        """True wenn sich Entities/Einheit oder das Backend geändert haben (Neuaufbau nötig)."""
+        return (
+            any(entry.data.get(key) != self._entity_config[key] for key in RELOAD_DATA_KEYS)
+            or entry.options.get(CONF_PROCESS_ENGINE, DEFAULT_PROCESS_ENGINE) != self.process_engine
+        )
+
+    def is_own_options_update(self, entry: ConfigEntry) -> bool:
+        """True wenn die Options genau die zuletzt vom Controller gespeicherten sind."""
+        return self._persisted_options is not None and dict(entry.options) == self._persisted_options
+
+    def _schedule_persist(self, new_opts: dict) -> None:
+        """Optionen vormerken und gesammelt nach OPTIONS_SAVE_DELAY_S speichern."""
+        self._pending_options.update(new_opts)
+        if self.hass is None:
+            return
+        if self._unsub_options_save is None:
+            self._unsub_options_save = async_call_later(
+                self.hass, OPTIONS_SAVE_DELAY_S, self._async_flush_options
+            )
+
+    @callback
+    def _async_flush_options(self, _now=None) -> None:
+        """Vorgemerkte Optionen in einem Schreibvorgang in den ConfigEntry schreiben."""
+        if self._unsub_options_save is not None:
+            self._unsub_options_save()
+            self._unsub_options_save = None
+        if not self._pending_options or self.hass is None:
+            return
         options = dict(self.entry.options)
-        options.update(new_opts)
-        self.entry = self.entry.async_replace(data=data, options=options)
-        self.hass.config_entries.async_update_entry(self.entry)
+        options.update(self._pending_options)
+        self._pending_options = {}
+        self._persisted_options = options
+        self.hass.config_entries.async_update_entry(self.entry, options=options)
+
+    async def _persist_options(self, new_opts: dict):
+        """Optionen sofort im ConfigEntry speichern."""
+        self._pending_options.update(new_opts)
+        self._async_flush_options()
     
     async def async_set_k_warm(self, new_k: float):
         self.k_warm = new_k
+        self._journal_rotate()
+        self._forward("set_options", k_warm=new_k)
         await self._persist_options({CONF_K_WARM: new_k})
 
     async def async_set_k_cold(self, new_k: float):
         self.k_cold = new_k
+        self._journal_rotate()
+        self._forward("set_options", k_cold=new_k)
         await self._persist_options({CONF_K_COLD: new_k})
+
+    async def async_apply_calibration(self, values: dict) -> None:
+        """
+        K/T-Werte (Options-Keys) gemeinsam übernehmen und in einem Schreibvorgang
+        speichern. Die automatische Nachführung pausiert, bis KFIT_MIN_RECORDS
+        neue Tick-Records vorliegen, und löst dann nur über diese.
+        """
+        self.apply_calibration(values, self._clock())
+        await self._persist_options(values)
+        self._notify_entities()
+
+    def apply_calibration(self, values: dict, since_ts: float) -> None:
+        """K/T-Werte übernehmen; die Neu-Lösung nutzt danach nur Records ab since_ts."""
+        self._kfit_since_ts = since_ts
+        self.set_options(
+            k_warm=values.get(CONF_K_WARM), k_cold=values.get(CONF_K_COLD),
+            t_warm=values.get(CONF_T_WARM), t_cold=values.get(CONF_T_COLD),
+        )
+        self._journal_rotate()
+        self._forward("apply_calibration", values, since_ts)
     
     @property
     def residuum_l(self) -> float:
@@ -327,6 +606,22 @@ class WasserResiduumController:
     def last_k_eff(self) -> float | None:
         return self._last_k_used
 
+    @property
+    def last_hydrus_total_l(self) -> float | None:
+        """Letzter Zählerstand in L (None vor dem ersten Wert)."""
+        return self._last_hydrus_total
+
+    @property
+    def tick_record_count(self) -> int:
+        """Gespeicherte Kalibrier-Records (Diagnose)."""
+        return len(self._tick_records)
+
+    def export_tick_ring(self, span_s: float = TICK_RING_SPAN_S) -> dict | None:
+        """Diagnose-Ring der letzten span_s Sekunden als NumPy-Spalten (Kopie, im Event-Loop aufrufen); None wenn aus."""
+        if self.tick_ring is None:
+            return None
+        return self.tick_ring.export(self._clock() - span_s)
+
     @property
     def night_mode_active(self) -> bool:
         """Gibt zurück ob Nacht-Modus aktiv ist."""
@@ -344,40 +639,32 @@ class WasserResiduumController:
 
     @property
     def current_variance_ratio(self) -> float:
-        """Aktuelles Verhältnis Varianz / Baseline-Varianz."""
-        if len(self._temp_variance_history) < 10 or self._baseline_variance < 0.0001:
-            return 0.0
-        temps = list(self._temp_variance_history)
-        current_variance = np.var(temps)
-        return current_variance / self._baseline_variance
+        """Verhältnis Varianz / Baseline-Varianz aus dem letzten Tick."""
+        return self._variance_ratio
 
     def reset_residuum(self) -> None:
         """Manueller Reset: Setzt Offset auf aktuelles Volume."""
         self._offset_l = self._volume_l
         self._volume_uncertainty = 0.0
+        self._journal_rotate()
+        self._forward("reset_residuum")
         _LOGGER.info("Residuum manuell zurückgesetzt: Offset = %.3f L", self._offset_l)
         self._notify_entities()
 
     def _integrate(self, flow_l_min: float, dt_s: float):
-        if dt_s <= 0:
-            return
-        delta_volume = flow_l_min * (dt_s / 60.0)
-        self._volume_l += delta_volume
-        self._volume_uncertainty += abs(delta_volume * 0.12)
-
-        # Volume darf nicht negativ sein
-        if self._volume_l < 0:
-            self._volume_l = 0.0
-
         # Volume darf nicht mehr als max_res_l über Hydrus-Total liegen (10L Obergrenze)
         # Der Wasserzähler ist der harte Kontrolleur, nicht der Offset!
-        if self._last_hydrus_total is not None:
-            max_volume_allowed = self._last_hydrus_total + self.max_res_l
-            if self._volume_l > max_volume_allowed:
-                self._volume_l = max_volume_allowed
+        cap = None if self._last_hydrus_total is None else self._last_hydrus_total + self.max_res_l
+        self._volume_l, self._volume_uncertainty = _integrate(
+            self._volume_l, self._volume_uncertainty, flow_l_min, dt_s, cap,
+        )
     
     def _convert_total_to_l(self, val: float) -> float:
         return _m3_to_l(val) if self.total_unit == "m3" else float(val)
+
+    def total_to_l(self, val: float) -> float:
+        """Zählerwert in der Einheit der Total-Entity → L."""
+        return self._convert_total_to_l(val)
     
     def _guard_offset(self):
         """Offset darf NIEMALS über Hydrus-Total liegen (Wasserzähler ist Master)."""
@@ -389,20 +676,33 @@ class WasserResiduumController:
     
     @callback
     def _on_total_entity_changed(self, event: Event) -> None:
-        if event.data.get("entity_id") != self.total_entity:
-            return
+        self.counters["events_received"] += 1
         new_state = event.data.get("new_state")
         if not new_state or new_state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN):
             return
         try:
-            now_total_l = self._convert_total_to_l(float(new_state.state))
+            total = float(new_state.state)
         except (ValueError, TypeError):
             return
-        
+        self._enqueue_sample(_state_timestamp(new_state), CHANNEL_TOTAL, total)
+
+    def process_total(self, total: float, ts: float | None = None) -> None:
+        """Neuer Wasserzähler-Stand (in total_unit) zum Zeitpunkt ts (Standard: self._clock())."""
+        self._apply_total(total, self._clock() if ts is None else ts)
+        self._notify_entities()
+
+    def _apply_total(self, total: float, now_ts: float) -> None:
+        """Zählerstand verarbeiten (10L-Tick, Sync, Auto-Kalibrierung), ohne Entity-Update."""
+        now_total_l = self._convert_total_to_l(total)
+
+        # Zählerwechsel weckt den Idle-Modus sofort
+        if self._idle and now_total_l != self._last_hydrus_total:
+            self._wake_from_idle(self._idle_last_ts)
+
         # Erste Initialisierung
         if self._last_hydrus_total is None:
             # Wenn Volume vom Sensor bereits restauriert wurde, NICHT überschreiben.
-            if getattr(self, "_restored_volume", False):
+            if self._restored_volume:
                 self._last_hydrus_total = now_total_l  # nur Referenz setzen
                 self._guard_offset()
             else:
@@ -416,11 +716,26 @@ class WasserResiduumController:
         if self._last_hydrus_total is not None:
             delta_l = now_total_l - self._last_hydrus_total
             if 9.5 <= delta_l <= 10.5:
+                self.counters["hydrus_ticks"] += 1
                 thermal_measured = self.residuum_l
 
-                # Auto-Kalibrierung: Nur bei plausiblen Werten, begrenzte Änderung
-                if thermal_measured > 1.0 and len(self._temp_history_since_tick) > 0:
-                    avg_temp = np.mean(self._temp_history_since_tick)
+                if not self._tick_record_partial and self._temp_since_tick.count > 0 and _usable_tick(
+                    self._tick_unit_bins, self._tick_fixed_l, delta_l
+                ):
+                    duration = now_ts - self._last_hydrus_change_time if self._last_hydrus_change_time else 0.0
+                    self._tick_records.append(
+                        now_ts, duration, self._temp_since_tick.mean,
+                        self._tick_fixed_l, delta_l, self._tick_unit_bins,
+                    )
+
+                if self.auto_calibrate and self._tick_records.count_since(self._kfit_since_ts) >= KFIT_MIN_RECORDS:
+                    self._refit_k(now_ts)
+
+                # Auto-Kalibrierung bis genug Records da sind: begrenzte Änderung pro Tick
+                # (nach manueller Kalibrierung pausiert, bis genug neue Records vorliegen)
+                elif (self.auto_calibrate and not self._kfit_since_ts
+                      and thermal_measured > 1.0 and self._temp_since_tick.count > 0):
+                    avg_temp = self._temp_since_tick.mean
 
                     if 4.0 <= thermal_measured <= 16.0:
                         raw_correction = 10.0 / thermal_measured
@@ -439,9 +754,8 @@ class WasserResiduumController:
                                 "(thermal: %.1f L, corr=%.3f)",
                                 old, self.k_warm, avg_temp, thermal_measured, correction
                             )
-                            self.hass.async_create_task(
-                                self._persist_options({CONF_K_WARM: self.k_warm})
-                            )
+                            self.counters["auto_calibrations"] += 1
+                            self._schedule_persist({CONF_K_WARM: self.k_warm})
 
                         elif avg_temp <= self.t_cold:
                             old = self.k_cold
@@ -451,19 +765,19 @@ class WasserResiduumController:
                                 "(thermal: %.1f L, corr=%.3f, limit=%.1f)",
                                 old, self.k_cold, avg_temp, thermal_measured, correction, KMAX_COLD
                             )
-                            self.hass.async_create_task(
-                                self._persist_options({CONF_K_COLD: self.k_cold})
-                            )
+                            self.counters["auto_calibrations"] += 1
+                            self._schedule_persist({CONF_K_COLD: self.k_cold})
 
                 # Reset Residuum und Tracking
                 # WICHTIG: Offset = Hydrus-Total (nicht Volume!), damit keine Drift entsteht
                 self._offset_l = now_total_l
                 self._volume_l = now_total_l  # Volume auch auf Hydrus setzen für sauberen Reset
                 self._volume_uncertainty = 0.0
-                self._last_hydrus_change_time = time.time()
-                self._temp_history_since_tick = []
+                self._last_hydrus_change_time = now_ts
+                self._temp_since_tick.reset()
 
             elif 10.5 < delta_l <= 100.0:
+                self.counters["offline_syncs"] += 1
                 # Moderater Sprung (z.B. nach Offline-Zeit) → Sync zu Hydrus
                 _LOGGER.info(
                     "Hydrus Sprung %.1f L erkannt (Offline?), synchronisiere Volume: %.1f → %.1f",
@@ -472,8 +786,9 @@ class WasserResiduumController:
                 self._offset_l = now_total_l
                 self._volume_l = now_total_l
                 self._volume_uncertainty = 0.0
-                self._temp_history_since_tick = []
+                self._temp_since_tick.reset()
             elif delta_l > 100.0:
+                self.counters["large_jumps"] += 1
                 # Riesiger Sprung → wahrscheinlich Fehler/Zählerwechsel, NICHT auto-sync
                 _LOGGER.warning(
                     "Hydrus Riesen-Sprung %.1f L! Kein Auto-Sync (evtl. Zählerwechsel?). "
@@ -483,14 +798,45 @@ class WasserResiduumController:
             elif delta_l < -0.1:
                 _LOGGER.warning("Hydrus Rückwärts: %.3f → %.3f", 
                                self._last_hydrus_total, now_total_l)
-        
+
+        if now_total_l != self._last_hydrus_total:
+            # Jeder Zählerwechsel beginnt ein neues Record-Intervall
+            self._tick_unit_bins = {}
+            self._tick_fixed_l = 0.0
+            # Ab dem ersten Zählerwert läuft das Intervall unbeobachtet an → erst danach vollständig
+            self._tick_record_partial = self._last_hydrus_total is None
         self._last_hydrus_total = now_total_l
-        self._notify_entities()
+
+    def _refit_k(self, now_ts: float) -> None:
+        """k_cold/k_warm per WLS über alle Tick-Records (Schwellen fest, neuere Ticks stärker)."""
+        ts, x, y = self._tick_records.design(self.t_cold, self.t_warm, self._kfit_since_ts)
+        k_cold, k_warm, rmse = _solve_k(
+            x, y, self.k_cold, self.k_warm,
+            (KMIN, KMAX_COLD, KMAX), recency_weights(ts, now_ts, KFIT_HALF_LIFE_S), KFIT_RIDGE,
+        )
+
+        def _step(old_k: float, new_k: float) -> float:
+            return max(old_k * (1.0 - KFIT_MAX_STEP), min(old_k * (1.0 + KFIT_MAX_STEP), new_k))
+
+        k_cold, k_warm = _step(self.k_cold, k_cold), _step(self.k_warm, k_warm)
+        changed = {}
+        if abs(k_cold - self.k_cold) >= KFIT_MIN_CHANGE:
+            changed[CONF_K_COLD] = k_cold
+        if abs(k_warm - self.k_warm) >= KFIT_MIN_CHANGE:
+            changed[CONF_K_WARM] = k_warm
+        if not changed:
+            return
+        _LOGGER.info(
+            "K per WLS neu gelöst aus %d Ticks: K-kalt %.2f → %.2f, K-warm %.2f → %.2f (RMSE %.2f L)",
+            len(y), self.k_cold, k_cold, self.k_warm, k_warm, rmse,
+        )
+        self.k_cold, self.k_warm = k_cold, k_warm
+        self.counters["auto_calibrations"] += 1
+        self._schedule_persist(changed)
     
     @callback
     def _on_temp_entity_changed(self, event: Event) -> None:
-        if event.data.get("entity_id") != self.temp_entity:
-            return
+        self.counters["events_received"] += 1
         new_state = event.data.get("new_state")
         if not new_state or new_state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN):
             return
@@ -498,8 +844,65 @@ class WasserResiduumController:
             raw_temp = float(new_state.state)
         except (ValueError, TypeError):
             return
-        
-        now_ts = time.time()
+        sample_ts = _state_timestamp(new_state)
+        if self.profiler is not None:
+            # Verzögerung State-Write → Callback (Event-Loop-Last)
+            self.profiler.loop_lag.add(self._clock() - sample_ts)
+        self._enqueue_sample(sample_ts, CHANNEL_TEMP, raw_temp)
+
+    def _enqueue_sample(self, ts: float, channel: int, value: float) -> None:
+        """
+        Sample mit Quell-Zeitstempel einreihen. Verarbeitet wird sortiert im
+        nächsten Event-Loop-Durchlauf; Samples älter als das zuletzt verarbeitete
+        desselben Kanals werden verworfen (gezählt), bei vollem Puffer rückt das
+        älteste sofort nach.
+        """
+        last = self._channel_ts.get(channel)
+        if last is not None and ts < last:
+            self.counters["late_samples"] += 1
+            return
+        heapq.heappush(self._reorder, (ts, next(self._reorder_seq), channel, value))
+        if len(self._reorder) > REORDER_MAX_SAMPLES:
+            self._process_sample(*heapq.heappop(self._reorder))
+        if self.hub is not None:
+            self.hub.schedule_drain(self)
+        elif self._reorder_handle is None:
+            self._reorder_handle = self.hass.loop.call_soon(self._drain_samples)
+
+    @callback
+    def _drain_samples(self) -> None:
+        self._reorder_handle = None
+        while self._reorder:
+            self._process_sample(*heapq.heappop(self._reorder))
+
+    def _process_sample(self, ts: float, _seq: int, channel: int, value: float) -> None:
+        self._channel_ts[channel] = ts
+        last = self._last_sample_ts
+        if last is not None and ts < last:
+            # Nur gegenüber dem anderen Kanal zu spät (z.B. Zählerstand hinter einem
+            # Temperatur-Burst): zum letzten Zeitpunkt rechnen statt verwerfen
+            self.counters["late_clamped"] += 1
+            ts = last
+        self._last_sample_ts = ts
+        if self.engine_attached:
+            self.hub.engine_submit(self, ts, channel, value)
+            return
+        journal = self.journal
+        if journal is not None:
+            if journal.needs_segment:
+                journal.start_segment(ts, self.journal_header())
+            journal.append(ts, channel, value)
+            if journal.pending >= JOURNAL_FLUSH_RECORDS and not self._journal_flush_scheduled:
+                self._journal_flush_scheduled = True
+                self.hass.async_create_task(self.async_flush_journal())
+        if channel == CHANNEL_TEMP:
+            self.process_temperature(value, ts)
+        else:
+            self.process_total(value, ts)
+
+    def process_temperature(self, raw_temp: float, ts: float | None = None) -> None:
+        """Neue Rohrtemperatur zum Zeitpunkt ts (Standard: self._clock()) durch die Pipeline schicken."""
+        now_ts = self._clock() if ts is None else ts
         self._last_temp = raw_temp
         
         if self._kalman is None:
@@ -508,25 +911,139 @@ class WasserResiduumController:
             self._last_temp_relative = 0.0
             self._notify_entities()
             return
-        
+
+        if self._idle and self._idle_sample(raw_temp, now_ts):
+            return
+
+        prof = self.profiler
         dt_s = now_ts - self._last_ts
-        if dt_s < 1.0:
+        sub_tick = self._sub_tick
+        sub_tick.add(raw_temp)
+        if dt_s < self.sample_cadence:
+            # Schnelle Sensoren: Sample in den nächsten Tick mitteln
+            self.counters["samples_aggregated"] += 1
             return
-        
+
+        if prof is not None:
+            t = time.perf_counter()
+
+        # Tick-Wert: Mittel aller Samples seit dem letzten Tick (bei einem Sample = Rohwert)
+        n_samples = sub_tick.count
+        tick_temp = sub_tick.mean
+        within_variance = sub_tick.variance
+        sub_tick.reset()
+
         self._kalman.predict(dt_s)
-        self._kalman.update(raw_temp)
+        self._kalman.update(tick_temp, n_samples)
         filt_temp, dt_per_min = self._kalman.get_state()
+        if prof is not None:
+            t = prof.lap("kalman", t)
 
-        # Speichere für Baseline und Auto-Kalibrierung
+        # Baseline-Fenster
         self._temp_history_6h.append(filt_temp)
-        self._temp_history_since_tick.append(filt_temp)
+        night = self._is_night_time(now_ts)
+        baseline = self._calculate_baseline(night)
+        if prof is not None:
+            t = prof.lap("baseline", t)
+
+        # Varianz-Fenster: Varianz der Tick-Mittel + mittlere Varianz innerhalb der Ticks
+        # (Gesamtvarianz der Rohwerte, unabhängig von der Sensor-Rate)
+        self._temp_variance_history.append(tick_temp)
+        self._within_variance_history.append(within_variance)
+        if len(self._temp_variance_history) >= 10:
+            current_variance = (
+                self._temp_variance_history.variance + self._within_variance_history.mean
+            )  # Laufsummen, keine Kopie
+        else:
+            current_variance = None
+        if prof is not None:
+            prof.lap("variance", t)
+
+        if self._evaluate_tick(now_ts, dt_s, filt_temp, baseline, current_variance, night):
+            if self.idle_throttle:
+                self._maybe_enter_idle(now_ts, filt_temp, current_variance)
+            self._notify_entities()
+
+    def _maybe_enter_idle(self, now_ts: float, filt_temp: float, current_variance: float | None) -> None:
+        """Idle-Modus nur im Deep-Sleep, ohne laufenden Flow und mit voller Baseline."""
+        if (
+            self._flow_active
+            or self._flow_confirmation_counter
+            or now_ts < self._idle_awake_until
+            or current_variance is None
+            or len(self._temp_history_6h) < self._temp_history_6h.maxlen
+            or not self._is_deep_sleep_mode(now_ts)
+        ):
+            return
+        self._idle = True
+        self._idle_fast = filt_temp
+        self._idle_slow = filt_temp
+        self._idle_var = current_variance
+        self._idle_last_ts = now_ts
+        self._idle_baseline_ts = now_ts
+        self._idle_notify_ts = now_ts
+        _LOGGER.debug("Idle-Modus aktiv (%.1f h ohne Flow)", (now_ts - (self._last_flow_time or now_ts)) / 3600.0)
+
+    def _idle_sample(self, raw_temp: float, now_ts: float) -> bool:
+        """
+        Aufwach-Detektor im Idle-Modus: schnelles/langsames EWMA und EWMA-Varianz.
+        True = weiter idle; False = aufgewacht, Sample läuft durch die volle Pipeline.
+        """
+        self.counters["idle_samples"] += 1
+        fast = self._idle_fast + IDLE_ALPHA_FAST * (raw_temp - self._idle_fast)
+        slow = self._idle_slow + IDLE_ALPHA_SLOW * (raw_temp - self._idle_slow)
+        dev = raw_temp - fast
+        self._idle_var += IDLE_ALPHA_FAST * (dev * dev - self._idle_var)
+
+        if slow - fast > IDLE_WAKE_DROP_K or self._idle_var > IDLE_WAKE_VARIANCE_RATIO * self._baseline_variance:
+            self._wake_from_idle(self._idle_last_ts)
+            return False
+
+        self._idle_fast = fast
+        self._idle_slow = slow
+        self._idle_last_ts = now_ts
+        if now_ts - self._idle_baseline_ts >= IDLE_BASELINE_INTERVAL_S:
+            # Umgebungsdrift weiter in die Baseline, aber nur grob
+            self._temp_history_6h.append(slow)
+            self._idle_baseline_ts = now_ts
+        if now_ts - self._idle_notify_ts >= IDLE_NOTIFY_INTERVAL_S:
+            self._idle_notify_ts = now_ts
+            self._notify_entities()
+        return True
+
+    def _wake_from_idle(self, last_idle_ts: float) -> None:
+        """Volle Pipeline wieder aufnehmen; Kalman und Gradient ab dem EWMA neu aufsetzen."""
+        self._idle = False
+        self._idle_awake_until = last_idle_ts + IDLE_MIN_AWAKE_S
+        self.counters["idle_wakeups"] += 1
+        self._kalman = SimpleKalman(init_temp=self._idle_fast)
+        self._last_ts = last_idle_ts
+        # Gradient relativ zum Stand vor dem Abfall, damit der erste Tick ihn voll sieht
+        baseline = self._calculate_baseline(self._is_night_time(last_idle_ts))
+        self._last_temp_relative = self._idle_fast - baseline
+        self._last_dt_baseline_corrected = 0.0
+        self._sub_tick.reset()
+        _LOGGER.debug("Idle-Modus beendet")
+
+    def _evaluate_tick(self, now_ts: float, dt_s: float, filt_temp: float, baseline: float,
+                       current_variance: float | None, night: bool) -> bool:
+        """
+        Sequenzieller Teil eines Ticks: Gradient, MAD-Gate, Flow-Entscheidung, Integration.
+
+        Kalman, Baseline und Fenster-Varianz sind schon berechnet (Streaming oder
+        Batch, siehe batch.py). False, wenn der Tick vom MAD-Gate verworfen wurde.
+        """
+        prof = self.profiler
+        if prof is not None:
+            t = time.perf_counter()
+
+        # Speichere für Auto-Kalibrierung
+        self._temp_since_tick.add(filt_temp, dt_s)
 
         # Varianz-basierte Erkennung (besonders wichtig bei kaltem Wetter)
-        self._temp_variance_history.append(raw_temp)
-        self._variance_flow_detected = self._check_variance_flow()
+        self._variance_flow_detected = self._check_variance_flow(current_variance)
 
         # Baseline-Korrektur
-        baseline = self._calculate_baseline()
         temp_relative = filt_temp - baseline
 
         # Baseline-korrigierter Gradient
@@ -549,165 +1066,531 @@ class WasserResiduumController:
         # Historie für MAD-Clipping
         self._dt_history.append(dt_baseline_corrected)
         if len(self._dt_history) >= 5:
-            median_dt = statistics.median(self._dt_history)
-            mad = statistics.median([abs(x - median_dt) for x in self._dt_history]) or 0.0001
+            median_dt, mad = self._dt_history.median_mad()
+            mad = mad or 0.0001
             z_score = (dt_baseline_corrected - median_dt) / (1.4826 * mad)
             if abs(z_score) > 6.0:
-                return
-        
-        # Adaptive Schwellwerte - temperaturabhängig für bessere Kalt-Erkennung
-        # Bei kaltem Rohr (<10°C) ist der Temperaturabfall beim Zapfen minimal
-        # → sensiblerer Schwellwert nötig
-        threshold_enter = self._get_dynamic_threshold(filt_temp)
-        threshold_exit = threshold_enter * 0.33  # Exit bei 1/3 des Enter-Schwellwerts
+                self.counters["mad_rejections"] += 1
+                if self.tick_ring is not None:
+                    self._record_tick(now_ts, filt_temp, baseline, dt_baseline_corrected, dt_gradient,
+                                      _NAN, _NAN, TICK_MODE_MAD_REJECTED, _NAN, _NAN)
+                if prof is not None:
+                    prof.lap("mad_gate", t)
+                return False
+        if prof is not None:
+            t = prof.lap("mad_gate", t)
 
         # Nacht-Modus: nur für Diagnostik
-        self._night_mode_active = self._is_night_time()
-
-        # Deep-Sleep: minimal strengerer Schwellwert (nur 20% strenger bei >2h Inaktivität)
-        if self._is_deep_sleep_mode():
-            threshold_enter *= 1.2
-            threshold_exit *= 1.2
-
-        # Gradient-basierte Erkennung
-        gradient_flow_detected = dt_baseline_corrected < threshold_enter
-
-        # Schutz gegen langsames Abkühlen (Nacht/Tag):
-        # Bei kaltem Rohr und sensiblem Schwellwert MUSS Varianz erhöht sein
-        # Sonst: Langsame, stetige Änderung = Umgebungstemperatur, nicht Zapfung
-        if filt_temp < 10.0:
-            # Kalt-Modus: Gradient allein reicht NICHT
-            # Gradient muss DEUTLICH unter Schwellwert sein (-3x) ODER Varianz muss erhöht sein
-            strong_gradient = dt_baseline_corrected < (threshold_enter * 3.0)  # z.B. < -0.006
-
-            if strong_gradient:
-                # Starker Gradient: Fast sicher Zapfung
-                flow_detected = True
-            elif gradient_flow_detected and self._variance_flow_detected:
-                # Schwacher Gradient + erhöhte Varianz: Wahrscheinlich Zapfung
-                flow_detected = True
-            elif self._variance_flow_detected and dt_baseline_corrected < 0:
-                # Nur Varianz erhöht + negative Temperaturänderung: Möglich
-                flow_detected = True
-            else:
-                # Nur schwacher Gradient ohne Varianz-Bestätigung: Wahrscheinlich Abkühlung
-                flow_detected = False
-        else:
-            # Warm: Nur Gradient (Varianz zu unzuverlässig bei großen Temperaturänderungen)
-            flow_detected = gradient_flow_detected
-
-        # Flow-Konsistenz: Mindestens 3 aufeinanderfolgende Messungen
-        if flow_detected:
-            self._flow_confirmation_counter += 1
-        else:
-            self._flow_confirmation_counter = 0
-
-        flow_confirmed = self._flow_confirmation_counter >= 3
-
-        if (flow_detected and flow_confirmed) or self._flow_active:
-            if not self._flow_active and flow_confirmed:
-                self._flow_active = True
-                _LOGGER.info("Flow gestartet")
-
-            # Flow beenden NUR wenn:
-            # 1. Kein Flow mehr erkannt UND
-            # 2. Temperatur steigt aktiv (Rohr erwärmt sich) UND
-            # 3. Varianz ist NICHT erhöht (sonst läuft noch Wasser!)
-            temp_rising = dt_baseline_corrected > 0.001  # Aktiv erwärmend
-            variance_low = not self._variance_flow_detected
-
-            if not flow_detected and temp_rising and variance_low:
-                self._flow_active = False
-                self._flow_confirmation_counter = 0
-                _LOGGER.info("Flow beendet (Temp steigt, Varianz niedrig)")
-
-            if self._flow_active and self._should_accept_thermal_flow(dt_baseline_corrected, dt_gradient):
-                if dt_baseline_corrected < -self.clip:
-                    dt_clipped = -self.clip
-                else:
-                    dt_clipped = dt_baseline_corrected
-            else:
-                dt_clipped = 0.0
-        else:
-            dt_clipped = 0.0
-
-        # Berechne Flow-Rate
+        self._night_mode_active = night
+
+        # Adaptive Schwellwerte (bei kaltem Rohr sensibler), Bestätigung, Start/Ende,
+        # Gatekeeper und Clip: decision.decide, dieselbe Funktion wie in batch.py
+        dt_clipped, threshold_enter, self._flow_confirmation_counter, self._flow_active, transition = _decide(
+            now_ts, dt_baseline_corrected, dt_gradient, filt_temp, self._get_dynamic_threshold(filt_temp),
+            self._variance_flow_detected, self._flow_confirmation_counter, self._flow_active,
+            self._last_flow_time, self._last_hydrus_change_time, self.clip,
+        )
+        threshold_exit = threshold_enter * 0.33  # Exit bei 1/3 des Enter-Schwellwerts (Diagnose)
+        self._last_threshold = threshold_enter
+        if transition > 0:
+            self.counters["flow_starts"] += 1
+            _LOGGER.info("Flow gestartet")
+        elif transition < 0:
+            self.counters["flow_stops"] += 1
+            _LOGGER.info("Flow beendet (Temp steigt, Varianz niedrig)")
+
+        if prof is not None:
+            t = prof.lap("decision", t)
+
+        # Berechne Flow-Rate: Gradient → Flow, sonst Plateau (Temperatur stabil, Varianz hoch)
         k_adaptive = self._get_interpolated_k(filt_temp)
         self._last_k_used = k_adaptive
-
-        if dt_clipped < 0.0:
-            # Normale Berechnung: Gradient → Flow
-            self._last_flow_time = now_ts
-            flow_l_min = k_adaptive * (-dt_clipped)
-
-        elif self._flow_active and self._variance_flow_detected:
-            # WICHTIG: Temperatur stabil aber Varianz hoch → Wasser läuft noch!
-            # Schätze Flow basierend auf letztem bekannten Wert oder Minimum
-            self._last_flow_time = now_ts
-            # Verwende letzten Flow oder konservativen Schätzwert (3 L/min)
-            last_known_flow = getattr(self, '_last_positive_flow', 3.0)
-            flow_l_min = max(2.0, last_known_flow * 0.8)  # 80% vom letzten, min 2 L/min
-            _LOGGER.debug("Plateau-Modus: Varianz hoch, schätze %.1f L/min", flow_l_min)
-
-        else:
-            flow_l_min = 0.0
+        flow_l_min = _tick_flow(
+            dt_clipped, self._flow_active, self._variance_flow_detected, k_adaptive, self._last_positive_flow,
+        )
 
         # Flow-Rate begrenzen und speichern
         if flow_l_min > 0.0:
-            MAX_FLOW = 25.0
-            if flow_l_min > MAX_FLOW:
+            self._last_flow_time = now_ts
+            if dt_clipped >= 0.0:
+                self.counters["plateau_estimates"] += 1
+                _LOGGER.debug("Plateau-Modus: Varianz hoch, schätze %.1f L/min", flow_l_min)
+            if flow_l_min > MAX_FLOW_L_MIN:
                 _LOGGER.warning("Flow %.1f L/min > Maximum, cappe auf %.1f",
-                               flow_l_min, MAX_FLOW)
-                flow_l_min = MAX_FLOW
+                               flow_l_min, MAX_FLOW_L_MIN)
+                flow_l_min = MAX_FLOW_L_MIN
 
             self._last_flow = flow_l_min
             self._last_positive_flow = flow_l_min  # Merken für Plateau-Modus
             self._integrate(flow_l_min, dt_s)
+
+            # Kalibrier-Record: Gradient-Volumen ist linear in K, Plateau nicht
+            volume = flow_l_min * (dt_s / 60.0)
+            if dt_clipped < 0.0:
+                b = temp_bin(filt_temp)
+                self._tick_unit_bins[b] = self._tick_unit_bins.get(b, 0.0) + volume / k_adaptive
+            else:
+                self._tick_fixed_l += volume
         else:
             self._last_flow = 0.0
+
+        if self.tick_ring is not None:
+            if dt_clipped < 0.0:
+                mode = TICK_MODE_GRADIENT
+            elif flow_l_min > 0.0:
+                mode = TICK_MODE_PLATEAU
+            else:
+                mode = TICK_MODE_IDLE
+            self._record_tick(now_ts, filt_temp, baseline, dt_baseline_corrected, dt_gradient,
+                              threshold_enter, threshold_exit, mode, self._last_flow, k_adaptive)
         
         self._last_temp_relative = temp_relative
-        
-        self._notify_entities()
+        self.counters["events_processed"] += 1
+        if prof is not None:
+            prof.lap("integration", t)
+        return True
     
+    def _record_tick(self, now_ts: float, filt_temp: float, baseline: float, dt_baseline_corrected: float,
+                     dt_gradient: float | None, threshold_enter: float, threshold_exit: float,
+                     mode: float, flow_l_min: float, k: float) -> None:
+        """Eine Zeile in den Diagnose-Ring (Reihenfolge wie trace.TICK_RING_COLUMNS)."""
+        self.tick_ring.append(now_ts, (
+            self._last_temp, filt_temp, baseline, dt_baseline_corrected,
+            _NAN if dt_gradient is None else dt_gradient, self._variance_ratio,
+            threshold_enter, threshold_exit, self._flow_active, self._flow_confirmation_counter,
+            self._variance_flow_detected, mode, flow_l_min, self._volume_l, k,
+        ))
+
+    def restore_volume(self, volume_l: float) -> None:
+        """Volume aus dem letzten HA-State übernehmen (RestoreEntity)."""
+        self._volume_l = volume_l
+        # Offset so setzen, dass Residuum nicht „platzt“
+        if self._offset_l == 0.0 or self._offset_l > self._volume_l:
+            self._offset_l = self._volume_l
+        # Merker: Initialisierung durch den ersten Hydrus-Wert NICHT überschreiben
+        self._restored_volume = True
+        self._journal_rotate()
+        self._forward("restore_volume", volume_l)
+        self.snapshot = self._build_snapshot()
+
+    def _build_snapshot(self) -> ControllerSnapshot:
+        """Alle abgeleiteten Werte einmal pro Tick für die Entities berechnen."""
+        now_ts = self._clock()
+        filt_temp = self._kalman.get_state()[0] if self._kalman is not None else None
+        deep_sleep = self._is_deep_sleep_mode()
+
+        threshold = self._last_threshold
+        if threshold is None:
+            threshold = -0.006 * (1.2 if deep_sleep else 1.0)  # Fallback vor erstem Tick
+
+        if self._last_flow_time is not None:
+            idle_hours = (now_ts - self._last_flow_time) / 3600.0
+        else:
+            idle_hours = 999.9
+
+        if self._last_hydrus_change_time is not None:
+            minutes_since_tick = (now_ts - self._last_hydrus_change_time) / 60.0
+        else:
+            minutes_since_tick = None
+
+        return ControllerSnapshot(
+            timestamp=now_ts,
+            raw_temp=self._last_temp,
+            filt_temp=filt_temp,
+            dt_used=self._last_dt_used,
+            flow_l_min=self._last_flow,
+            volume_l=self._volume_l,
+            offset_l=self._offset_l,
+            residuum_l=self.residuum_l,
+            max_res_l=self.max_res_l,
+            uncertainty_l=self._volume_uncertainty,
+            k_warm=self.k_warm,
+            k_cold=self.k_cold,
+            t_warm=self.t_warm,
+            t_cold=self.t_cold,
+            k_active=self._last_k_used,
+            threshold=threshold,
+            flow_active=self._flow_active,
+            night_mode=self._night_mode_active,
+            deep_sleep=deep_sleep,
+            idle_throttled=self._idle,
+            idle_hours=idle_hours,
+            current_hour=datetime.fromtimestamp(now_ts).hour,
+            hydrus_total=self._last_hydrus_total,
+            minutes_since_tick=minutes_since_tick,
+            variance_detected=self._variance_flow_detected,
+            variance_ratio=self._variance_ratio,
+            baseline_variance=self._baseline_variance,
+            publish_written=self.publish_written,
+            publish_skipped=self.publish_skipped,
+        )
+
+    def notify_entities(self) -> None:
+        """Snapshot neu berechnen und Entities informieren, z.B. nach einer Options- oder Engine-Methode."""
+        self._notify_entities()
+
     def _notify_entities(self) -> None:
-        """Informiert alle Entities über Zustandsänderungen."""
-        self.hass.data[DOMAIN][self.entry.entry_id][DATA_CTRL] = self
+        """Entities informieren; mit Hub gesammelt einmal pro Event-Loop-Durchlauf."""
+        if self.hub is not None:
+            self.hub.schedule_notify(self)
+            return
+        prof = self.profiler
+        if prof is None:
+            self._notify_entities_now()
+            return
+        t = time.perf_counter()
+        self._notify_entities_now()
+        prof.lap("notify", t)
+
+    def _notify_entities_now(self) -> None:
+        """Snapshot neu berechnen und alle Entities informieren."""
+        self.snapshot = self._build_snapshot()
+        self._notify_listeners()
+
+    def _notify_listeners(self) -> None:
         for cb in self.__dict__.get("_entity_listeners", []):
             try:
                 cb()
             except Exception as e:
                 _LOGGER.exception("Entity-Listener Fehler: %s", e)
     
+    # --- Prozess-Backend (engine.py) ---------------------------------------------
+
+    def _forward(self, method: str, *args, **kwargs) -> None:
+        """Manuelle Änderung auch im Worker-Controller ausführen (nach den bereits übergebenen Samples)."""
+        if self.engine_attached:
+            self.hub.engine_call(self, method, *args, **kwargs)
+
+    def apply_engine_snapshot(self, snap: ControllerSnapshot, adopt_k: bool) -> None:
+        """
+        Snapshot des Worker-Controllers anzeigen. Auto-kalibrierte K-Werte werden
+        übernommen und gespeichert, außer eigene Änderungen sind noch unterwegs.
+        """
+        if adopt_k:
+            changed = {}
+            if snap.k_warm != self.k_warm:
+                self.k_warm = changed[CONF_K_WARM] = snap.k_warm
+            if snap.k_cold != self.k_cold:
+                self.k_cold = changed[CONF_K_COLD] = snap.k_cold
+            if changed:
+                self._schedule_persist(changed)
+        self.snapshot = replace(snap, publish_written=self.publish_written, publish_skipped=self.publish_skipped)
+        self._notify_listeners()
+
+    def load_engine_state(self, state: dict) -> None:
+        """Zustand des Worker-Controllers übernehmen (Speichern, Diagnose, Rückfall auf lokal)."""
+        self.load_journal_header(state["header"])
+        # Verarbeitungszähler zählt der Worker; Event-Zähler (dort 0) bleiben lokal
+        for key, value in state["counters"].items():
+            if value:
+                self.counters[key] = value
+
+    async def async_sync_from_engine(self) -> None:
+        """Vor dem Lesen von Records/Zählern: Zustand aus dem Worker holen (sonst No-op)."""
+        if self.engine_attached:
+            await self.hub.async_sync_engine([self])
+
+    # --- Persistenter Zustand ---------------------------------------------------
+
+    def _state_to_store(self) -> dict:
+        """Kompletter Controller-Zustand; Historien als gepackte float64-Arrays."""
+        kalman = None
+        if self._kalman is not None:
+            k = self._kalman
+            kalman = [k.temp, k.rate, k.p00, k.p01, k.p11]
+        return {
+            "saved_at": self._clock(),
+            "kalman": kalman,
+            "last_ts": self._last_ts,
+            "last_temp": self._last_temp,
+            "last_temp_relative": self._last_temp_relative,
+            "last_dt_baseline_corrected": self._last_dt_baseline_corrected,
+            "baseline_window": _pack(self._temp_history_6h.values()),
+            "variance_window": _pack(self._temp_variance_history.values()),
+            "within_variance_window": _pack(self._within_variance_history.values()),
+            "dt_history": _pack(self._dt_history.values()),
+            "since_tick": self._temp_since_tick.as_list(),
+            "tick_records": {name: _pack(col) for name, col in self._tick_records.columns().items()},
+            "kfit_since_ts": self._kfit_since_ts,
+            "baseline_variance": self._baseline_variance,
+            "flow_active": self._flow_active,
+            "flow_confirmation_counter": self._flow_confirmation_counter,
+            "variance_flow_detected": self._variance_flow_detected,
+            "last_flow_time": self._last_flow_time,
+            "last_positive_flow": self._last_positive_flow,
+            "last_hydrus_change_time": self._last_hydrus_change_time,
+            "offset_l": self._offset_l,
+            "volume_uncertainty": self._volume_uncertainty,
+        }
+
+    def _restore_from_store(self, data: dict) -> None:
+        """
+        Gespeicherten Zustand übernehmen. Erst alles in neue Objekte parsen, dann
+        zuweisen: ein kaputter Store lässt den Controller unverändert, und ein
+        zweites Laden ersetzt die Fenster statt sie zu verlängern.
+        """
+        age = self._clock() - data.get("saved_at", 0.0)
+        restored = {
+            "_baseline_variance": data.get("baseline_variance", self._baseline_variance),
+            "_last_flow_time": data.get("last_flow_time"),
+            "_last_positive_flow": data.get("last_positive_flow", self._last_positive_flow),
+            "_last_hydrus_change_time": data.get("last_hydrus_change_time"),
+            "_offset_l": data.get("offset_l", self._offset_l),
+            "_volume_uncertainty": data.get("volume_uncertainty", self._volume_uncertainty),
+            "_kfit_since_ts": data.get("kfit_since_ts", self._kfit_since_ts),
+        }
+        # Kalibrier-Records veralten nicht (Gewichtung nach Alter beim Fit)
+        if "tick_records" in data:
+            records = TickRecords(self._tick_records.maxlen)
+            records.load_columns({name: _unpack(col) for name, col in data["tick_records"].items()})
+            restored["_tick_records"] = records
+
+        if age <= STATE_MAX_AGE_WINDOWS_S:
+            baseline = RollingPercentile(self._temp_history_6h.maxlen)
+            baseline.extend(_unpack(data["baseline_window"]))
+            variance = RollingVariance(self._temp_variance_history.maxlen)
+            variance.extend(_unpack(data["variance_window"]))
+            within = RollingMean(self._within_variance_history.maxlen)
+            within.extend(_unpack(data.get("within_variance_window", "")))
+            since_tick = TickAccumulator()
+            since_tick.load_list(data["since_tick"])
+            restored.update(
+                _temp_history_6h=baseline, _temp_variance_history=variance,
+                _within_variance_history=within, _temp_since_tick=since_tick,
+            )
+
+        if age <= STATE_MAX_AGE_KALMAN_S and data.get("kalman") is not None:
+            # Kurzer Neustart: Filter und Flow-Zustand nahtlos fortsetzen
+            kalman = SimpleKalman()
+            kalman.temp, kalman.rate, kalman.p00, kalman.p01, kalman.p11 = (float(v) for v in data["kalman"])
+            dt_history = RollingMedianMAD(self._dt_history.maxlen)
+            dt_history.extend(_unpack(data["dt_history"]))
+            restored.update(
+                _kalman=kalman, _dt_history=dt_history,
+                _last_ts=data["last_ts"],
+                _last_temp=data["last_temp"],
+                _last_temp_relative=data["last_temp_relative"],
+                _last_dt_baseline_corrected=data["last_dt_baseline_corrected"],
+                _flow_active=data["flow_active"],
+                _flow_confirmation_counter=data["flow_confirmation_counter"],
+                _variance_flow_detected=data["variance_flow_detected"],
+            )
+
+        self.__dict__.update(restored)
+        _LOGGER.debug(
+            "Controller-Zustand wiederhergestellt (Alter %.0f s, Baseline-Samples %d)",
+            age, len(self._temp_history_6h),
+        )
+
+    def _journal_rotate(self) -> None:
+        """Manuelle Änderung: nächstes Journal-Sample beginnt ein Segment mit neuem Header."""
+        if self.journal is not None:
+            self.journal.rotate()
+
+    def journal_header(self) -> dict:
+        """
+        Segment-Header fürs Eingangs-Journal: Store-Zustand, der übrige
+        Laufzeit-Zustand und die wirksamen Optionen (inkl. Auto-K), damit ein
+        Replay ab Segment-Anfang bit-gleich weiterrechnet.
+        """
+        return {
+            "state": self._state_to_store(),
+            "live": {
+                "volume_l": self._volume_l,
+                "restored_volume": self._restored_volume,
+                "last_hydrus_total": self._last_hydrus_total,
+                "last_flow": self._last_flow,
+                "last_dt_used": self._last_dt_used,
+                "last_k_used": self._last_k_used,
+                "last_threshold": self._last_threshold,
+                "night_mode_active": self._night_mode_active,
+                "variance_ratio": self._variance_ratio,
+                "variance_sums": self._temp_variance_history.sums(),
+                "within_variance_sums": self._within_variance_history.sums(),
+                "sub_tick": self._sub_tick.as_list(),
+                "tick_unit_bins": list(self._tick_unit_bins.items()),
+                "tick_fixed_l": self._tick_fixed_l,
+                "tick_record_partial": self._tick_record_partial,
+                "idle": [
+                    self._idle, self._idle_fast, self._idle_slow, self._idle_var, self._idle_last_ts,
+                    self._idle_baseline_ts, self._idle_notify_ts, self._idle_awake_until,
+                ],
+            },
+            "options": self.journal_options(),
+        }
+
+    def journal_options(self) -> dict:
+        """Wirksame rechenrelevante Optionen (Options-Keys, siehe JOURNAL_OPTIONS)."""
+        return {key: getattr(self, attr) for key, attr in JOURNAL_OPTIONS.items()}
+
+    def load_journal_options(self, options: dict) -> None:
+        """Optionen aus einem Segment-Header (oder Overrides) übernehmen; fehlende bleiben."""
+        self.set_options(**{attr: options[key] for key, attr in JOURNAL_OPTIONS.items() if key in options})
+
+    def load_journal_header(self, header: dict) -> None:
+        """Replay: Zustand eines Segment-Headers übernehmen; die Uhr muss auf saved_at stehen."""
+        self.load_journal_options(header["options"])
+        self._restore_from_store(header["state"])
+        live = header["live"]
+        self._volume_l = live["volume_l"]
+        self._restored_volume = live["restored_volume"]
+        self._last_hydrus_total = live["last_hydrus_total"]
+        self._last_flow = live["last_flow"]
+        self._last_dt_used = live["last_dt_used"]
+        self._last_k_used = live["last_k_used"]
+        self._last_threshold = live["last_threshold"]
+        self._night_mode_active = live["night_mode_active"]
+        self._variance_ratio = live["variance_ratio"]
+        self._temp_variance_history.load_sums(live["variance_sums"])
+        self._within_variance_history.load_sums(live["within_variance_sums"])
+        self._sub_tick.load_list(live["sub_tick"])
+        self._tick_unit_bins = {int(b): v for b, v in live["tick_unit_bins"]}
+        self._tick_fixed_l = live["tick_fixed_l"]
+        self._tick_record_partial = live["tick_record_partial"]
+        (self._idle, self._idle_fast, self._idle_slow, self._idle_var, self._idle_last_ts,
+         self._idle_baseline_ts, self._idle_notify_ts, self._idle_awake_until) = live["idle"]
+        self.snapshot = self._build_snapshot()
+
+    async def async_restore_state(self) -> None:
+        """Gespeicherten Zustand laden; muss vor async_start laufen."""
+        data = await self._store.async_load()
+        if not data:
+            return
+        try:
+            self._restore_from_store(data)
+        except (KeyError, TypeError, ValueError) as e:
+            _LOGGER.warning("Gespeicherter Controller-Zustand unbrauchbar, starte neu: %s", e)
+            return
+        self.snapshot = self._build_snapshot()
+
+    def prime_from_history(self, samples: list[tuple[float, float]]) -> int:
+        """
+        Baseline-, Varianz- und Gradienten-Fenster aus historischen (ts, temp)
+        füllen, ohne Flow-Entscheidung und Integration. Läuft im Executor vor
+        async_start; gibt die Anzahl der Ticks zurück.
+        """
+        if len(samples) < 2:
+            return 0
+        kalman = SimpleKalman(init_temp=samples[0][1])
+        agg = SampleAggregator()
+        last_ts = samples[0][0]
+        last_relative = None
+        dt_corrected = 0.0
+        variance_flow = False
+        ticks = 0
+        for ts, temp in samples[1:]:
+            agg.add(temp)
+            dt_s = ts - last_ts
+            if dt_s < self.sample_cadence:
+                continue
+            n_samples = agg.count
+            tick_temp = agg.mean
+            within_variance = agg.variance
+            agg.reset()
+
+            kalman.predict(dt_s)
+            kalman.update(tick_temp, n_samples)
+            filt_temp = kalman.temp
+            self._last_temp = temp
+            self._temp_history_6h.append(filt_temp)
+
+            self._temp_variance_history.append(tick_temp)
+            self._within_variance_history.append(within_variance)
+            if len(self._temp_variance_history) >= 10:
+                current_variance = (
+                    self._temp_variance_history.variance + self._within_variance_history.mean
+                )
+                # Lernregel wie _check_variance_flow (ohne thermischen Flow-Zustand)
+                if not variance_flow:
+                    self._baseline_variance = max(
+                        0.0001, 0.99 * self._baseline_variance + 0.01 * current_variance
+                    )
+                variance_flow = current_variance > (2.0 if temp < 10.0 else 4.0) * self._baseline_variance
+
+            temp_relative = filt_temp - self._calculate_baseline(self._is_night_time(ts))
+            if last_relative is not None:
+                dt_corrected = (temp_relative - last_relative) / (dt_s / 60.0)
+                self._dt_history.append(dt_corrected)
+            last_relative = temp_relative
+            last_ts = ts
+            ticks += 1
+
+        if self._kalman is None and ticks:
+            # Filter und Gradient ab dem letzten historischen Tick fortsetzen
+            self._kalman = kalman
+            self._last_ts = last_ts
+            self._last_temp_relative = last_relative
+            self._last_dt_baseline_corrected = dt_corrected
+        return ticks
+
+    async def async_prime_from_recorder(self) -> None:
+        """Kaltstart: Fenster aus den letzten 12 h der Temperatur-Entity vorfüllen (Recorder optional)."""
+        if len(self._temp_history_6h):
+            return
+        history = await async_numeric_history(self.hass, [self.temp_entity], HISTORY_PRIME_S)
+        if not history:
+            return
+        samples = history[self.temp_entity]
+        ticks = await self.hass.async_add_executor_job(self.prime_from_history, samples)
+        self.snapshot = self._build_snapshot()
+        _LOGGER.debug(
+            "Baseline aus Recorder vorgefüllt: %d Samples, %d Ticks, Baseline-Varianz %.5f",
+            len(samples), ticks, self._baseline_variance,
+        )
+
+    async def async_save_state(self, _now=None) -> None:
+        await self.async_flush_journal()
+        await self._store.async_save(self._state_to_store())
+
+    async def async_flush_journal(self, journal: InputJournal | None = None) -> None:
+        """Journal-Puffer versiegeln und im Executor anhängen."""
+        if journal is None:
+            journal = self.journal
+            self._journal_flush_scheduled = False
+        if journal is None or not journal.seal():
+            return
+        try:
+            await self.hass.async_add_executor_job(journal.write_sealed)
+        except OSError as e:
+            _LOGGER.warning("Journal nicht schreibbar: %s", e)
+
     async def async_start(self):
-        @callback
-        def temp_listener(event: Event):
-            self._on_temp_entity_changed(event)
-        
-        @callback
-        def total_listener(event: Event):
-            self._on_total_entity_changed(event)
-        
-        self._remove_temp_listener = self.hass.bus.async_listen(EVENT_STATE_CHANGED, temp_listener)
-        self._remove_total_listener = self.hass.bus.async_listen(EVENT_STATE_CHANGED, total_listener)
+        # Listener und Speicher-Timer hält der Domain-Hub für alle Einträge gemeinsam
+        self.hub = async_get_hub(self.hass)
+        if self.process_engine:
+            await self.hub.async_attach_engine(self)
+        self.hub.async_add(self)
 
     async def async_stop(self):
-        if self._remove_temp_listener:
-            self._remove_temp_listener()
-            self._remove_temp_listener = None
-        if self._remove_total_listener:
-            self._remove_total_listener()
-            self._remove_total_listener = None
+        if self.hub is not None:
+            if self.engine_attached:
+                # Zustand zurückholen; Rest des Reorder-Puffers rechnet danach dieser Controller
+                await self.hub.async_detach_engine([self])
+            self.hub.async_remove(self)
+            self.hub = None
+        # Gepufferte Samples und ausstehende K-Werte nicht verlieren
+        if self._reorder_handle is not None:
+            self._reorder_handle.cancel()
+            self._reorder_handle = None
+        self._drain_samples()
+        self._async_flush_options()
+        await self.async_save_state()
     
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     ctrl = WasserResiduumController(hass, entry)
+    # Zustand vor dem ersten Event laden (Kalman, Baselines, Varianz-Lernen)
+    await ctrl.async_restore_state()
+    # Ohne gespeicherte Fenster: aus der Recorder-Historie statt 12 h Anlaufzeit
+    await ctrl.async_prime_from_recorder()
     hass.data.setdefault(DOMAIN, {})[entry.entry_id] = {DATA_CTRL: ctrl}
-    
+    async_register_services(hass)
+    async_register_metrics_view(hass)
+
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     await ctrl.async_start()
     
-    entry.add_update_listener(_async_update_listener)
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
     return True
 
 
@@ -717,8 +1600,27 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         ctrl = hass.data[DOMAIN][entry.entry_id][DATA_CTRL]
         await ctrl.async_stop()
         hass.data[DOMAIN].pop(entry.entry_id)
+        if not hass.data[DOMAIN]:
+            async_unregister_services(hass)
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Gespeicherten Controller-Zustand und Journal beim Entfernen des Eintrags löschen."""
+    await Store(hass, STORAGE_VERSION, f"{STORAGE_KEY_PREFIX}.{entry.entry_id}").async_remove()
+    await hass.async_add_executor_job(shutil.rmtree, _journal_dir(hass, entry.entry_id), True)
+
+
 async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry):
-    await hass.config_entries.async_reload(entry.entry_id)
+    ctrl = hass.data[DOMAIN][entry.entry_id][DATA_CTRL]
+    if ctrl.needs_reload(entry):
+        # Anderes Entity-Set → Listener und Sensoren neu aufbauen
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+    if ctrl.is_own_options_update(entry):
+        # Eigene (auto-kalibrierte) Werte gespeichert → bereits aktiv
+        return
+    # Options im laufenden Controller übernehmen: Kalman, Baselines und
+    # Varianz-Lernen bleiben erhalten.
+    ctrl.apply_options(entry.options)
+    ctrl.notify_entities()
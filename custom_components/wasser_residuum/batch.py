@@ -0,0 +1,705 @@
+"""
+NumPy-Batch-Pipeline für historische Daten (Jahre, viele Zähler).
+
+Pro Chunk laufen drei Stufen:
+
+1. Kadenz-Aggregation und Kalman als enge Schleife über lokale Floats.
+2. Vektorisiert: Nacht-Flags, 12h-Perzentil-Baseline (je Block die kleinsten
+   Werte des gemeinsamen Fensterkerns plus die Ränder), Fenster-Varianz
+   (Laufsummen in derselben Reihenfolge wie RollingVariance/RollingMean),
+   Gradient und MAD-Gate. Das Gate hängt über den Bezugswert (letzter
+   akzeptierter Tick) von sich selbst ab: erst spekulativ ohne Verwerfungen,
+   dann nur die betroffenen Fenster neu bewerten, bis sich nichts mehr ändert.
+3. Zustandsautomat, Integration und Tick-Records als Schleife über lokale
+   Floats; Zählerstände (nur Änderungen) laufen über _apply_total.
+
+Alle Operationen stehen in derselben Reihenfolge wie im Streaming-Pfad, Flow
+und Volume sind bit-identisch zum Replay. Die Idle-Drossel greift im Batch
+nicht. Der Zustand zwischen Chunks steckt im Controller.
+
+Synthetische 30 Tage (162k Temperaturwerte, ein Kern): Replay ~27k Samples/s,
+Batch ~270k Samples/s, also ~10x (benchmarks/batch_vs_replay.py).
+
+    python -m custom_components.wasser_residuum.batch --synthetic-days 365
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from collections.abc import Iterable
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .decision import MAX_FLOW_L_MIN, decide, integrate, interpolated_k, tick_flow, variance_flow
+from .kfit import temp_bin
+from .replay import (
+    CHANNEL_TEMP,
+    ReplayClock,
+    Sample,
+    _parse_options,
+    create_controller,
+    load_csv,
+    synthetic_samples,
+)
+
+DEFAULT_CHUNK_SIZE = 16384
+_BASELINE_BLOCK = 384  # Fenster pro Block mit gemeinsamem Kern
+_BASELINE_GROUP = 16  # Fenster pro Gruppe mit gemeinsamer Mitte innerhalb eines Blocks
+_BASELINE_MIN_COUNT = 60
+_VARIANCE_MIN_COUNT = 10
+_MAD_MIN_COUNT = 5
+
+
+def _night_flags(ts: np.ndarray) -> np.ndarray:
+    """22:00-06:00 Ortszeit wie _is_night_time; UTC-Offset einmal pro UTC-Stunde."""
+    utc_hours = ts // 3600.0
+    # ts aufsteigend: neue UTC-Stunde dort, wo sich der Stundenindex ändert
+    first = np.flatnonzero(np.concatenate(([True], utc_hours[1:] != utc_hours[:-1])))
+    offsets = np.array([time.localtime(h * 3600.0).tm_gmtoff for h in utc_hours[first].tolist()], dtype=np.float64)
+    hour = ((ts + np.repeat(offsets, np.diff(np.append(first, len(ts))))) // 3600.0) % 24.0
+    return (hour >= 22.0) | (hour < 6.0)
+
+
+def _percentile_index(n: int, q: float) -> tuple[int, float]:
+    """Position wie RollingPercentile.percentile: (unterer Index, Anteil)."""
+    pos = (n - 1) * q / 100.0
+    lo = int(pos)
+    frac = pos - lo
+    if frac == 0.0 or lo + 1 >= n:
+        return lo, 0.0
+    return lo, frac
+
+
+def _percentile_of(low, high, frac: float):
+    return low if frac == 0.0 else low + frac * (high - low)
+
+
+def _rolling_baseline(prev: np.ndarray, filt: np.ndarray, raw: np.ndarray,
+                      night: np.ndarray, maxlen: int) -> np.ndarray:
+    """_calculate_baseline für jeden Tick des Chunks (Fenster inkl. aktuellem Wert)."""
+    n0, m = len(prev), len(filt)
+    ext = np.concatenate((prev, filt))
+    count = np.minimum(maxlen, n0 + np.arange(1, m + 1))
+    out = np.where(raw != 0.0, raw, 15.0)  # Warmup: aktuelle Rohtemperatur
+
+    # Fenster im Aufbau (nur in den ersten maxlen Ticks überhaupt)
+    for j in np.flatnonzero((count >= _BASELINE_MIN_COUNT) & (count < maxlen)).tolist():
+        window = np.sort(ext[: n0 + j + 1])
+        lo, frac = _percentile_index(len(window), 1.0 if night[j] else 2.0)
+        out[j] = _percentile_of(window[lo], window[min(lo + 1, len(window) - 1)], frac)
+
+    first_full = max(0, maxlen - n0 - 1)
+    if first_full >= m:
+        return out
+    # Volle Fenster: Perzentil 1/2 braucht nur die kleinsten Werte.
+    lo1, frac1 = _percentile_index(maxlen, 1.0)
+    lo2, frac2 = _percentile_index(maxlen, 2.0)
+    keep = min(max(lo1, lo2) + 2, maxlen)
+    block = max(1, min(_BASELINE_BLOCK, maxlen - keep))
+    for j0 in range(first_full, m, block):
+        b = min(block, m - j0)
+        small = _window_smallest(ext, n0 + j0 + 1 - maxlen, b, maxlen, keep)
+        p1 = _percentile_of(small[:, lo1], small[:, min(lo1 + 1, keep - 1)], frac1)
+        p2 = _percentile_of(small[:, lo2], small[:, min(lo2 + 1, keep - 1)], frac2)
+        out[j0: j0 + b] = np.where(night[j0: j0 + b], p1, p2)
+    return out
+
+
+def _window_smallest(ext: np.ndarray, base: int, rows: int, maxlen: int, keep: int) -> np.ndarray:
+    """
+    Die keep kleinsten Werte (aufsteigend) der Fenster ext[base+t : base+t+maxlen], t < rows.
+
+    Die Fenster teilen sich den Kern ext[base+rows-1 : base+maxlen]; dessen keep
+    kleinste Werte plus die Ränder eines Fensters enthalten dessen keep kleinste.
+    """
+    core = ext[base + rows - 1: base + maxlen]
+    if len(core) > keep:
+        core = np.partition(core, keep - 1)[:keep]
+    edges = np.concatenate((ext[base: base + rows - 1], ext[base + maxlen: base + maxlen + rows - 1]))
+    return _smallest_with_edges(core, edges, rows, keep)
+
+
+def _smallest_with_edges(core: np.ndarray, edges: np.ndarray, rows: int, keep: int) -> np.ndarray:
+    """Zeile t: keep kleinste aus core ∪ edges[t : t+rows-1]; Zeilengruppen teilen sich wieder ihre Mitte."""
+    group = _BASELINE_GROUP
+    if rows <= 2 * group:
+        cand = np.broadcast_to(core, (rows, len(core)))
+        if rows > 1:
+            cand = np.concatenate((cand, sliding_window_view(edges, rows - 1)), axis=1)
+        if cand.shape[1] > keep:
+            cand = np.partition(cand, keep - 1, axis=1)[:, :keep]
+        return np.sort(cand, axis=1)
+
+    out = np.empty((rows, keep))
+    n_groups = rows // group
+    starts = np.arange(n_groups) * group
+    # Gruppe g (Zeilen g0..g0+group): gemeinsam ist edges[g0+group-1 : g0+rows-1]
+    shared = sliding_window_view(edges, rows - group)[starts + group - 1]
+    gcore = np.concatenate((np.broadcast_to(core, (n_groups, len(core))), shared), axis=1)
+    gcore = np.partition(gcore, keep - 1, axis=1)[:, :keep]
+    # Rest je Zeile: group-1 Randwerte links/rechts der Gruppenmitte
+    offsets = np.arange(group)[:, None] + np.arange(group - 1)
+    offsets = np.where(offsets < group - 1, offsets, offsets + rows - group)
+    cand = np.concatenate((
+        np.broadcast_to(gcore[:, None, :], (n_groups, group, keep)),
+        edges[starts[:, None, None] + offsets],
+    ), axis=2).reshape(n_groups * group, keep + group - 1)
+    out[: n_groups * group] = np.sort(np.partition(cand, keep - 1, axis=1)[:, :keep], axis=1)
+
+    g0 = n_groups * group
+    if g0 < rows:
+        rest = rows - g0
+        rcore = np.concatenate((core, edges[rows - 1: g0 + rows - 1]))
+        if len(rcore) > keep:
+            rcore = np.partition(rcore, keep - 1)[:keep]
+        redges = np.concatenate((edges[g0: rows - 1], edges[g0 + rows - 1: 2 * rows - 2]))
+        out[g0:] = _smallest_with_edges(rcore, redges, rest, keep)
+    return out
+
+
+def _segment_sums(lead: np.ndarray, removed: np.ndarray, added: np.ndarray,
+                  since: int, maxlen: int) -> np.ndarray:
+    """
+    Laufsumme nach jedem Append: ((s - removed) + added) je Sample, neu ab lead
+    nach jedem Resync. Sequenzielle cumsum je Segment → dieselben Rundungen.
+    Fällt der letzte Resync auf das letzte Sample, bleibt sein lead ungenutzt.
+    """
+    p = since + np.arange(len(added))
+    seg, col = np.divmod(p, maxlen)
+    terms = np.zeros((int(seg[-1]) + 1, 2 * maxlen + 1))
+    terms[:, 0] = lead[: len(terms)]
+    terms[seg, 2 * col + 1] = -removed
+    terms[seg, 2 * col + 2] = added
+    return np.cumsum(terms, axis=1)[seg, 2 * col + 2]
+
+
+def _resync_rows(since: int, count: int, maxlen: int) -> np.ndarray:
+    """Indizes der Appends, nach denen das Fenster neu summiert wird."""
+    return np.arange(maxlen - since - 1, count, maxlen)
+
+
+def _rolling_mean(stat, values: np.ndarray) -> np.ndarray:
+    """RollingMean.mean nach jedem Append; stat steht danach auf dem Endzustand."""
+    out = np.empty(len(values))
+    warm = min(len(values), max(0, stat.maxlen - len(stat)))
+    for j in range(warm):  # Fenster im Aufbau: über die Klasse selbst
+        stat.append(float(values[j]))
+        out[j] = stat.mean
+    values = values[warm:]
+    if not len(values):
+        return out
+
+    maxlen = stat.maxlen
+    total, since = stat.sums()
+    ext = np.concatenate((np.array(stat.values(), dtype=np.float64), values))
+    resync = _resync_rows(since, len(values), maxlen)
+    windows = sliding_window_view(ext, maxlen)[resync + 1]
+    resummed = np.cumsum(np.concatenate((np.zeros((len(resync), 1)), windows), axis=1), axis=1)[:, -1]
+    sums = _segment_sums(np.concatenate(([total], resummed)), ext[: len(values)], values, since, maxlen)
+    sums[resync] = resummed
+    out[warm:] = sums / maxlen
+
+    stat.extend(values[-maxlen:].tolist())
+    stat.load_sums([float(sums[-1]), (since + len(values)) % maxlen])
+    return out
+
+
+def _rolling_variance(stat, values: np.ndarray) -> np.ndarray:
+    """RollingVariance.variance nach jedem Append; stat steht danach auf dem Endzustand."""
+    out = np.empty(len(values))
+    warm = min(len(values), max(0, stat.maxlen - len(stat)))
+    for j in range(warm):
+        stat.append(float(values[j]))
+        out[j] = stat.variance
+    values = values[warm:]
+    if not len(values):
+        return out
+
+    maxlen = stat.maxlen
+    ref0, sum0, sumsq0, since = stat.sums()
+    ext = np.concatenate((np.array(stat.values(), dtype=np.float64), values))
+    resync = _resync_rows(since, len(values), maxlen)
+    ref_resync = values[resync]  # Referenz nach dem Resync: jüngster Wert
+    dev = sliding_window_view(ext, maxlen)[resync + 1] - ref_resync[:, None]
+    zeros = np.zeros((len(resync), 1))
+    sum_resync = np.cumsum(np.concatenate((zeros, dev), axis=1), axis=1)[:, -1]
+    sumsq_resync = np.cumsum(np.concatenate((zeros, dev * dev), axis=1), axis=1)[:, -1]
+
+    seg = (since + np.arange(len(values))) // maxlen
+    ref = np.concatenate(([ref0], ref_resync))[seg]
+    old = ext[: len(values)] - ref
+    d = values - ref
+    sums = _segment_sums(np.concatenate(([sum0], sum_resync)), old, d, since, maxlen)
+    sumsqs = _segment_sums(np.concatenate(([sumsq0], sumsq_resync)), old * old, d * d, since, maxlen)
+    sums[resync] = sum_resync
+    sumsqs[resync] = sumsq_resync
+    mean = sums / maxlen
+    out[warm:] = np.maximum(0.0, sumsqs / maxlen - mean * mean)
+
+    last_ref = float(ref_resync[-1]) if len(resync) and resync[-1] == len(values) - 1 else float(ref[-1])
+    stat.extend(values[-maxlen:].tolist())
+    stat.load_sums([last_ref, float(sums[-1]), float(sumsqs[-1]), (since + len(values)) % maxlen])
+    return out
+
+
+def _dynamic_thresholds(ctrl, filt: np.ndarray) -> np.ndarray:
+    """_get_dynamic_threshold je Tick."""
+    t_warm, t_cold = ctrl.thresh_temp_warm, ctrl.thresh_temp_cold
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = (filt - t_cold) / (t_warm - t_cold)
+        between = ctrl.thresh_cold + ratio * (ctrl.thresh_warm - ctrl.thresh_cold)
+    return np.where(filt >= t_warm, ctrl.thresh_warm, np.where(filt <= t_cold, ctrl.thresh_cold, between))
+
+
+def _row_median(rows: np.ndarray) -> np.ndarray:
+    """Median je Zeile (wie RollingMedianMAD.median)."""
+    n = rows.shape[1]
+    mid = n // 2
+    if n % 2:
+        return np.partition(rows, mid, axis=1)[:, mid]
+    part = np.partition(rows, (mid - 1, mid), axis=1)
+    return (part[:, mid - 1] + part[:, mid]) / 2.0
+
+
+def _mad_outliers(windows: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """|z| > 6 gegen Median/MAD je Fensterzeile."""
+    med = _row_median(windows)
+    mad = _row_median(np.abs(windows - med[:, None]))
+    mad[mad == 0.0] = 0.0001
+    return np.abs((values - med) / (1.4826 * mad)) > 6.0
+
+
+def _gradient_gate(temp_rel: np.ndarray, dt_min: np.ndarray, anchor: float | None,
+                   history: np.ndarray, window: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Baseline-korrigierter Gradient und MAD-Verwerfung je Tick.
+
+    Der Gradient bezieht sich auf den letzten akzeptierten Tick, das Gate auf
+    die letzten `window` Gradienten (inkl. verworfener). Verwerfungen werden bis
+    zum Fixpunkt nachgezogen; jede Runde ist ab dem ersten Unterschied exakt.
+    """
+    m = len(temp_rel)
+    pos = np.arange(m)
+    fresh = anchor is None
+    if fresh:
+        anchor = temp_rel[0]
+    h = len(history)
+
+    def gradient(rejected: np.ndarray) -> np.ndarray:
+        last = np.maximum.accumulate(np.where(rejected, -1, pos))
+        prev = np.concatenate(([-1], last[:-1]))
+        ref = np.where(prev >= 0, temp_rel[prev], anchor)
+        dbc = (temp_rel - ref) / dt_min
+        if fresh:
+            dbc[0] = 0.0
+        return dbc
+
+    def gate(dbc: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        ext = np.concatenate((history, dbc))
+        ends = h + rows + 1
+        out = np.zeros(len(rows), dtype=bool)
+        full = ends >= window
+        if full.any():
+            end = ends[full]
+            windows = sliding_window_view(ext, window)
+            if end[-1] - end[0] + 1 == len(end):  # zusammenhängend: Sicht statt Kopie
+                windows = windows[end[0] - window: end[-1] - window + 1]
+            else:
+                windows = windows[end - window]
+            out[full] = _mad_outliers(windows, ext[end - 1])
+        for i in np.flatnonzero(~full & (ends >= _MAD_MIN_COUNT)).tolist():
+            out[i] = _mad_outliers(ext[None, : ends[i]], ext[ends[i] - 1: ends[i]])[0]
+        return out
+
+    dbc = gradient(np.zeros(m, dtype=bool))
+    rejected = gate(dbc, pos)
+    while True:
+        fixed = gradient(rejected)
+        changed = np.flatnonzero(fixed != dbc)
+        if not len(changed):
+            return dbc, rejected
+        dbc = fixed
+        # Betroffen: jede Zeile, deren Fenster einen geänderten Gradienten enthält
+        cover = np.cumsum(np.bincount(changed, minlength=m + window) - np.bincount(changed + window, minlength=m + window))
+        rows = np.flatnonzero(cover[:m])
+        rejected[rows] = gate(dbc, rows)
+
+
+class BatchPipeline:
+    """
+    Controller-Pipeline über ganze Arrays, chunkweise mit übertragenem Zustand.
+
+    Zählerstände mit gleichem Zeitstempel wie ein Temperaturwert werden nach
+    diesem verarbeitet (wie synthetic_samples/der Replay sie liefert).
+    """
+
+    def __init__(self, options: dict | None = None, total_unit: str = "L"):
+        self.clock = ReplayClock()
+        self.ctrl = create_controller(options, total_unit, self.clock)
+
+    def run(self, ts, temps, total_ts=None, totals=None,
+            chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict[str, np.ndarray]:
+        """Komplette Reihe verarbeiten; liefert ts/flow_l_min/volume_l je Temperaturwert."""
+        ts = np.asarray(ts, dtype=np.float64)
+        temps = np.asarray(temps, dtype=np.float64)
+        total_ts = np.asarray(total_ts if total_ts is not None else (), dtype=np.float64)
+        totals = np.asarray(totals if totals is not None else (), dtype=np.float64)
+
+        parts = []
+        t0 = 0
+        for start in range(0, len(ts), chunk_size):
+            stop = min(start + chunk_size, len(ts))
+            t1 = len(total_ts) if stop == len(ts) else int(np.searchsorted(total_ts, ts[stop], "left"))
+            parts.append(self.run_chunk(ts[start:stop], temps[start:stop], total_ts[t0:t1], totals[t0:t1]))
+            t0 = t1
+        if not parts:
+            return {"ts": ts, "flow_l_min": np.empty(0), "volume_l": np.empty(0)}
+        return {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+
+    def _kalman_ticks(self, ts: np.ndarray, temps: np.ndarray) -> tuple[np.ndarray, np.ndarray, list, np.ndarray, np.ndarray]:
+        """
+        Stufe 1: Kadenz-Aggregation + Kalman.
+
+        Liefert je Tick Sample-Index, dt, gefilterte Temperatur, Tick-Mittel und
+        Varianz innerhalb des Ticks. Ist jedes Sample ein Tick (Sensor nicht
+        schneller als die Kadenz), entfällt die Aggregation.
+        """
+        ctrl = self.ctrl
+        n = len(ts)
+        i = 0
+        while i < n and ctrl._kalman is None:
+            self.clock.now = float(ts[i])
+            ctrl.process_temperature(float(temps[i]))
+            i += 1
+        if i >= n:
+            empty = np.empty(0)
+            return np.empty(0, dtype=np.intp), empty, [], empty, empty
+
+        kal = ctrl._kalman
+        temp, rate, p00, p01, p11 = kal.temp, kal.rate, kal.p00, kal.p01, kal.p11
+        q_temp, q_rate, r = kal.q_temp, kal.q_rate, kal.R
+        agg = ctrl._sub_tick
+        cadence = ctrl.sample_cadence
+        last_ts = ctrl._last_ts
+        filt = []
+        append = filt.append
+
+        dt_all = np.diff(ts[i:], prepend=last_ts)
+        if cadence > 0 and not agg.count and (dt_all >= cadence).all():
+            # Ein Sample pro Tick: Mittel = 0.0 + Wert, Varianz 0, R/1, dt > 0
+            tick_arr = temps[i:] + 0.0
+            r_one = r / 1
+            for dt_s, z in zip(dt_all.tolist(), tick_arr.tolist()):
+                temp += dt_s * rate
+                p00 += dt_s * (2.0 * p01 + dt_s * p11) + q_temp
+                p01 = p01 + dt_s * p11
+                p11 = p11 + q_rate
+                s = p00 + r_one
+                k0 = p00 / s
+                k1 = p01 / s
+                y = z - temp
+                temp += k0 * y
+                rate += k1 * y
+                p11 -= k1 * p01
+                p00 = p00 - k0 * p00
+                p01 = p01 - k0 * p01
+                append(temp)
+            kal.temp, kal.rate, kal.p00, kal.p01, kal.p11 = temp, rate, p00, p01, p11
+            return np.arange(i, n, dtype=np.intp), dt_all, filt, tick_arr, np.zeros(n - i)
+
+        accepted, dts, ticks, within = [], [], [], []
+        count, mean, m2 = agg.as_list()
+        ts_list = ts.tolist()
+        temp_list = temps.tolist()
+        aggregated = 0
+        for i in range(i, n):
+            # Wie SampleAggregator.add / SimpleKalman.predict+update, Operation für Operation
+            value = temp_list[i]
+            count += 1
+            delta = value - mean
+            mean += delta / count
+            m2 += delta * (value - mean)
+            now = ts_list[i]
+            dt_s = now - last_ts
+            if dt_s < cadence:
+                aggregated += 1
+                continue
+            within.append(m2 / count if count >= 2 else 0.0)
+            if dt_s > 0:
+                temp += dt_s * rate
+                p00 += dt_s * (2.0 * p01 + dt_s * p11) + q_temp
+                p01 = p01 + dt_s * p11
+                p11 = p11 + q_rate
+            s = p00 + r / count
+            k0 = p00 / s
+            k1 = p01 / s
+            y = mean - temp
+            temp += k0 * y
+            rate += k1 * y
+            p11 -= k1 * p01
+            p00 = p00 - k0 * p00
+            p01 = p01 - k0 * p01
+            accepted.append(i)
+            dts.append(dt_s)
+            append(temp)
+            ticks.append(mean)
+            count, mean, m2 = 0, 0.0, 0.0
+            last_ts = now
+
+        kal.temp, kal.rate, kal.p00, kal.p01, kal.p11 = temp, rate, p00, p01, p11
+        agg.load_list([count, mean, m2])
+        ctrl.counters["samples_aggregated"] += aggregated
+        return (np.array(accepted, dtype=np.intp), np.array(dts, dtype=np.float64), filt,
+                np.array(ticks, dtype=np.float64), np.array(within, dtype=np.float64))
+
+    def run_chunk(self, ts: np.ndarray, temps: np.ndarray,
+                  total_ts: np.ndarray | None = None, totals: np.ndarray | None = None) -> dict[str, np.ndarray]:
+        """Ein Chunk; Zählerstände nach dem letzten Temperaturwert werden am Ende verarbeitet."""
+        ctrl = self.ctrl
+        clock = self.clock
+        n = len(ts)
+        total_ts = np.asarray(total_ts if total_ts is not None else (), dtype=np.float64)
+        totals = np.asarray(totals if totals is not None else (), dtype=np.float64)
+        flow0 = ctrl._last_flow
+        volume0 = ctrl._volume_l
+
+        # 1) Sequenziell, aber billig: Tick-Aggregation (Kadenz) und Kalman
+        idx, dt_arr, filt, tick_arr, within_arr = self._kalman_ticks(ts, temps)
+        m = len(idx)
+
+        # 2) Vektorisiert: Nacht, Baseline, Varianz, Gradient, MAD-Gate, Schwellwerte
+        if m:
+            filt_arr = np.array(filt, dtype=np.float64)
+            raw_arr = temps[idx]
+            night = _night_flags(ts[idx])
+            history = ctrl._temp_history_6h
+            baseline = _rolling_baseline(
+                np.array(history.values(), dtype=np.float64), filt_arr, raw_arr, night, history.maxlen,
+            )
+            history.extend(filt[-history.maxlen:])
+            n_var = np.minimum(ctrl._temp_variance_history.maxlen, len(ctrl._temp_variance_history) + np.arange(1, m + 1))
+            variance = (_rolling_variance(ctrl._temp_variance_history, tick_arr)
+                        + _rolling_mean(ctrl._within_variance_history, within_arr))
+            # None solange das Fenster zu kurz ist (wie im Controller)
+            variance_list = [v if ok else None for v, ok in zip(variance.tolist(), (n_var >= _VARIANCE_MIN_COUNT).tolist())]
+
+            dt_min = dt_arr / 60.0
+            dbc, rejected = _gradient_gate(
+                filt_arr - baseline, dt_min, ctrl._last_temp_relative,
+                np.array(ctrl._dt_history.values(), dtype=np.float64), ctrl._dt_history.maxlen,
+            )
+            grad = np.empty(m)
+            grad[1:] = (dbc[1:] - dbc[:-1]) / dt_min[1:]
+            prev_dbc = ctrl._last_dt_baseline_corrected
+            grad[0] = np.nan if prev_dbc is None else (dbc[0] - prev_dbc) / dt_min[0]
+            thresholds = _dynamic_thresholds(ctrl, filt_arr).tolist()
+            dbc_list = dbc.tolist()
+            gated_list = np.where(rejected, np.nan, dbc).tolist()  # NaN = vom MAD-Gate verworfen
+            grad_list = grad.tolist()
+            raw_list = raw_arr.tolist()
+            tick_ts = ts[idx].tolist()
+            accepted = idx.tolist()
+            dts = dt_arr.tolist()
+
+            # Zustand, den der Tick-Loop nicht braucht, gleich fortschreiben
+            kept = np.flatnonzero(~rejected)
+            if len(kept):
+                ctrl._last_temp_relative = float(filt_arr[kept[-1]] - baseline[kept[-1]])
+                ctrl._night_mode_active = bool(night[kept[-1]])
+            elif ctrl._last_temp_relative is None:
+                ctrl._last_temp_relative = float(filt_arr[0] - baseline[0])
+            ctrl._last_dt_baseline_corrected = ctrl._last_dt_used = dbc_list[-1]
+            ctrl._dt_history.extend(dbc_list[-ctrl._dt_history.maxlen:])
+            for g in grad_list[-ctrl._dt_gradient_history.capacity:]:
+                if g == g:
+                    ctrl._dt_gradient_history.append(g)
+            ctrl._last_ts = tick_ts[-1]
+        else:
+            accepted = tick_ts = dts = variance_list = raw_list = gated_list = thresholds = grad_list = []
+        if n:
+            ctrl._last_temp = float(temps[-1])
+
+        # 3) Sequenziell: Zählerstände + Entscheidungslogik
+        # Nur Zählerwechsel ändern etwas (gleicher Stand: _apply_total ist ein No-op)
+        if len(totals):
+            changed = np.concatenate(([True], totals[1:] != totals[:-1]))
+            total_ts, totals = total_ts[changed], totals[changed]
+        total_pos = np.searchsorted(ts, total_ts, "right").tolist()  # ab diesem Sample sichtbar
+        total_ts_list = total_ts.tolist()
+        total_list = totals.tolist()
+        n_totals = len(total_list)
+        ev_pos, ev_flow, ev_volume = [], [], []
+
+        apply_total = ctrl._apply_total
+        tst = ctrl._temp_since_tick
+        ws, weight, tst_count, tmin, tmax = tst.weighted_sum, tst.weight, tst.count, tst.min, tst.max
+        bins, fixed_l = ctrl._tick_unit_bins, ctrl._tick_fixed_l
+        volume, unc = ctrl._volume_l, ctrl._volume_uncertainty
+        last_total, hydrus_change = ctrl._last_hydrus_total, ctrl._last_hydrus_change_time
+        k_warm, k_cold, t_warm, t_cold = ctrl.k_warm, ctrl.k_cold, ctrl.t_warm, ctrl.t_cold
+        bv, vfd, ratio = ctrl._baseline_variance, ctrl._variance_flow_detected, ctrl._variance_ratio
+        flow_active, confirm = ctrl._flow_active, ctrl._flow_confirmation_counter
+        last_flow, last_pos_flow = ctrl._last_flow, ctrl._last_positive_flow
+        last_flow_time, last_k, last_thr = ctrl._last_flow_time, ctrl._last_k_used, ctrl._last_threshold
+        clip, max_res = ctrl.clip, ctrl.max_res_l
+        cap = None if last_total is None else last_total + max_res  # Obergrenze für integrate
+        starts = stops = plateaus = processed = mad = 0
+        k = 0
+
+        last_f = None
+        for sample, now, dt_s, f, cv, raw, d, threshold, g in zip(
+            accepted, tick_ts, dts, filt, variance_list, raw_list, gated_list, thresholds, grad_list,
+        ):
+            if k < n_totals and total_pos[k] <= sample:
+                # Zählerstände vor diesem Tick: lokaler Zustand ↔ Controller rund um _apply_total
+                tst.weighted_sum, tst.weight, tst.count, tst.min, tst.max = ws, weight, tst_count, tmin, tmax
+                ctrl._tick_unit_bins, ctrl._tick_fixed_l = bins, fixed_l
+                ctrl._volume_l, ctrl._volume_uncertainty = volume, unc
+                while k < n_totals and total_pos[k] <= sample:
+                    clock.now = total_ts_list[k]
+                    apply_total(total_list[k], total_ts_list[k])
+                    ev_pos.append(total_pos[k])
+                    ev_flow.append(last_flow)
+                    ev_volume.append(ctrl._volume_l)
+                    k += 1
+                ws, weight, tst_count, tmin, tmax = tst.weighted_sum, tst.weight, tst.count, tst.min, tst.max
+                bins, fixed_l = ctrl._tick_unit_bins, ctrl._tick_fixed_l
+                volume, unc = ctrl._volume_l, ctrl._volume_uncertainty
+                last_total, hydrus_change = ctrl._last_hydrus_total, ctrl._last_hydrus_change_time
+                cap = None if last_total is None else last_total + max_res
+                k_warm, k_cold = ctrl.k_warm, ctrl.k_cold
+
+            # _temp_since_tick.add
+            ws += f * dt_s
+            weight += dt_s
+            tst_count += 1
+            if f < tmin:
+                tmin = f
+            if f > tmax:
+                tmax = f
+
+            # Dieselben Funktionen wie _evaluate_tick (decision.py)
+            bv, ratio, vfd = variance_flow(cv, bv, not flow_active and not vfd, raw)
+            if d != d:
+                mad += 1
+                continue
+
+            # NaN-Gradient (erster Tick) verhält sich wie None
+            clipped, last_thr, confirm, flow_active, transition = decide(
+                now, d, g, f, threshold, vfd, confirm, flow_active, last_flow_time, hydrus_change, clip,
+            )
+            if transition > 0:
+                starts += 1
+            elif transition < 0:
+                stops += 1
+
+            last_f = f
+            # K nur bei Gradient-Flow nötig (tick_flow nutzt es sonst nicht)
+            k_used = interpolated_k(f, k_warm, k_cold, t_warm, t_cold) if clipped < 0.0 else 0.0
+            flow = tick_flow(clipped, flow_active, vfd, k_used, last_pos_flow)
+
+            if flow > 0.0:
+                last_flow_time = now
+                if clipped >= 0.0:
+                    plateaus += 1
+                if flow > MAX_FLOW_L_MIN:
+                    flow = MAX_FLOW_L_MIN
+                last_flow = flow
+                last_pos_flow = flow
+                volume, unc = integrate(volume, unc, flow, dt_s, cap)
+                tick_volume = flow * (dt_s / 60.0)
+                if clipped < 0.0:
+                    b = temp_bin(f)
+                    bins[b] = bins.get(b, 0.0) + tick_volume / k_used
+                else:
+                    fixed_l += tick_volume
+            else:
+                last_flow = 0.0
+            processed += 1
+            ev_pos.append(sample)
+            ev_flow.append(last_flow)
+            ev_volume.append(volume)
+
+        if last_f is not None:
+            last_k = interpolated_k(last_f, k_warm, k_cold, t_warm, t_cold)
+
+        # Zustand für den nächsten Chunk
+        tst.weighted_sum, tst.weight, tst.count, tst.min, tst.max = ws, weight, tst_count, tmin, tmax
+        ctrl._tick_unit_bins, ctrl._tick_fixed_l = bins, fixed_l
+        ctrl._volume_l, ctrl._volume_uncertainty = volume, unc
+        ctrl._baseline_variance, ctrl._variance_flow_detected, ctrl._variance_ratio = bv, vfd, ratio
+        ctrl._flow_active, ctrl._flow_confirmation_counter = flow_active, confirm
+        ctrl._last_flow, ctrl._last_positive_flow = last_flow, last_pos_flow
+        ctrl._last_flow_time, ctrl._last_k_used, ctrl._last_threshold = last_flow_time, last_k, last_thr
+        counters = ctrl.counters
+        counters["flow_starts"] += starts
+        counters["flow_stops"] += stops
+        counters["plateau_estimates"] += plateaus
+        counters["events_processed"] += processed
+        counters["mad_rejections"] += mad
+
+        # Zählerstände nach dem letzten Tick direkt auf dem Controller
+        while k < n_totals:
+            clock.now = total_ts_list[k]
+            apply_total(total_list[k], total_ts_list[k])
+            ev_pos.append(total_pos[k])
+            ev_flow.append(last_flow)
+            ev_volume.append(ctrl._volume_l)
+            k += 1
+
+        # Pro Temperaturwert: Stand nach dem letzten Ereignis bis einschließlich dieses Samples
+        last = np.searchsorted(np.array(ev_pos, dtype=np.intp), np.arange(n), "right") - 1
+        flow_out = np.where(last >= 0, np.array(ev_flow + [flow0], dtype=np.float64)[last], np.nan if flow0 is None else flow0)
+        volume_out = np.where(last >= 0, np.array(ev_volume + [volume0], dtype=np.float64)[last], volume0)
+        if n:
+            clock.now = max(float(ts[-1]), total_ts_list[-1]) if total_ts_list else float(ts[-1])
+        ctrl.snapshot = ctrl._build_snapshot()
+        return {"ts": ts, "flow_l_min": flow_out, "volume_l": volume_out}
+
+
+def samples_to_arrays(samples: Iterable[Sample]) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Replay-Samples in (temp_ts, temps, total_ts, totals) aufteilen."""
+    temp_ts, temps, total_ts, totals = [], [], [], []
+    for ts, channel, value in samples:
+        if channel == CHANNEL_TEMP:
+            temp_ts.append(ts)
+            temps.append(value)
+        else:
+            total_ts.append(ts)
+            totals.append(value)
+    return np.array(temp_ts), np.array(temps), np.array(total_ts), np.array(totals)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Wasser-Residuum Batch-Pipeline")
+    parser.add_argument("samples", nargs="?", help="CSV mit ts,channel,value")
+    parser.add_argument("--synthetic-days", type=float, help="Synthetische Daten statt CSV")
+    parser.add_argument("--total-unit", default="L", choices=["L", "m3"])
+    parser.add_argument("--option", action="append", default=[], metavar="KEY=VALUE",
+                        help="Controller-Option, z.B. k_warm=4.5 (mehrfach möglich)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    if args.synthetic_days:
+        samples = synthetic_samples(hours=args.synthetic_days * 24.0)
+    elif args.samples:
+        samples = load_csv(args.samples)
+    else:
+        parser.error("samples oder --synthetic-days angeben")
+
+    temp_ts, temps, total_ts, totals = samples_to_arrays(samples)
+    start = time.perf_counter()
+    result = BatchPipeline(_parse_options(args.option), args.total_unit).run(
+        temp_ts, temps, total_ts, totals, chunk_size=args.chunk_size
+    )
+    elapsed = time.perf_counter() - start
+
+    n = len(result["ts"])
+    print(f"{n} Samples in {elapsed:.2f} s ({n / max(elapsed, 1e-9):,.0f} Samples/s)")
+    if n:
+        print(f"Volume {result['volume_l'][-1]:.3f} L")
+
+
+if __name__ == "__main__":
+    main()
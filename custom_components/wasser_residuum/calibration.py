@@ -0,0 +1,111 @@
+"""
+Nachträgliche K-Kalibrierung aus der Recorder-Historie (Service ``recalibrate``).
+
+Ein Replay mit den aktuellen Optionen (Auto-Kalibrierung aus) sammelt dieselben
+Tick-Records wie der laufende Controller (kfit.py): pro Hydrus-Intervall das
+Volumen bei K=1 je Temperatur-Bin und das K-unabhängige Plateau-Volumen. Die
+Flow-Entscheidung selbst verwendet K nicht, daher lässt sich für jede
+Kombination (t_cold, t_warm) k_cold/k_warm per kleinster Quadrate gegen die
+Zähler-Deltas fitten, ohne erneut zu replayen.
+"""
+from __future__ import annotations
+
+import heapq
+from functools import partial
+
+import numpy as np
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+
+from . import KMAX, KMAX_COLD, KMIN, WasserResiduumController
+from .const import (
+    CHANNEL_TEMP, CHANNEL_TOTAL, CONF_IDLE_THROTTLE, CONF_K_COLD, CONF_K_WARM, CONF_T_COLD, CONF_T_WARM,
+    RANGE_T,
+)
+from .history import async_numeric_history
+from .kfit import CalibrationData, TickRecords, fit as _fit, rmse_l
+from .replay import ReplayClock, Sample, create_controller
+
+MIN_INTERVALS = 5
+T_GRID_STEP = 1.0
+T_MIN_SPAN = 1.0  # t_warm mindestens so weit über t_cold
+K_LIMITS = (KMIN, KMAX_COLD, KMAX)
+
+
+def collect(samples: list[Sample], options: dict, total_unit: str) -> CalibrationData:
+    """Replay mit festem K; Samples zeitlich sortiert (Zähler nach Temperatur bei gleichem ts)."""
+    clock = ReplayClock()
+    ctrl = create_controller({**options, CONF_IDLE_THROTTLE: False}, total_unit, clock)
+    ctrl.auto_calibrate = False
+    ctrl._tick_records = TickRecords(maxlen=None)
+    for ts, channel, value in samples:
+        clock.now = ts
+        if channel == CHANNEL_TEMP:
+            ctrl.process_temperature(value, ts)
+        else:
+            ctrl.process_total(value, ts)
+    return ctrl._tick_records.matrices()
+
+
+def fit(data: CalibrationData, t_cold: float, t_warm: float,
+        k_cold: float, k_warm: float) -> tuple[float, float, float]:
+    """k_cold/k_warm per kleinster Quadrate für feste Schwellen; (k_cold, k_warm, RMSE in L)."""
+    return _fit(data, t_cold, t_warm, k_cold, k_warm, K_LIMITS)
+
+
+def recalibrate(samples: list[Sample], options: dict, total_unit: str, fit_thresholds: bool) -> dict:
+    """Kompletter Fit (blockierend, für den Executor); Vorschau als Service-Antwort."""
+    data = collect(samples, options, total_unit)
+    if len(data) < MIN_INTERVALS:
+        raise HomeAssistantError(
+            f"Zu wenige auswertbare 10L-Ticks in der Historie ({len(data)}, mindestens {MIN_INTERVALS})"
+        )
+    current = {key: float(options[key]) for key in (CONF_K_WARM, CONF_K_COLD, CONF_T_WARM, CONF_T_COLD)}
+    current_rmse = rmse_l(data, current[CONF_T_COLD], current[CONF_T_WARM],
+                          current[CONF_K_COLD], current[CONF_K_WARM])
+
+    if fit_thresholds:
+        grid = np.arange(RANGE_T["min"], RANGE_T["max"] + T_GRID_STEP / 2, T_GRID_STEP)
+        pairs = [(tc, tw) for tc in grid for tw in grid if tw - tc >= T_MIN_SPAN]
+    else:
+        pairs = [(current[CONF_T_COLD], current[CONF_T_WARM])]
+    best = None
+    for t_cold, t_warm in pairs:
+        k_cold, k_warm, rmse = fit(data, t_cold, t_warm, current[CONF_K_COLD], current[CONF_K_WARM])
+        if best is None or rmse < best[4]:
+            best = (float(t_cold), float(t_warm), k_cold, k_warm, rmse)
+    t_cold, t_warm, k_cold, k_warm, rmse = best
+
+    return {
+        "ticks": len(data),
+        "current": {**current, "rmse_l": round(current_rmse, 3)},
+        "fitted": {
+            CONF_K_WARM: round(k_warm, 2),
+            CONF_K_COLD: round(k_cold, 2),
+            CONF_T_WARM: t_warm,
+            CONF_T_COLD: t_cold,
+            "rmse_l": round(rmse, 3),
+        },
+    }
+
+
+async def async_recalibrate(hass: HomeAssistant, ctrl: WasserResiduumController,
+                            days: float, fit_thresholds: bool) -> dict:
+    """Historie laden und im Executor replayen/fitten; der Event-Loop bleibt frei."""
+    history = await async_numeric_history(hass, [ctrl.temp_entity, ctrl.total_entity], days * 86400.0)
+    if history is None:
+        raise HomeAssistantError("Recorder nicht verfügbar")
+    # Bei gleichem ts erst Temperatur, dann Zähler (wie batch.py)
+    samples = list(heapq.merge(
+        ((ts, CHANNEL_TEMP, v) for ts, v in history[ctrl.temp_entity]),
+        ((ts, CHANNEL_TOTAL, v) for ts, v in history[ctrl.total_entity]),
+    ))
+    options = {
+        **ctrl.entry.options,
+        CONF_K_WARM: ctrl.k_warm, CONF_K_COLD: ctrl.k_cold,
+        CONF_T_WARM: ctrl.t_warm, CONF_T_COLD: ctrl.t_cold,
+    }
+    return await hass.async_add_executor_job(
+        partial(recalibrate, samples, options, ctrl.total_unit, fit_thresholds)
+    )
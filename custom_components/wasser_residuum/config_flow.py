@@ -9,9 +9,19 @@ from .const import (
     CONF_LASTSYNC_ENTITY, CONF_RSSI_ENTITY, CONF_TOTAL_UNIT,
     CONF_K_WARM, CONF_K_COLD, CONF_T_WARM, CONF_T_COLD,
     CONF_CLIP, CONF_MAX_RES_L,
+    CONF_PUBLISH_MIN_INTERVAL, CONF_PUBLISH_HEARTBEAT, CONF_PUBLISH_DEADBAND,
+    CONF_DIAG_PUBLISH_MIN_INTERVAL, CONF_DIAG_PUBLISH_HEARTBEAT, CONF_DIAG_PUBLISH_DEADBAND,
+    CONF_IDLE_THROTTLE, CONF_INSTRUMENTATION, CONF_JOURNAL, CONF_PROCESS_ENGINE, CONF_SAMPLE_CADENCE,
+    CONF_TICK_RING_ROWS,
     DEFAULT_NAME, DEFAULT_K_WARM, DEFAULT_K_COLD, DEFAULT_T_WARM, DEFAULT_T_COLD,
     DEFAULT_CLIP, DEFAULT_MAX_RES_L, DEFAULT_TOTAL_UNIT,
+    DEFAULT_PUBLISH_MIN_INTERVAL, DEFAULT_PUBLISH_HEARTBEAT, DEFAULT_PUBLISH_DEADBAND,
+    DEFAULT_DIAG_PUBLISH_MIN_INTERVAL, DEFAULT_DIAG_PUBLISH_HEARTBEAT, DEFAULT_DIAG_PUBLISH_DEADBAND,
+    DEFAULT_IDLE_THROTTLE, DEFAULT_INSTRUMENTATION, DEFAULT_JOURNAL, DEFAULT_PROCESS_ENGINE,
+    DEFAULT_SAMPLE_CADENCE, DEFAULT_TICK_RING_ROWS,
     RANGE_K, RANGE_T, RANGE_CLIP, RANGE_MAX_RES,
+    RANGE_PUBLISH_MIN_INTERVAL, RANGE_PUBLISH_HEARTBEAT, RANGE_PUBLISH_DEADBAND,
+    RANGE_SAMPLE_CADENCE, RANGE_TICK_RING_ROWS,
 )
 
 
@@ -85,6 +95,40 @@ class WasserResiduumOptionsFlow(config_entries.OptionsFlow):
         current_t_cold = self.config_entry.options.get(CONF_T_COLD, DEFAULT_T_COLD)
         current_clip = self.config_entry.options.get(CONF_CLIP, DEFAULT_CLIP)
         current_max = self.config_entry.options.get(CONF_MAX_RES_L, DEFAULT_MAX_RES_L)
+        current_min_interval = self.config_entry.options.get(
+            CONF_PUBLISH_MIN_INTERVAL, DEFAULT_PUBLISH_MIN_INTERVAL
+        )
+        current_heartbeat = self.config_entry.options.get(
+            CONF_PUBLISH_HEARTBEAT, DEFAULT_PUBLISH_HEARTBEAT
+        )
+        current_deadband = self.config_entry.options.get(
+            CONF_PUBLISH_DEADBAND, DEFAULT_PUBLISH_DEADBAND
+        )
+        current_diag_min_interval = self.config_entry.options.get(
+            CONF_DIAG_PUBLISH_MIN_INTERVAL, DEFAULT_DIAG_PUBLISH_MIN_INTERVAL
+        )
+        current_diag_heartbeat = self.config_entry.options.get(
+            CONF_DIAG_PUBLISH_HEARTBEAT, DEFAULT_DIAG_PUBLISH_HEARTBEAT
+        )
+        current_diag_deadband = self.config_entry.options.get(
+            CONF_DIAG_PUBLISH_DEADBAND, DEFAULT_DIAG_PUBLISH_DEADBAND
+        )
+        current_cadence = self.config_entry.options.get(
+            CONF_SAMPLE_CADENCE, DEFAULT_SAMPLE_CADENCE
+        )
+        current_idle_throttle = self.config_entry.options.get(
+            CONF_IDLE_THROTTLE, DEFAULT_IDLE_THROTTLE
+        )
+        current_instrumentation = self.config_entry.options.get(
+            CONF_INSTRUMENTATION, DEFAULT_INSTRUMENTATION
+        )
+        current_tick_ring_rows = self.config_entry.options.get(
+            CONF_TICK_RING_ROWS, DEFAULT_TICK_RING_ROWS
+        )
+        current_journal = self.config_entry.options.get(CONF_JOURNAL, DEFAULT_JOURNAL)
+        current_process_engine = self.config_entry.options.get(
+            CONF_PROCESS_ENGINE, DEFAULT_PROCESS_ENGINE
+        )
 
         # Schema dynamisch aufbauen - EntitySelector braucht gültige Defaults
         schema_dict = {}
@@ -161,6 +205,97 @@ class WasserResiduumOptionsFlow(config_entries.OptionsFlow):
             )
         )
 
+        # Tick-Kadenz (schnellere Sensor-Samples werden gemittelt)
+        schema_dict[vol.Required(CONF_SAMPLE_CADENCE, default=current_cadence)] = selector.NumberSelector(
+            selector.NumberSelectorConfig(
+                min=RANGE_SAMPLE_CADENCE["min"],
+                max=RANGE_SAMPLE_CADENCE["max"],
+                step=RANGE_SAMPLE_CADENCE["step"],
+                unit_of_measurement="s",
+                mode=selector.NumberSelectorMode.BOX,
+            )
+        )
+
+        # Publish-Policy (wie oft Sensor-States geschrieben werden)
+        schema_dict[vol.Required(CONF_PUBLISH_DEADBAND, default=current_deadband)] = selector.NumberSelector(
+            selector.NumberSelectorConfig(
+                min=RANGE_PUBLISH_DEADBAND["min"],
+                max=RANGE_PUBLISH_DEADBAND["max"],
+                step=RANGE_PUBLISH_DEADBAND["step"],
+                mode=selector.NumberSelectorMode.BOX,
+            )
+        )
+        schema_dict[vol.Required(CONF_PUBLISH_MIN_INTERVAL, default=current_min_interval)] = selector.NumberSelector(
+            selector.NumberSelectorConfig(
+                min=RANGE_PUBLISH_MIN_INTERVAL["min"],
+                max=RANGE_PUBLISH_MIN_INTERVAL["max"],
+                step=RANGE_PUBLISH_MIN_INTERVAL["step"],
+                unit_of_measurement="s",
+                mode=selector.NumberSelectorMode.BOX,
+            )
+        )
+        schema_dict[vol.Required(CONF_PUBLISH_HEARTBEAT, default=current_heartbeat)] = selector.NumberSelector(
+            selector.NumberSelectorConfig(
+                min=RANGE_PUBLISH_HEARTBEAT["min"],
+                max=RANGE_PUBLISH_HEARTBEAT["max"],
+                step=RANGE_PUBLISH_HEARTBEAT["step"],
+                unit_of_measurement="s",
+                mode=selector.NumberSelectorMode.BOX,
+            )
+        )
+
+        # Dieselbe Policy für die Diagnose-Sensoren
+        schema_dict[vol.Required(CONF_DIAG_PUBLISH_DEADBAND, default=current_diag_deadband)] = selector.NumberSelector(
+            selector.NumberSelectorConfig(
+                min=RANGE_PUBLISH_DEADBAND["min"],
+                max=RANGE_PUBLISH_DEADBAND["max"],
+                step=RANGE_PUBLISH_DEADBAND["step"],
+                mode=selector.NumberSelectorMode.BOX,
+            )
+        )
+        schema_dict[vol.Required(CONF_DIAG_PUBLISH_MIN_INTERVAL, default=current_diag_min_interval)] = (
+            selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    min=RANGE_PUBLISH_MIN_INTERVAL["min"],
+                    max=RANGE_PUBLISH_MIN_INTERVAL["max"],
+                    step=RANGE_PUBLISH_MIN_INTERVAL["step"],
+                    unit_of_measurement="s",
+                    mode=selector.NumberSelectorMode.BOX,
+                )
+            )
+        )
+        schema_dict[vol.Required(CONF_DIAG_PUBLISH_HEARTBEAT, default=current_diag_heartbeat)] = selector.NumberSelector(
+            selector.NumberSelectorConfig(
+                min=RANGE_PUBLISH_HEARTBEAT["min"],
+                max=RANGE_PUBLISH_HEARTBEAT["max"],
+                step=RANGE_PUBLISH_HEARTBEAT["step"],
+                unit_of_measurement="s",
+                mode=selector.NumberSelectorMode.BOX,
+            )
+        )
+
+        # Idle-Modus: in langen Ruhephasen nur der Aufwach-Detektor
+        schema_dict[vol.Required(CONF_IDLE_THROTTLE, default=current_idle_throttle)] = selector.BooleanSelector()
+
+        # Laufzeit-Messung für die Diagnosedaten
+        schema_dict[vol.Required(CONF_INSTRUMENTATION, default=current_instrumentation)] = selector.BooleanSelector()
+
+        # Diagnose-Ring: Obergrenze in Zeilen (0 = aus)
+        schema_dict[vol.Required(CONF_TICK_RING_ROWS, default=current_tick_ring_rows)] = selector.NumberSelector(
+            selector.NumberSelectorConfig(
+                min=RANGE_TICK_RING_ROWS["min"],
+                max=RANGE_TICK_RING_ROWS["max"],
+                step=RANGE_TICK_RING_ROWS["step"],
+                mode=selector.NumberSelectorMode.BOX,
+            )
+        )
+
+        # Eingangs-Journal (Replay/Analyse eines falschen Residuums)
+        schema_dict[vol.Required(CONF_JOURNAL, default=current_journal)] = selector.BooleanSelector()
+
+        # Rechenkern in Worker-Prozessen (viele Zähler pro Instanz)
+        schema_dict[vol.Required(CONF_PROCESS_ENGINE, default=current_process_engine)] = selector.BooleanSelector()
+
         return self.async_show_form(
             step_id="init",
             data_schema=vol.Schema(schema_dict)
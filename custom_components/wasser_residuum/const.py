@@ -7,6 +7,10 @@ from homeassistant.const import Platform
 DOMAIN: Final[str] = "wasser_residuum"
 DATA_CTRL: Final[str] = "ctrl"
 
+# --- Persistenter Controller-Zustand (helpers.storage.Store) -------------------
+STORAGE_VERSION: Final[int] = 1
+STORAGE_KEY_PREFIX: Final[str] = f"{DOMAIN}.state"
+
 PLATFORMS: Final[tuple[Platform, ...]] = (
     Platform.SENSOR,
     Platform.BUTTON,
@@ -28,6 +32,18 @@ CONF_T_WARM: Final[str] = "t_warm"
 CONF_T_COLD: Final[str] = "t_cold"
 CONF_CLIP: Final[str] = "clip"
 CONF_MAX_RES_L: Final[str] = "max_residuum_l"
+CONF_PUBLISH_MIN_INTERVAL: Final[str] = "publish_min_interval"
+CONF_PUBLISH_HEARTBEAT: Final[str] = "publish_heartbeat"
+CONF_PUBLISH_DEADBAND: Final[str] = "publish_deadband"
+CONF_DIAG_PUBLISH_MIN_INTERVAL: Final[str] = "diag_publish_min_interval"
+CONF_DIAG_PUBLISH_HEARTBEAT: Final[str] = "diag_publish_heartbeat"
+CONF_DIAG_PUBLISH_DEADBAND: Final[str] = "diag_publish_deadband"
+CONF_INSTRUMENTATION: Final[str] = "instrumentation"
+CONF_SAMPLE_CADENCE: Final[str] = "sample_cadence"
+CONF_IDLE_THROTTLE: Final[str] = "idle_throttle"
+CONF_JOURNAL: Final[str] = "journal"
+CONF_PROCESS_ENGINE: Final[str] = "process_engine"
+CONF_TICK_RING_ROWS: Final[str] = "tick_ring_rows"
 
 # --- Defaults -----------------------------------------------------------------
 DEFAULT_NAME: Final[str] = "Wasser Residuum"
@@ -38,9 +54,42 @@ DEFAULT_T_COLD: Final[float] = 12.0
 DEFAULT_CLIP: Final[float] = 2.5
 DEFAULT_MAX_RES_L: Final[float] = 10.0
 DEFAULT_TOTAL_UNIT: Final[str] = "L"
+DEFAULT_PUBLISH_MIN_INTERVAL: Final[float] = 0.0  # s, 0 = kein Mindestabstand
+DEFAULT_PUBLISH_HEARTBEAT: Final[float] = 300.0  # s, spätestens dann immer schreiben
+DEFAULT_PUBLISH_DEADBAND: Final[float] = 1.0  # Faktor auf die Deadband je Sensor-Klasse
+# Dieselbe Policy getrennt für die Diagnose-Sensoren (Temperaturen, dT, K, ...)
+DEFAULT_DIAG_PUBLISH_MIN_INTERVAL: Final[float] = 0.0
+DEFAULT_DIAG_PUBLISH_HEARTBEAT: Final[float] = 300.0
+DEFAULT_DIAG_PUBLISH_DEADBAND: Final[float] = 1.0
+DEFAULT_INSTRUMENTATION: Final[bool] = False  # Stufen-Latenzen in den Diagnosedaten
+DEFAULT_SAMPLE_CADENCE: Final[float] = 1.0  # s, schnellere Samples werden pro Tick gemittelt
+DEFAULT_IDLE_THROTTLE: Final[bool] = False  # Im Deep-Sleep nur Aufwach-Detektor rechnen
+DEFAULT_JOURNAL: Final[bool] = False  # Eingangs-Journal für Replay/Analyse
+DEFAULT_PROCESS_ENGINE: Final[bool] = False  # Controller-Mathematik in Worker-Prozessen (engine.py)
+DEFAULT_TICK_RING_ROWS: Final[int] = 4096  # Obergrenze des Diagnose-Rings, ~76 B pro Zeile
+
+# --- Sample-Kanäle (Reorder-Puffer, Replay) -------------------------------------
+CHANNEL_TEMP: Final[int] = 0
+CHANNEL_TOTAL: Final[int] = 1
+
+# --- Services -----------------------------------------------------------------
+SERVICE_PROFILE: Final[str] = "profile"
+ATTR_SECONDS: Final[str] = "seconds"
+DEFAULT_PROFILE_SECONDS: Final[float] = 60.0
+SERVICE_RECALIBRATE: Final[str] = "recalibrate"
+ATTR_CONFIG_ENTRY_ID: Final[str] = "config_entry_id"
+ATTR_DAYS: Final[str] = "days"
+ATTR_FIT_THRESHOLDS: Final[str] = "fit_thresholds"
+ATTR_APPLY: Final[str] = "apply"
+DEFAULT_RECALIBRATE_DAYS: Final[float] = 14.0
 
 # --- Ranges für Config Flow / Options -----------------------------------------
 RANGE_K: Final[dict] = {"min": 0.5, "max": 10.0, "step": 0.1}
 RANGE_T: Final[dict] = {"min": 5.0, "max": 35.0, "step": 0.5}
 RANGE_CLIP: Final[dict] = {"min": 0.5, "max": 5.0, "step": 0.1}
 RANGE_MAX_RES: Final[dict] = {"min": 5.0, "max": 50.0, "step": 1.0}
+RANGE_PUBLISH_MIN_INTERVAL: Final[dict] = {"min": 0.0, "max": 300.0, "step": 1.0}
+RANGE_PUBLISH_HEARTBEAT: Final[dict] = {"min": 0.0, "max": 3600.0, "step": 10.0}
+RANGE_PUBLISH_DEADBAND: Final[dict] = {"min": 0.0, "max": 10.0, "step": 0.1}
+RANGE_SAMPLE_CADENCE: Final[dict] = {"min": 1.0, "max": 60.0, "step": 0.5}
+RANGE_TICK_RING_ROWS: Final[dict] = {"min": 0, "max": 86400, "step": 256}
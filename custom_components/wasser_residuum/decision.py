@@ -0,0 +1,147 @@
+"""
+Flow-Entscheidung und Integration eines Ticks auf Skalaren.
+
+Gemeinsam für den Controller (_evaluate_tick) und die Batch-Pipeline
+(batch.py): beide rufen dieselben Funktionen mit ihrem jeweiligen Zustand auf,
+damit Replay und Batch bit-gleich bleiben. Keine Objekte, keine Allokation
+außer dem Rückgabe-Tupel.
+"""
+from __future__ import annotations
+
+from .const import RANGE_K
+
+KMIN = float(RANGE_K.get("min", 0.5))
+KMAX = float(RANGE_K.get("max", 15.0))
+
+MAX_FLOW_L_MIN = 25.0
+COLD_PIPE_C = 10.0  # darunter: Varianz-Bestätigung, 3x-Gradient, Varianz-Schwelle 2x statt 4x
+DEEP_SLEEP_H = 2.0  # ohne Zapfung → Schwellwerte 20 % strenger
+DEEP_SLEEP_FACTOR = 1.2
+FLOW_CONFIRMATIONS = 3
+PLATEAU_MIN_FLOW = 2.0
+PLATEAU_FLOW_FACTOR = 0.8
+
+
+def interpolated_k(temp: float, k_warm: float, k_cold: float, t_warm: float, t_cold: float) -> float:
+    """K linear zwischen k_cold (<= t_cold) und k_warm (>= t_warm)."""
+    if temp >= t_warm:
+        return k_warm
+    if temp <= t_cold:
+        return k_cold
+    temp_range = t_warm - t_cold
+    if temp_range <= 0:
+        return k_warm
+    ratio = (temp - t_cold) / temp_range
+    return max(KMIN, min(KMAX, float(k_cold + ratio * (k_warm - k_cold))))
+
+
+def deep_sleep(now_ts: float, last_flow_time: float | None) -> bool:
+    """Länger als DEEP_SLEEP_H keine Zapfung (oder noch nie)."""
+    return last_flow_time is None or (now_ts - last_flow_time) / 3600.0 > DEEP_SLEEP_H
+
+
+def variance_flow(current_variance: float | None, baseline_variance: float, learn: bool,
+                  last_temp: float | None) -> tuple[float, float, bool]:
+    """
+    Varianz-Erkennung: (Baseline-Varianz, Ratio, Flow erkannt).
+
+    Die Baseline lernt nur ohne Flow (learn); None = Fenster noch zu kurz.
+    """
+    if current_variance is None:
+        return baseline_variance, 0.0, False
+    if learn:
+        baseline_variance = max(0.0001, 0.99 * baseline_variance + 0.01 * current_variance)
+    ratio = current_variance / baseline_variance
+    if last_temp is not None and last_temp < COLD_PIPE_C:
+        return baseline_variance, ratio, ratio > 2.0
+    return baseline_variance, ratio, ratio > 4.0
+
+
+def accept_threshold(now_ts: float, last_hydrus_change: float | None, sleeping: bool) -> float:
+    """Basis-Schwellwert für thermischen Flow nach Zeit seit dem letzten Zählerwechsel."""
+    if last_hydrus_change is None:
+        base = -0.10
+    else:
+        since_hydrus = now_ts - last_hydrus_change
+        if since_hydrus < 300:
+            base = -0.01
+        elif since_hydrus < 1800:
+            base = -0.08
+        else:
+            base = -0.20
+    if sleeping:
+        base *= DEEP_SLEEP_FACTOR
+    return base
+
+
+def decide(now_ts: float, dt_corrected: float, dt_gradient: float | None, filt_temp: float,
+           threshold_enter: float, variance_detected: bool, confirmations: int, flow_active: bool,
+           last_flow_time: float | None, last_hydrus_change: float | None,
+           clip: float) -> tuple[float, float, int, bool, int]:
+    """
+    Flow-Zustandsmaschine eines akzeptierten Ticks.
+
+    threshold_enter ohne Deep-Sleep-Faktor (Kurve aus _get_dynamic_threshold).
+    Rückgabe: (geclippter Gradient, 0 = kein thermischer Flow; wirksamer
+    Enter-Schwellwert; Bestätigungen; Flow aktiv; +1 Start / -1 Ende / 0).
+    """
+    sleeping = deep_sleep(now_ts, last_flow_time)
+    if sleeping:
+        threshold_enter *= DEEP_SLEEP_FACTOR
+
+    if filt_temp < COLD_PIPE_C:
+        # Kalt: schwacher Gradient nur mit Varianz-Bestätigung (sonst Abkühlung)
+        detected = (
+            dt_corrected < threshold_enter * 3.0
+            or (dt_corrected < threshold_enter and variance_detected)
+            or (variance_detected and dt_corrected < 0)
+        )
+    else:
+        detected = dt_corrected < threshold_enter
+    confirmations = confirmations + 1 if detected else 0
+    confirmed = confirmations >= FLOW_CONFIRMATIONS
+
+    transition = 0
+    clipped = 0.0
+    if (detected and confirmed) or flow_active:
+        if not flow_active and confirmed:
+            flow_active = True
+            transition = 1
+        # Ende nur bei steigender Temperatur und ohne erhöhte Varianz
+        if not detected and dt_corrected > 0.001 and not variance_detected:
+            flow_active = False
+            confirmations = 0
+            transition = -1
+        # Stetige Änderung (d²T/dt² ~ 0) ist Umgebung, keine Zapfung
+        if (
+            flow_active
+            and not (dt_gradient is not None and abs(dt_gradient) < 0.003)
+            and dt_corrected < accept_threshold(now_ts, last_hydrus_change, sleeping)
+        ):
+            clipped = -clip if dt_corrected < -clip else dt_corrected
+    return clipped, threshold_enter, confirmations, flow_active, transition
+
+
+def tick_flow(clipped: float, flow_active: bool, variance_detected: bool, k: float,
+              last_positive_flow: float) -> float:
+    """Flow in L/min: Gradient × K, sonst Plateau-Schätzung bei aktivem Flow und hoher Varianz."""
+    if clipped < 0.0:
+        return k * (-clipped)
+    if flow_active and variance_detected:
+        return max(PLATEAU_MIN_FLOW, last_positive_flow * PLATEAU_FLOW_FACTOR)
+    return 0.0
+
+
+def integrate(volume_l: float, uncertainty_l: float, flow_l_min: float, dt_s: float,
+              cap_l: float | None) -> tuple[float, float]:
+    """Volumen um Flow × dt erhöhen; nie negativ, nie über cap_l (Zählerstand + max. Residuum)."""
+    if dt_s <= 0:
+        return volume_l, uncertainty_l
+    delta = flow_l_min * (dt_s / 60.0)
+    volume_l += delta
+    uncertainty_l += abs(delta * 0.12)
+    if volume_l < 0:
+        volume_l = 0.0
+    if cap_l is not None and volume_l > cap_l:
+        volume_l = cap_l
+    return volume_l, uncertainty_l
@@ -0,0 +1,40 @@
+"""Diagnosedaten (Einstellungen → Geräte & Dienste → Diagnose herunterladen)."""
+from __future__ import annotations
+
+import base64
+from dataclasses import asdict
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DATA_CTRL, DOMAIN
+from .trace import TICK_RING_SPAN_S, encode_npz
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict[str, Any]:
+    ctrl = hass.data[DOMAIN][entry.entry_id][DATA_CTRL]
+    # Prozess-Backend: Records und Zähler aus dem Worker holen
+    await ctrl.async_sync_from_engine()
+    # Kopie im Event-Loop, Kompression im Executor
+    ring = ctrl.export_tick_ring(TICK_RING_SPAN_S)
+    tick_ring = None  # Option "tick_ring_rows" = 0
+    if ring is not None:
+        npz = await hass.async_add_executor_job(encode_npz, ring)
+        # Letzte 24 h pro Tick: np.load(io.BytesIO(base64.b64decode(data)))
+        tick_ring = {
+            "format": "npz",
+            "encoding": "base64",
+            "rows": len(ring["ts"]),
+            "data": base64.b64encode(npz).decode("ascii"),
+        }
+    return {
+        "data": dict(entry.data),
+        "options": dict(entry.options),
+        "snapshot": asdict(ctrl.snapshot),
+        "counters": dict(ctrl.counters),
+        "tick_records": ctrl.tick_record_count,
+        # None, solange die Option "instrumentation" aus ist
+        "instrumentation": ctrl.profiler.as_dict() if ctrl.profiler is not None else None,
+        "tick_ring": tick_ring,
+    }
@@ -0,0 +1,277 @@
+"""
+Sharded Ausführung vieler Controller in Worker-Prozessen (Flotten-Replay).
+
+Zähler werden per stabilem Hash ihrer ID auf Shards verteilt; jeder Shard hält
+seine Controller im Replay-Modus (ohne hass) in einem eigenen Prozess. Samples
+gehen gebündelt als Spalten-Arrays per Pipe an die Worker, zurück kommt pro
+Batch der letzte Snapshot je Zähler. ``workers=0`` rechnet im selben Prozess.
+
+An-/Abmelden, Methodenaufrufe (manuelle Änderungen) und Zustandsabfragen
+reisen als Ops im selben Batch, an ihrer Position zwischen den Samples; die
+Pipe wird so nur von flush/run benutzt. Im Betrieb (Option ``process_engine``)
+ruft der Domain-Hub take() im Event-Loop und run() im Executor auf.
+
+    python -m custom_components.wasser_residuum.engine --meters 200 --hours 24 --workers 4
+"""
+from __future__ import annotations
+
+import argparse
+import heapq
+import multiprocessing
+import os
+import time
+import zlib
+from array import array
+
+from .replay import CHANNEL_TEMP, ReplayClock, create_controller, synthetic_samples
+from .snapshot import ControllerSnapshot
+
+
+class _Shard:
+    """Controller eines Shards; läuft im Worker-Prozess oder inline."""
+
+    def __init__(self):
+        self.meters: dict[int, tuple[str, object, ReplayClock]] = {}
+
+    def add(self, index: int, meter_id: str, options: dict | None, total_unit: str,
+            header: dict | None = None) -> None:
+        clock = ReplayClock()
+        ctrl = create_controller(options, total_unit, clock)
+        if header is not None:
+            # Zustand des Controllers im Event-Loop übernehmen (Format: journal_header)
+            clock.now = header["state"]["saved_at"]
+            ctrl.load_journal_header(header)
+        self.meters[index] = (meter_id, ctrl, clock)
+
+    def _feed(self, touched: set, index, ts, channel, value) -> None:
+        meters = self.meters
+        for i, t, ch, v in zip(index, ts, channel, value):
+            _, ctrl, clock = meters[i]
+            clock.now = t
+            if ch == CHANNEL_TEMP:
+                ctrl.process_temperature(v, t)
+            else:
+                ctrl.process_total(v, t)
+            touched.add(i)
+
+    def run(self, index, ts, channel, value, ops=()) -> tuple[dict[str, ControllerSnapshot], dict[str, dict]]:
+        """
+        Samples (Spalten-Arrays, je Zähler zeitlich sortiert) und Ops verarbeiten.
+        Gibt (Snapshot je betroffenem Zähler, angeforderte Zustände) zurück.
+        """
+        meters = self.meters
+        touched: set[int] = set()
+        states: dict[str, dict] = {}
+        start = 0
+        for pos, op, i, payload in ops:
+            if pos > start:
+                self._feed(touched, index[start:pos], ts[start:pos], channel[start:pos], value[start:pos])
+                start = pos
+            if op == "add":
+                self.add(i, *payload)
+            elif op == "remove":
+                meters.pop(i, None)
+                touched.discard(i)
+            elif op == "call":
+                now, method, args, kwargs = payload
+                _, ctrl, clock = meters[i]
+                clock.now = now
+                getattr(ctrl, method)(*args, **kwargs)
+                ctrl.notify_entities()  # nicht jede Methode baut den Snapshot neu
+                touched.add(i)
+            elif op == "state":
+                meter_id, ctrl, clock = meters[i]
+                clock.now = payload
+                states[meter_id] = {"header": ctrl.journal_header(), "counters": dict(ctrl.counters)}
+        if start:
+            index, ts, channel, value = index[start:], ts[start:], channel[start:], value[start:]
+        self._feed(touched, index, ts, channel, value)
+        return {meters[i][0]: meters[i][1].snapshot for i in touched}, states
+
+
+def _worker(conn) -> None:
+    shard = _Shard()
+    while True:
+        msg = conn.recv()
+        if msg[0] == "run":
+            conn.send(shard.run(*msg[1:]))
+        else:
+            conn.close()
+            return
+
+
+class _Batch:
+    __slots__ = ("index", "ts", "channel", "value", "ops")
+
+    def __init__(self):
+        self.index = array("I")
+        self.ts = array("d")
+        self.channel = array("b")
+        self.value = array("d")
+        self.ops: list[tuple] = []  # (Sample-Position, Op, Index im Shard, Daten)
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def __bool__(self) -> bool:
+        return bool(self.ts) or bool(self.ops)
+
+
+class ShardedEngine:
+    """Controller-Mathematik für viele Zähler, verteilt auf Worker-Prozesse."""
+
+    def __init__(self, workers: int | None = None):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        n_shards = max(1, self.workers)
+        self._meter_slot: dict[str, tuple[int, int]] = {}  # meter_id → (Shard, Index im Shard)
+        self._next_index = [0] * n_shards  # Indizes werden nicht wiederverwendet
+        self._batches = [_Batch() for _ in range(n_shards)]
+        self._inline = _Shard() if self.workers == 0 else None
+        self._conns = []
+        self._procs = []
+        if self.workers:
+            # spawn statt fork: der Elternprozess (HA) ist multithreaded
+            ctx = multiprocessing.get_context("spawn")
+            for _ in range(n_shards):
+                parent, child = ctx.Pipe()
+                proc = ctx.Process(target=_worker, args=(child,), daemon=True)
+                proc.start()
+                child.close()
+                self._conns.append(parent)
+                self._procs.append(proc)
+
+    def __enter__(self) -> ShardedEngine:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _op(self, shard: int, op: str, index: int, payload) -> None:
+        batch = self._batches[shard]
+        batch.ops.append((len(batch), op, index, payload))
+
+    def add_meter(self, meter_id: str, options: dict | None = None, total_unit: str = "L",
+                  header: dict | None = None) -> None:
+        """Zähler anlegen, optional mit Zustand und Optionen aus einem journal_header()."""
+        shard = zlib.crc32(meter_id.encode()) % len(self._batches)
+        index = self._next_index[shard]
+        self._next_index[shard] += 1
+        self._meter_slot[meter_id] = (shard, index)
+        self._op(shard, "add", index, (meter_id, options, total_unit, header))
+
+    def remove_meter(self, meter_id: str) -> None:
+        shard, index = self._meter_slot.pop(meter_id)
+        self._op(shard, "remove", index, None)
+
+    def call(self, meter_id: str, now: float, method: str, *args, **kwargs) -> None:
+        """Controller-Methode im Worker aufrufen, nach allen bis hierhin eingereihten Samples."""
+        shard, index = self._meter_slot[meter_id]
+        self._op(shard, "call", index, (now, method, args, kwargs))
+
+    def request_state(self, meter_id: str, now: float) -> None:
+        """Zustand (journal_header + Zähler) mit dem nächsten Batch zurückholen; Uhr auf now."""
+        shard, index = self._meter_slot[meter_id]
+        self._op(shard, "state", index, now)
+
+    def submit(self, meter_id: str, ts: float, channel: int, value: float) -> None:
+        """Sample vormerken; verarbeitet wird beim nächsten flush (je Zähler in Einreihungsfolge)."""
+        shard, index = self._meter_slot[meter_id]
+        batch = self._batches[shard]
+        batch.index.append(index)
+        batch.ts.append(ts)
+        batch.channel.append(channel)
+        batch.value.append(value)
+
+    @property
+    def pending(self) -> bool:
+        return any(self._batches)
+
+    def take(self) -> list[_Batch]:
+        """Vorgemerkte Batches übernehmen (im Thread der submit-Aufrufe); danach run()."""
+        batches, self._batches = self._batches, [_Batch() for _ in self._batches]
+        return batches
+
+    def run(self, batches: list[_Batch]) -> tuple[dict[str, ControllerSnapshot], dict[str, dict]]:
+        """Batches rechnen (blockiert): letzter Snapshot je betroffenem Zähler, angeforderte Zustände."""
+        if self._inline is not None:
+            batch = batches[0]
+            return self._inline.run(batch.index, batch.ts, batch.channel, batch.value, batch.ops)
+        # Erst an alle Shards senden, dann einsammeln: Shards rechnen parallel
+        pending = []
+        for conn, batch in zip(self._conns, batches):
+            if batch:
+                conn.send(("run", batch.index, batch.ts, batch.channel, batch.value, batch.ops))
+                pending.append(conn)
+        snapshots: dict[str, ControllerSnapshot] = {}
+        states: dict[str, dict] = {}
+        for conn in pending:
+            shard_snapshots, shard_states = conn.recv()
+            snapshots.update(shard_snapshots)
+            states.update(shard_states)
+        return snapshots, states
+
+    def flush(self) -> dict[str, ControllerSnapshot]:
+        """Alle vorgemerkten Samples verarbeiten; letzter Snapshot je betroffenem Zähler."""
+        return self.run(self.take())[0]
+
+    def close(self) -> None:
+        for conn in self._conns:
+            try:
+                conn.send(("close",))
+            except OSError:
+                pass  # Worker bereits beendet
+            conn.close()
+        for proc in self._procs:
+            proc.join(timeout=5.0)
+            if proc.is_alive():
+                proc.terminate()
+        self._conns = []
+        self._procs = []
+
+
+def _meter_samples(n: int, hours: float):
+    meter_id = f"meter_{n:04d}"
+    for ts, channel, value in synthetic_samples(hours, seed=n):
+        yield ts, meter_id, channel, value
+
+
+def _fleet_samples(meters: int, hours: float):
+    """Synthetische Samples aller Zähler, zeitlich gemischt: (ts, meter_id, channel, value)."""
+    return heapq.merge(*(_meter_samples(n, hours) for n in range(meters)), key=lambda s: s[0])
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Durchsatz des Sharded-Engines (synthetische Flotte)")
+    parser.add_argument("--meters", type=int, default=100)
+    parser.add_argument("--hours", type=float, default=24.0)
+    parser.add_argument("--workers", type=int, help="Worker-Prozesse (0 = inline, Standard: alle Kerne)")
+    parser.add_argument("--batch-seconds", type=float, default=60.0,
+                        help="Simulierte Sekunden pro Batch")
+    args = parser.parse_args(argv)
+
+    samples = list(_fleet_samples(args.meters, args.hours))
+    with ShardedEngine(args.workers) as engine:
+        for n in range(args.meters):
+            engine.add_meter(f"meter_{n:04d}")
+        start = time.perf_counter()
+        batch_end = samples[0][0] + args.batch_seconds if samples else 0.0
+        for ts, meter_id, channel, value in samples:
+            if ts >= batch_end:
+                engine.flush()
+                batch_end = ts + args.batch_seconds
+            engine.submit(meter_id, ts, channel, value)
+        engine.flush()
+        elapsed = time.perf_counter() - start
+
+    cores = max(1, engine.workers)
+    rate = len(samples) / max(elapsed, 1e-9)
+    # Echtzeit-Last eines Zählers: Samples pro Sekunde der synthetischen Daten
+    per_meter = len(samples) / max(args.meters * args.hours * 3600.0, 1e-9)
+    print(f"{len(samples):,} Samples von {args.meters} Zählern in {elapsed:.2f} s "
+          f"({rate:,.0f} Samples/s, {cores} Kern(e))")
+    print(f"Echtzeit-Kapazität: {rate / per_meter:,.0f} Zähler gesamt, "
+          f"{rate / per_meter / cores:,.0f} Zähler pro Kern")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Numerische State-Historie aus dem Recorder (optional, nur im Executor)."""
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+from functools import partial
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.recorder import async_wait_recorder
+from homeassistant.util import dt as dt_util
+
+_LOGGER = logging.getLogger(__name__)
+
+
+# Abfrage in Tages-Stücken: pro Stück nur (ts, Wert) behalten, nicht alle States
+HISTORY_CHUNK_S = 86400.0
+# Der Recorder filtert start < ts < end; das nächste Stück beginnt knapp davor
+_CHUNK_OVERLAP = timedelta(milliseconds=1)
+
+
+def state_timestamp(state) -> float:
+    """Quell-Zeitpunkt eines Live-States (last_reported ab HA 2024.4, sonst last_updated)."""
+    reported = getattr(state, "last_reported", None)
+    return (reported or state.last_updated).timestamp()
+
+
+def _numeric_history(hass: HomeAssistant, entity_ids: list[str], start, end) -> dict[str, list[tuple[float, float]]]:
+    from homeassistant.components.recorder import history
+
+    result: dict[str, list[tuple[float, float]]] = {entity_id: [] for entity_id in entity_ids}
+    chunk = timedelta(seconds=HISTORY_CHUNK_S)
+    lo = start
+    while lo < end:
+        hi = min(lo + chunk, end)
+        lo_ts = lo.timestamp()
+        for entity_id in entity_ids:
+            # Ohne künstlichen Start-State (trüge den Zeitstempel des Stück-Anfangs)
+            states = history.state_changes_during_period(
+                hass, lo - _CHUNK_OVERLAP, hi, entity_id,
+                no_attributes=True, include_start_time_state=False,
+            ).get(entity_id, [])
+            samples = result[entity_id]
+            for state in states:
+                # Recorder-Zeilen: last_updated = Zeitpunkt der Zeile (last_reported
+                # gehört zur letzten Meldung des unveränderten States, nicht zur Zeile)
+                ts = state.last_updated.timestamp()
+                if ts < lo_ts and lo is not start:
+                    continue  # schon im vorigen Stück
+                try:
+                    samples.append((ts, float(state.state)))
+                except (ValueError, TypeError):
+                    continue
+        lo = hi
+    for samples in result.values():
+        samples.sort()
+    return result
+
+
+async def async_numeric_history(
+    hass: HomeAssistant, entity_ids: list[str], seconds: float
+) -> dict[str, list[tuple[float, float]]] | None:
+    """
+    (ts, Wert) je Entity der letzten ``seconds``, in einem Recorder-Executor-Job
+    (tageweise abgefragt, siehe HISTORY_CHUNK_S). None, wenn der Recorder fehlt
+    oder die Abfrage scheitert.
+    """
+    if not await async_wait_recorder(hass):
+        return None
+    from homeassistant.components.recorder import get_instance
+
+    end = dt_util.utcnow()
+    start = end - timedelta(seconds=seconds)
+    try:
+        return await get_instance(hass).async_add_executor_job(
+            partial(_numeric_history, hass, entity_ids, start, end)
+        )
+    except Exception as e:
+        _LOGGER.warning("Recorder-Historie nicht lesbar: %s", e)
+        return None
@@ -0,0 +1,293 @@
+"""
+Domain-Hub: ein State-Listener, ein Speicher-Timer und ein gebündelter
+Entity-Fan-out für alle Controller (viele Wohnungszähler pro HA-Instanz).
+
+Events werden per entity_id an die Controller verteilt. Alle Controller, die
+im selben Event-Loop-Durchlauf Samples bekommen haben, werden in einem
+einzigen call_soon abgearbeitet; ihre Entity-Updates laufen danach gesammelt.
+
+Controller mit der Option ``process_engine`` geben ihre Samples an einen
+gemeinsamen ShardedEngine (Worker-Prozesse). Ein Task schickt die gesammelten
+Batches im Executor ab, solange welche anstehen, und verteilt die Snapshots.
+Zum Speichern, Abmelden und Stoppen wird der Zustand aus den Workern geholt.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import timedelta
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_state_change_event, async_track_time_interval
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_HUB = f"{DOMAIN}_hub"
+
+# Persistenter Zustand aller Controller: periodisch + beim Stoppen speichern
+STATE_SAVE_INTERVAL = timedelta(minutes=5)
+
+
+class WasserResiduumHub:
+    """Gemeinsame Event-Quelle und Scheduler aller Config-Entries der Domain."""
+
+    def __init__(self, hass: HomeAssistant):
+        self.hass = hass
+        self._controllers: list = []
+        # entity_id → Event-Handler der Controller (mehrere Einträge dürfen sich eine Entity teilen)
+        self._routes: dict[str, list] = {}
+        # Einfügereihenfolge = Reihenfolge der Abarbeitung (dict als geordnetes Set)
+        self._pending_drain: dict = {}
+        self._pending_notify: dict = {}
+        self._flush_handle: asyncio.Handle | None = None
+        self._remove_state_listener = None
+        self._remove_save_interval = None
+        self._remove_stop_listener = None
+        # Prozess-Backend: erst mit dem ersten Controller gestartet
+        self._engine = None  # engine.ShardedEngine
+        self._engine_lock = asyncio.Lock()
+        self._engine_ctrls: dict[str, object] = {}  # entry_id → Controller
+        self._engine_task: asyncio.Task | None = None
+        # Controller mit Aufrufen, die noch in keinem gerechneten Batch stecken (kein Auto-K übernehmen)
+        self._engine_dirty: set = set()
+
+    @property
+    def controllers(self) -> list:
+        return list(self._controllers)
+
+    @callback
+    def async_add(self, ctrl) -> None:
+        if not self._controllers:
+            self._remove_save_interval = async_track_time_interval(
+                self.hass, self._async_save_all, STATE_SAVE_INTERVAL
+            )
+            self._remove_stop_listener = self.hass.bus.async_listen_once(
+                EVENT_HOMEASSISTANT_STOP, self._async_on_stop
+            )
+        self._controllers.append(ctrl)
+        self._routes.setdefault(ctrl.temp_entity, []).append(ctrl._on_temp_entity_changed)
+        self._routes.setdefault(ctrl.total_entity, []).append(ctrl._on_total_entity_changed)
+        self._async_resubscribe()
+
+    @callback
+    def async_remove(self, ctrl) -> None:
+        """Controller austragen; ausstehende Samples bleiben im Controller (async_stop leert sie)."""
+        if ctrl not in self._controllers:
+            return
+        self._controllers.remove(ctrl)
+        for entity_id, handler in (
+            (ctrl.temp_entity, ctrl._on_temp_entity_changed),
+            (ctrl.total_entity, ctrl._on_total_entity_changed),
+        ):
+            handlers = self._routes.get(entity_id)
+            if handlers is not None:
+                handlers.remove(handler)
+                if not handlers:
+                    del self._routes[entity_id]
+        self._pending_drain.pop(ctrl, None)
+        self._pending_notify.pop(ctrl, None)
+        self._async_resubscribe()
+        if not self._controllers:
+            self._async_shutdown()
+
+    @callback
+    def _async_resubscribe(self) -> None:
+        # Ein Tracker für die Vereinigung aller Entities; HA verteilt intern per
+        # entity_id-Index, wir per Routing-Tabelle an die Controller.
+        if self._remove_state_listener is not None:
+            self._remove_state_listener()
+            self._remove_state_listener = None
+        if self._routes:
+            self._remove_state_listener = async_track_state_change_event(
+                self.hass, list(self._routes), self._on_state_changed
+            )
+
+    @callback
+    def _async_shutdown(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._remove_save_interval is not None:
+            self._remove_save_interval()
+            self._remove_save_interval = None
+        if self._remove_stop_listener is not None:
+            self._remove_stop_listener()
+            self._remove_stop_listener = None
+
+    @callback
+    def _on_state_changed(self, event: Event) -> None:
+        for handler in self._routes.get(event.data["entity_id"], ()):
+            handler(event)
+
+    # --- Gebündelte Abarbeitung pro Event-Loop-Durchlauf -----------------------
+
+    def schedule_drain(self, ctrl) -> None:
+        """Reorder-Puffer des Controllers im nächsten Flush sortiert abarbeiten."""
+        self._pending_drain[ctrl] = None
+        self._schedule_flush()
+
+    def schedule_notify(self, ctrl) -> None:
+        """Entity-Update des Controllers auf den nächsten Flush verschieben (einmal pro Durchlauf)."""
+        if ctrl.engine_attached:
+            # Angezeigt wird der Snapshot aus dem Worker (weitergereichte Aufrufe liefern einen)
+            self._schedule_engine()
+            return
+        self._pending_notify[ctrl] = None
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self._flush_handle is None:
+            self._flush_handle = self.hass.loop.call_soon(self._flush)
+
+    @callback
+    def _flush(self) -> None:
+        # Handle erst am Ende freigeben: Notifies aus dem Drain landen im selben Flush
+        pending_drain, self._pending_drain = self._pending_drain, {}
+        for ctrl in pending_drain:
+            ctrl._drain_samples()
+        pending_notify, self._pending_notify = self._pending_notify, {}
+        for ctrl in pending_notify:
+            prof = ctrl.profiler
+            if prof is None:
+                ctrl._notify_entities_now()
+                continue
+            # Eigentlicher Fan-out (Snapshot + Entity-Callbacks), nicht das Vormerken
+            t = time.perf_counter()
+            ctrl._notify_entities_now()
+            prof.lap("notify", t)
+        self._flush_handle = None
+        if self._pending_drain or self._pending_notify:
+            # Aus Entity-Callbacks nachgeschoben → nächster Durchlauf
+            self._schedule_flush()
+
+    # --- Prozess-Backend ----------------------------------------------------------
+
+    async def async_attach_engine(self, ctrl) -> None:
+        """Controller samt Zustand an die Worker übergeben; startet sie beim ersten Mal (Executor)."""
+        # engine importiert replay → Controller-Modul (zirkulär beim Laden des Pakets)
+        from .engine import ShardedEngine
+
+        async with self._engine_lock:
+            if self._engine is None:
+                self._engine = await self.hass.async_add_executor_job(ShardedEngine)
+                _LOGGER.info("Prozess-Backend gestartet: %d Worker", self._engine.workers)
+        if ctrl.journal is not None:
+            # Segment-Header bräuchten den Worker-Zustand bei jedem Sample
+            _LOGGER.warning("Eingangs-Journal ist im Prozess-Backend nicht verfügbar, deaktiviert")
+            ctrl.set_options(journal=False)
+        meter_id = ctrl.entry.entry_id
+        self._engine.add_meter(meter_id, dict(ctrl.entry.options), ctrl.total_unit, ctrl.journal_header())
+        self._engine_ctrls[meter_id] = ctrl
+        ctrl.engine_attached = True
+
+    async def async_detach_engine(self, ctrls) -> None:
+        """Zustand zurückholen und Controller abmelden; der letzte stoppt die Worker."""
+        ctrls = [ctrl for ctrl in ctrls if ctrl.engine_attached]
+        if not ctrls:
+            return
+        await self.async_sync_engine(ctrls)
+        if self._engine is None:
+            return  # Worker ausgefallen, Controller sind schon abgemeldet
+        for ctrl in ctrls:
+            meter_id = ctrl.entry.entry_id
+            self._engine.remove_meter(meter_id)
+            del self._engine_ctrls[meter_id]
+            ctrl.engine_attached = False
+            self._engine_dirty.discard(ctrl)
+        if self._engine_ctrls:
+            self._schedule_engine()
+            return
+        engine, self._engine = self._engine, None
+        if self._engine_task is not None:
+            await self._engine_task
+        await self.hass.async_add_executor_job(engine.close)
+
+    def engine_submit(self, ctrl, ts: float, channel: int, value: float) -> None:
+        self._engine.submit(ctrl.entry.entry_id, ts, channel, value)
+        self._schedule_engine()
+
+    def engine_call(self, ctrl, method: str, *args, **kwargs) -> None:
+        self._engine.call(ctrl.entry.entry_id, ctrl._clock(), method, *args, **kwargs)
+        self._engine_dirty.add(ctrl)
+        self._schedule_engine()
+
+    async def async_sync_engine(self, ctrls) -> None:
+        """Zustand der Worker-Controller übernehmen (nach allen bis jetzt übergebenen Samples)."""
+        for ctrl in ctrls:
+            self._engine.request_state(ctrl.entry.entry_id, ctrl._clock())
+        self._schedule_engine()
+        if self._engine_task is not None:
+            await self._engine_task
+
+    def _schedule_engine(self) -> None:
+        if self._engine_task is None and self._engine is not None:
+            self._engine_task = self.hass.async_create_task(self._async_run_engine())
+
+    async def _async_run_engine(self) -> None:
+        """Batches nacheinander im Executor rechnen, bis keine mehr anstehen."""
+        engine = self._engine
+        try:
+            while engine.pending:
+                batches = engine.take()
+                self._engine_dirty.clear()
+                try:
+                    snapshots, states = await self.hass.async_add_executor_job(engine.run, batches)
+                except (EOFError, OSError) as e:
+                    self._engine_failed(e)
+                    return
+                # Zustände immer übernehmen: eine spätere eigene Änderung kommt mit dem
+                # nächsten Snapshot zurück, K wird dann erst übernommen
+                for meter_id, state in states.items():
+                    ctrl = self._engine_ctrls.get(meter_id)
+                    if ctrl is not None:
+                        ctrl.load_engine_state(state)
+                for meter_id, snap in snapshots.items():
+                    ctrl = self._engine_ctrls.get(meter_id)
+                    if ctrl is not None:
+                        ctrl.apply_engine_snapshot(snap, ctrl not in self._engine_dirty)
+        finally:
+            self._engine_task = None
+
+    def _engine_failed(self, error: Exception) -> None:
+        """Worker weg: Controller rechnen ab dem zuletzt abgeglichenen Zustand wieder selbst."""
+        _LOGGER.error(
+            "Prozess-Backend: Worker nicht erreichbar (%s); %d Zähler rechnen im Event-Loop weiter",
+            error, len(self._engine_ctrls),
+        )
+        for ctrl in self._engine_ctrls.values():
+            ctrl.engine_attached = False
+        self._engine_ctrls.clear()
+        self._engine_dirty.clear()
+        engine, self._engine = self._engine, None
+        self.hass.async_add_executor_job(engine.close)
+
+    # --- Persistenz --------------------------------------------------------------
+
+    async def _async_save_all(self, _now=None) -> None:
+        if self._engine_ctrls:
+            await self.async_sync_engine(list(self._engine_ctrls.values()))
+        if self._controllers:
+            await asyncio.gather(*(ctrl.async_save_state() for ctrl in self._controllers))
+
+    async def _async_on_stop(self, _event: Event) -> None:
+        # listen_once ist nach dem Auslösen verbraucht
+        self._remove_stop_listener = None
+        # Worker stoppen; späte Samples rechnen die Controller wieder selbst
+        await self.async_detach_engine(list(self._engine_ctrls.values()))
+        # Vorgemerkte K-/Optionswerte vor dem finalen Schreiben der ConfigEntries sichern
+        for ctrl in self._controllers:
+            ctrl._async_flush_options()
+        await self._async_save_all()
+
+
+@callback
+def async_get_hub(hass: HomeAssistant) -> WasserResiduumHub:
+    """Hub der Domain (eigener hass.data-Key, hass.data[DOMAIN] bleibt entry_id → Daten)."""
+    hub = hass.data.get(DATA_HUB)
+    if hub is None:
+        hub = hass.data[DATA_HUB] = WasserResiduumHub(hass)
+    return hub
@@ -0,0 +1,251 @@
+"""
+Append-only Eingangs-Journal: jedes verarbeitete Sample (nach Reorder-Puffer
+und Late-Filter) als feste 17-Byte-Zeile ``<dBd`` (ts, Kanal, Wert).
+
+Der Controller hängt im Event-Loop nur an einen Puffer an; geschrieben wird
+gebündelt im Executor. Segmente heißen nach dem ersten Zeitstempel, jeder
+Start, jede Rotation (Größe) und jede manuelle Änderung (Optionen, Reset,
+Kalibrierung) beginnt ein neues. Jedes Segment beginnt mit einem Header
+(``WRJ1``, Länge, JSON): Controller-Zustand und wirksame Optionen vor dem
+ersten Sample. Innerhalb eines Segments steigen die Zeitstempel, ein
+Zeitbereich wird per Binärsuche angesprungen.
+
+    python -m custom_components.wasser_residuum.journal <verzeichnis> --start 1700000000
+
+Der Replay beginnt am Anfang des Segments, in dem --start liegt; jedes
+Segment startet mit seinem Header-Zustand und liefert bit-identische Werte
+(Flow, Volume, Residuum, K) wie der laufende Controller, auch nach einem
+Warmstart oder manuellen Änderungen. Nur der Snapshot-Zeitstempel ist im
+Betrieb die Uhrzeit der Veröffentlichung statt der Sample-Zeit.
+"""
+from __future__ import annotations
+
+import argparse
+import bisect
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+
+RECORD = struct.Struct("<dBd")
+_TS = struct.Struct("<d")
+HEADER_MAGIC = b"WRJ1"
+_HEADER = struct.Struct("<4sI")  # Magic, Länge des JSON-Teils
+SEGMENT_SUFFIX = ".wrj"
+SEGMENT_BYTES = 4 * 1024 * 1024  # ~250k Samples pro Segment
+MAX_SEGMENTS = 16
+
+
+def segment_name(start_ts: float) -> str:
+    # Feste Breite → lexikografisch = zeitlich sortiert
+    return f"{start_ts:017.6f}{SEGMENT_SUFFIX}"
+
+
+def segments(directory: str) -> list[tuple[float, str]]:
+    """(Start-ts, Pfad) aller Segmente, aufsteigend."""
+    if not os.path.isdir(directory):
+        return []
+    result = []
+    for name in os.listdir(directory):
+        if name.endswith(SEGMENT_SUFFIX):
+            try:
+                start_ts = float(name[: -len(SEGMENT_SUFFIX)])
+            except ValueError:
+                continue
+            result.append((start_ts, os.path.join(directory, name)))
+    result.sort()
+    return result
+
+
+class InputJournal:
+    """
+    Schreibseite. append()/start_segment()/seal() laufen im Event-Loop,
+    write_sealed() im Executor; versiegelte Blöcke werden unter Lock in
+    Reihenfolge geschrieben.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = SEGMENT_BYTES, max_segments: int = MAX_SEGMENTS):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self.records_written = 0
+        self._buffer = bytearray()
+        self._buffer_start = 0.0
+        self._buffer_header: dict | None = None
+        self._sealed: deque[tuple[float, dict | None, bytes]] = deque()
+        self._lock = threading.Lock()
+        self._segment_size: int | None = None  # None → nächstes Sample beginnt ein Segment
+        self._path: str | None = None
+
+    @property
+    def pending(self) -> int:
+        """Noch nicht versiegelte Samples."""
+        return len(self._buffer) // RECORD.size
+
+    @property
+    def needs_segment(self) -> bool:
+        """True, wenn vor dem nächsten append() start_segment() fällig ist."""
+        return self._segment_size is None or self._segment_size >= self.segment_bytes
+
+    def rotate(self) -> None:
+        """Mit dem nächsten Sample ein neues Segment (mit neuem Header) beginnen."""
+        self._segment_size = None
+
+    def start_segment(self, ts: float, header: dict) -> None:
+        """Neues Segment ab ts; header (JSON-tauglich) wird erst beim Schreiben serialisiert."""
+        self.seal()
+        self._buffer_start = ts
+        self._buffer_header = header
+        self._segment_size = 0
+
+    def append(self, ts: float, channel: int, value: float) -> None:
+        if not self._buffer:
+            self._buffer_start = ts
+        self._buffer += RECORD.pack(ts, channel, value)
+        self._segment_size += RECORD.size
+
+    def seal(self) -> bool:
+        """Puffer als Block für write_sealed() abschließen; True, wenn es etwas zu schreiben gibt."""
+        if self._buffer or self._buffer_header is not None:
+            self._sealed.append((self._buffer_start, self._buffer_header, bytes(self._buffer)))
+            self._buffer.clear()
+            self._buffer_header = None
+        return bool(self._sealed)
+
+    def write_sealed(self) -> None:
+        """Alle versiegelten Blöcke anhängen (blockierend, Executor)."""
+        with self._lock:
+            rotated = False
+            while self._sealed:
+                start_ts, header, data = self._sealed.popleft()
+                records = len(data) // RECORD.size
+                if header is not None:
+                    os.makedirs(self.directory, exist_ok=True)
+                    # Gleicher Start-ts (z.B. nach Neustart): nie an ein fremdes Segment anhängen
+                    while os.path.exists(os.path.join(self.directory, segment_name(start_ts))):
+                        start_ts += 1e-6
+                    payload = json.dumps(header, separators=(",", ":")).encode()
+                    data = _HEADER.pack(HEADER_MAGIC, len(payload)) + payload + data
+                    self._path = None
+                    path = os.path.join(self.directory, segment_name(start_ts))
+                    rotated = True
+                elif self._path is None:
+                    continue  # Segmentanfang nicht geschrieben → ohne Header nicht replaybar
+                else:
+                    path = self._path
+                with open(path, "ab") as f:
+                    f.write(data)
+                self._path = path
+                self.records_written += records
+            if rotated:
+                for _, path in segments(self.directory)[: -self.max_segments]:
+                    os.remove(path)
+
+
+class _SegmentTimestamps:
+    """Zeitstempel eines gemappten Segments als Sequenz für bisect (8 Bytes pro Zugriff)."""
+
+    __slots__ = ("_buf", "_offset", "_n")
+
+    def __init__(self, buf, offset: int, n: int):
+        self._buf = buf
+        self._offset = offset
+        self._n = n
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i: int) -> float:
+        return _TS.unpack_from(self._buf, self._offset + i * RECORD.size)[0]
+
+
+def read_header(path: str) -> dict:
+    """Header eines Segments (Controller-Zustand und Optionen vor dem ersten Sample)."""
+    with open(path, "rb") as f:
+        magic, length = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != HEADER_MAGIC:
+            raise ValueError(f"{path}: kein Journal-Segment")
+        return json.loads(f.read(length))
+
+
+def _segment_records(path: str, start: float, end: float) -> Iterator[tuple[float, int, float]]:
+    size = os.path.getsize(path)
+    if size < _HEADER.size:
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        magic, length = _HEADER.unpack_from(buf)
+        if magic != HEADER_MAGIC:
+            raise ValueError(f"{path}: kein Journal-Segment")
+        offset = _HEADER.size + length
+        n = max(0, size - offset) // RECORD.size  # angerissene letzte Zeile ignorieren
+        stamps = _SegmentTimestamps(buf, offset, n)
+        lo = bisect.bisect_left(stamps, start)
+        hi = bisect.bisect_left(stamps, end, lo)
+        yield from RECORD.iter_unpack(buf[offset + lo * RECORD.size:offset + hi * RECORD.size])
+
+
+def _select(directory: str, start: float, end: float) -> list[tuple[float, str]]:
+    """Segmente, die [start, end) berühren (ab dem, in dem start liegt)."""
+    segs = segments(directory)
+    first = max(0, bisect.bisect_right([s for s, _ in segs], start) - 1)
+    return [(start_ts, path) for start_ts, path in segs[first:] if start_ts < end]
+
+
+def read(directory: str, start: float = float("-inf"), end: float = float("inf")) -> Iterator[tuple[float, int, float]]:
+    """Samples mit start <= ts < end; Segmente per Name, Zeilen per Binärsuche gewählt."""
+    for _, path in _select(directory, start, end):
+        yield from _segment_records(path, start, end)
+
+
+def main(argv: list[str] | None = None) -> None:
+    from .replay import ReplayClock, _parse_options, create_controller, feed
+    from .trace import TickTrace
+
+    parser = argparse.ArgumentParser(description="Wasser-Residuum Replay aus dem Eingangs-Journal")
+    parser.add_argument("directory", help="Journal-Verzeichnis (<config>/wasser_residuum_journal/<entry_id>)")
+    parser.add_argument("--total-unit", default="L", choices=["L", "m3"])
+    parser.add_argument("--start", type=float, default=float("-inf"),
+                        help="Unix-Sekunden; der Replay beginnt am Anfang des Segments, in dem start liegt")
+    parser.add_argument("--end", type=float, default=float("inf"), help="Unix-Sekunden (exklusive)")
+    parser.add_argument("--cold", action="store_true",
+                        help="Header ignorieren: ein Kaltstart-Controller über alle Segmente")
+    parser.add_argument("--option", action="append", default=[], metavar="KEY=VALUE",
+                        help="Controller-Option, z.B. k_warm=4.5 (mehrfach möglich, gilt über den Header)")
+    parser.add_argument("--out", help="Trace als CSV schreiben")
+    args = parser.parse_args(argv)
+
+    overrides = _parse_options(args.option)
+    clock = ReplayClock()
+    trace = TickTrace()
+    ctrl = None
+    selected = _select(args.directory, args.start, args.end)
+    start = time.perf_counter()
+    samples = 0
+    for _, path in selected:
+        if ctrl is None or not args.cold:
+            # Jedes Segment ab seinem Header: Zustand vor dem ersten Sample, Alter 0
+            ctrl = create_controller(overrides, args.total_unit, clock)
+            ctrl.register_entity_listener(lambda c=ctrl: trace.append_snapshot(c.snapshot))
+            if not args.cold:
+                header = read_header(path)
+                clock.now = header["state"]["saved_at"]
+                ctrl.load_journal_header(header)
+                ctrl.load_journal_options(overrides)
+        samples += feed(ctrl, clock, _segment_records(path, float("-inf"), args.end))
+    elapsed = time.perf_counter() - start
+
+    print(f"{samples:,} Samples aus {len(selected)} Segment(en), {len(trace):,} Ticks in {elapsed:.2f} s")
+    if ctrl is None:
+        return
+    snap = ctrl.snapshot
+    print(f"Volume {snap.volume_l:.3f} L, Residuum {snap.residuum_l:.3f} L")
+    if args.out:
+        trace.write_csv(args.out)
+
+
+if __name__ == "__main__":
+    main()
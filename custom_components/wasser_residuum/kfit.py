@@ -0,0 +1,292 @@
+"""
+K(T)-Regression aus gespeicherten 10L-Tick-Records.
+
+Ein Record hält pro Hydrus-Intervall das Volumen bei K=1 je Temperatur-Bin
+(Gradient-Modus, linear in K), das K-unabhängige Plateau-Volumen, das
+Zähler-Delta, die mittlere Temperatur und die Dauer. K(T) ist stückweise
+linear (k_cold bis t_cold, k_warm ab t_warm); bei festen Schwellen ist das
+Volumen linear in (k_cold, k_warm) und per gewichteter kleinster Quadrate
+geschlossen lösbar.
+
+Für die laufende Nachführung (feste Schwellen) hält TickRecords je Record die
+auf (kalt, warm) reduzierte Design-Zeile; fit() baut sie für beliebige
+Schwellen aus der vollen Bin-Matrix (Kalibrier-Service). Beide lösen über solve().
+"""
+from __future__ import annotations
+
+import math
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+
+import numpy as np
+
+BIN_K = 0.25  # Breite der Temperatur-Bins
+TICK_RANGE_L = (9.5, 10.5)  # nur einzelne 10L-Ticks
+PLATEAU_MAX_FRACTION = 0.1  # Plateau-Volumen höchstens 10 % des Zähler-Deltas
+RECORDS_MAX = 2000  # ~2 Monate bei 30 Ticks/Tag
+
+# Eine K-Seite (kalt/warm) wird nur gefittet, wenn sie mindestens diesen Anteil
+# am K=1-Volumen trägt und in genug Records den Hauptanteil stellt
+SIDE_MIN_SHARE = 0.15
+SIDE_RECORD_SHARE = 0.25
+SIDE_MIN_RECORDS = 10
+
+# Spalten im Store; Bins flach als (Anzahl je Record, Bin-Index, Volumen)
+RECORD_COLUMNS = ("ts", "duration_s", "avg_temp", "fixed_l", "target_l")
+
+
+def temp_bin(temp: float) -> int:
+    return round(temp / BIN_K)
+
+
+def _warm_weight(temp: float, t_cold: float, t_warm: float) -> float:
+    """Anteil von k_warm bei temp (skalar wie _warm_share)."""
+    if t_warm <= t_cold:
+        return 1.0 if temp >= t_warm else 0.0
+    return min(1.0, max(0.0, (temp - t_cold) / (t_warm - t_cold)))
+
+
+def usable(unit_bins: dict, fixed_l: float, target_l: float) -> bool:
+    """Nur Intervalle mit Gradient-Volumen, einem 10L-Tick und kleinem Plateau-Anteil sagen etwas über K."""
+    return (
+        bool(unit_bins)
+        and TICK_RANGE_L[0] <= target_l <= TICK_RANGE_L[1]
+        and fixed_l <= PLATEAU_MAX_FRACTION * target_l
+    )
+
+
+@dataclass
+class CalibrationData:
+    """Design-Matrix der Records: K=1-Volumen je Bin, Plateau-Volumen, Zähler-Delta."""
+
+    ts: np.ndarray  # (Records,)
+    bin_temps: np.ndarray  # (Bins,) Bin-Mitte in °C
+    unit_l: np.ndarray  # (Records, Bins)
+    fixed_l: np.ndarray  # (Records,)
+    target_l: np.ndarray  # (Records,)
+
+    def __len__(self) -> int:
+        return len(self.target_l)
+
+
+class TickRecords:
+    """
+    Ring der letzten ``maxlen`` Records (None = unbegrenzt, z.B. im Replay).
+
+    Spalten liegen in array('d'), die Bins aller Records flach in zwei Arrays
+    (Index, Volumen), damit matrices() ohne Python-Schleife über die Records
+    auskommt.
+    """
+
+    def __init__(self, maxlen: int | None = RECORDS_MAX):
+        self.maxlen = maxlen
+        self._fields = {name: array("d") for name in RECORD_COLUMNS}
+        self._bin_count = array("l")
+        self._bin_index = array("l")
+        self._bin_volume = array("d")
+        # K=1-Volumen (kalt, warm) je Record für die Schwellen _design_key
+        self._design_key: tuple[float, float] | None = None
+        self._x_cold = array("d")
+        self._x_warm = array("d")
+
+    def __len__(self) -> int:
+        return len(self._bin_count)
+
+    def append(self, ts: float, duration_s: float, avg_temp: float, fixed_l: float,
+               target_l: float, unit_bins: dict[int, float]) -> None:
+        if self.maxlen is not None and len(self._bin_count) >= self.maxlen:
+            for values in self._fields.values():
+                del values[0]
+            evicted = self._bin_count.pop(0)
+            del self._bin_index[:evicted]
+            del self._bin_volume[:evicted]
+            if self._design_key is not None:
+                del self._x_cold[0]
+                del self._x_warm[0]
+        for name, value in zip(RECORD_COLUMNS, (ts, duration_s, avg_temp, fixed_l, target_l)):
+            self._fields[name].append(value)
+        self._bin_count.append(len(unit_bins))
+        self._bin_index.extend(unit_bins.keys())
+        self._bin_volume.extend(unit_bins.values())
+        if self._design_key is not None:
+            self._append_design_row(unit_bins.keys(), unit_bins.values())
+
+    def _append_design_row(self, index, volume) -> None:
+        t_cold, t_warm = self._design_key
+        x_cold = x_warm = 0.0
+        for b, v in zip(index, volume):
+            w = _warm_weight(b * BIN_K, t_cold, t_warm)
+            x_cold += v * (1.0 - w)
+            x_warm += v * w
+        self._x_cold.append(x_cold)
+        self._x_warm.append(x_warm)
+
+    def count_since(self, ts: float) -> int:
+        """Anzahl Records mit Zeitstempel >= ts (Records sind zeitlich sortiert)."""
+        return len(self._bin_count) - bisect_left(self._fields["ts"], ts)
+
+    def columns(self) -> dict[str, list[float]]:
+        """Flache float-Spalten für den Store (siehe load_columns)."""
+        cols = {name: list(values) for name, values in self._fields.items()}
+        cols["bin_count"] = [float(c) for c in self._bin_count]
+        cols["bin_index"] = [float(i) for i in self._bin_index]
+        cols["bin_volume"] = list(self._bin_volume)
+        return cols
+
+    def load_columns(self, cols: dict[str, list[float]]) -> None:
+        counts = [int(c) for c in cols["bin_count"]]
+        index = cols["bin_index"]
+        volume = cols["bin_volume"]
+        pos = 0
+        for row, count in enumerate(counts):
+            bins = {int(index[i]): volume[i] for i in range(pos, pos + count)}
+            pos += count
+            self.append(*(cols[name][row] for name in RECORD_COLUMNS), bins)
+
+    def design(self, t_cold: float, t_warm: float,
+               since_ts: float = float("-inf")) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(ts, x, y) der Records ab since_ts: x = K=1-Volumen (kalt, warm), y = Zähler- minus Plateau-Volumen."""
+        if self._design_key != (t_cold, t_warm):
+            # Neue Schwellen (selten): Zeilen einmal neu aufbauen
+            self._design_key = (t_cold, t_warm)
+            self._x_cold = array("d")
+            self._x_warm = array("d")
+            pos = 0
+            for count in self._bin_count:
+                self._append_design_row(self._bin_index[pos:pos + count], self._bin_volume[pos:pos + count])
+                pos += count
+        skip = len(self._bin_count) - self.count_since(since_ts)
+        x = np.column_stack((np.array(self._x_cold[skip:]), np.array(self._x_warm[skip:])))
+        target = np.array(self._fields["target_l"][skip:])
+        fixed = np.array(self._fields["fixed_l"][skip:])
+        return np.array(self._fields["ts"][skip:]), x, target - fixed
+
+    def matrices(self, since_ts: float = float("-inf")) -> CalibrationData:
+        """Design-Matrix aller Records ab since_ts."""
+        n = self.count_since(since_ts)
+        skip = len(self._bin_count) - n
+        counts = np.array(self._bin_count[skip:], dtype=np.int64)
+        first = len(self._bin_index) - int(counts.sum())
+        index = np.array(self._bin_index[first:], dtype=np.int_)
+        volume = np.array(self._bin_volume[first:], dtype=np.float64)
+        # Bin-Indizes sind kleine Ganzzahlen: belegte Bins per bincount statt Sortieren
+        low = int(index.min()) if len(index) else 0
+        present = np.bincount(index - low) > 0
+        bins = np.flatnonzero(present) + low
+        column = (np.cumsum(present) - 1)[index - low]
+        unit_l = np.zeros((n, len(bins)))
+        unit_l[np.repeat(np.arange(n), counts), column] = volume  # je Record jeder Bin nur einmal
+
+        def _column(name: str) -> np.ndarray:
+            return np.array(self._fields[name][skip:], dtype=np.float64)
+
+        return CalibrationData(
+            ts=_column("ts"),
+            bin_temps=bins * BIN_K,
+            unit_l=unit_l,
+            fixed_l=_column("fixed_l"),
+            target_l=_column("target_l"),
+        )
+
+
+def recency_weights(ts: np.ndarray, now_ts: float, half_life_s: float) -> np.ndarray:
+    """Gewicht 1 für jetzt, halbiert pro half_life_s Alter."""
+    return np.exp2(-np.maximum(now_ts - ts, 0.0) / half_life_s)
+
+
+def _warm_share(data: CalibrationData, t_cold: float, t_warm: float) -> np.ndarray:
+    if t_warm <= t_cold:
+        return (data.bin_temps >= t_warm).astype(float)
+    return np.clip((data.bin_temps - t_cold) / (t_warm - t_cold), 0.0, 1.0)
+
+
+def rmse_l(data: CalibrationData, t_cold: float, t_warm: float, k_cold: float, k_warm: float,
+           weights: np.ndarray | None = None) -> float:
+    """(Gewichteter) RMSE des ungekappten Volumens gegen das Zähler-Delta."""
+    w = _warm_share(data, t_cold, t_warm)
+    residual = data.unit_l @ (k_cold + w * (k_warm - k_cold)) + data.fixed_l - data.target_l
+    if weights is None:
+        return float(np.sqrt(np.mean(residual * residual)))
+    return float(np.sqrt(np.sum(weights * residual * residual) / np.sum(weights)))
+
+
+def _bounded_solve(gram: list, rhs: list, lower: list, upper: list) -> list[float]:
+    """min 1/2 kᵀGk - rᵀk mit lower <= k <= upper für 1-2 Unbekannte (aktive Menge, geschlossen gelöst)."""
+    n = len(rhs)
+    free = [True] * n
+    k = [0.0] * n
+    for _ in range(n + 1):
+        idx = [i for i in range(n) if free[i]]
+        r = [rhs[i] - sum(gram[i][j] * k[j] for j in range(n) if not free[j]) for i in idx]
+        if len(idx) == 2:
+            (a, b), (c, d) = [[gram[i][j] for j in idx] for i in idx]
+            det = a * d - b * c
+            k[idx[0]], k[idx[1]] = (r[0] * d - b * r[1]) / det, (a * r[1] - c * r[0]) / det
+        elif idx:
+            k[idx[0]] = r[0] / gram[idx[0]][idx[0]]
+        outside = [i for i in idx if not lower[i] <= k[i] <= upper[i]]
+        if not outside:
+            break
+        for i in outside:
+            k[i] = max(lower[i], min(upper[i], k[i]))
+            free[i] = False
+    return k
+
+
+def solve(x: np.ndarray, y: np.ndarray, k_cold: float, k_warm: float,
+          k_limits: tuple[float, float, float], weights: np.ndarray | None = None,
+          ridge: float = 0.0) -> tuple[float, float, float]:
+    """
+    k_cold/k_warm aus der reduzierten Design-Matrix x (Records × (kalt, warm));
+    liefert (k_cold, k_warm, RMSE in L). k_limits = (min, max kalt, max warm).
+
+    Eine Seite wird nur gefittet, wenn sie genug Volumen und genug Records
+    trägt, sonst behält sie den übergebenen K-Wert. ridge > 0 zieht die
+    Lösung relativ zur Datenmenge zum übergebenen K; die Grenzen gelten im
+    Solve selbst (nicht nachträglich abgeschnitten).
+    """
+    sw = np.ones(len(y)) if weights is None else weights
+    k0 = [k_cold, k_warm]
+
+    side_volume = (sw @ x).tolist()
+    share = SIDE_RECORD_SHARE * np.maximum(x[:, 0] + x[:, 1], 1e-12)
+    dominant = [int(np.count_nonzero(x[:, i] >= share)) for i in range(2)]
+    use = [
+        i for i in range(2)
+        if side_volume[i] >= SIDE_MIN_SHARE * (side_volume[0] + side_volume[1])
+        and dominant[i] >= SIDE_MIN_RECORDS
+    ]
+    k = list(k0)
+    if use:
+        if len(use) == 2:
+            xf, r = x, y
+        else:
+            xf = x[:, use]
+            r = y - sum(x[:, i] * k0[i] for i in range(2) if i not in use)
+        gram = (xf.T @ (sw[:, None] * xf)).tolist()
+        rhs = (xf.T @ (sw * r)).tolist()
+        k_min, k_max_cold, k_max = k_limits
+        upper = [k_max_cold, k_max]
+        for a, i in enumerate(use):
+            lam = ridge * gram[a][a]
+            gram[a][a] += lam
+            rhs[a] += lam * k0[i]
+        solved = _bounded_solve(gram, rhs, [k_min] * len(use), [upper[i] for i in use])
+        for a, i in enumerate(use):
+            k[i] = solved[a]
+    residual = x @ np.array(k) - y
+    if weights is None:
+        rmse = math.sqrt((residual * residual).mean())
+    else:
+        rmse = math.sqrt((weights * residual * residual).sum() / weights.sum())
+    return float(k[0]), float(k[1]), rmse
+
+
+def fit(data: CalibrationData, t_cold: float, t_warm: float, k_cold: float, k_warm: float,
+        k_limits: tuple[float, float, float], weights: np.ndarray | None = None,
+        ridge: float = 0.0) -> tuple[float, float, float]:
+    """solve() für beliebige Schwellen über die volle Bin-Matrix."""
+    w = _warm_share(data, t_cold, t_warm)
+    x = data.unit_l @ np.column_stack([1.0 - w, w])
+    return solve(x, data.target_l - data.fixed_l, k_cold, k_warm, k_limits, weights, ridge)
@@ -0,0 +1,101 @@
+"""
+Zähler und Messwerte aller Controller im Prometheus-Textformat.
+
+    GET /api/wasser_residuum/metrics   (Authorization: Bearer <Long-Lived Token>)
+"""
+from __future__ import annotations
+
+from aiohttp import web
+
+from homeassistant.components.http import KEY_HASS, HomeAssistantView
+from homeassistant.core import HomeAssistant, callback
+
+from .const import CONF_NAME, DATA_CTRL, DOMAIN
+
+METRICS_URL = f"/api/{DOMAIN}/metrics"
+DATA_METRICS_VIEW = f"{DOMAIN}_metrics_view"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Name → Hilfetext; der Controller hält je Name einen int (controller.counters)
+COUNTERS = {
+    "events_received": "State-Events von Temperatur- und Zähler-Entity",
+    "events_processed": "Temperatur-Ticks komplett verarbeitet",
+    "samples_aggregated": "Temperatur-Samples innerhalb der Kadenz in den nächsten Tick gemittelt",
+    "late_samples": "Samples älter als das zuletzt verarbeitete desselben Kanals verworfen (Reorder-Puffer)",
+    "late_clamped": "Samples älter als das zuletzt verarbeitete des anderen Kanals, zu dessen Zeitstempel verarbeitet",
+    "mad_rejections": "Temperatur-Ticks vom MAD-Gate verworfen",
+    "idle_samples": "Temperatur-Samples im Idle-Modus (nur Aufwach-Detektor)",
+    "idle_wakeups": "Idle-Modus verlassen (Temperaturabfall, Varianz oder Zählerwechsel)",
+    "flow_starts": "Flow gestartet",
+    "flow_stops": "Flow beendet",
+    "plateau_estimates": "Flow im Plateau-Modus geschätzt (Varianz hoch, Gradient flach)",
+    "hydrus_ticks": "10L-Ticks des Wasserzählers",
+    "auto_calibrations": "K-Faktor auto-kalibriert",
+    "offline_syncs": "Volume nach Zählersprung (10-100 L) synchronisiert",
+    "large_jumps": "Zählersprung > 100 L (kein Auto-Sync)",
+}
+
+# Name → (Hilfetext, Snapshot-Feld)
+GAUGES = {
+    "k_active": ("Aktiver K-Faktor", "k_active"),
+    "residuum_liters": ("Residuum seit dem letzten 10L-Tick", "residuum_l"),
+    "uncertainty_liters": ("Volumen-Unsicherheit", "uncertainty_l"),
+    "variance_ratio": ("Varianz-Ratio aktuell/Baseline", "variance_ratio"),
+}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value) -> str:
+    if value is None:
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics(controllers: list[tuple[str, str, object]]) -> str:
+    """controllers: (entry_id, name, controller) je Config-Entry."""
+    labels = [
+        f'entry_id="{_escape(entry_id)}",name="{_escape(name)}"' for entry_id, name, _ in controllers
+    ]
+    lines = []
+    for counter, help_text in COUNTERS.items():
+        metric = f"{DOMAIN}_{counter}_total"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for label, (_, _, ctrl) in zip(labels, controllers):
+            lines.append(f"{metric}{{{label}}} {ctrl.counters[counter]}")
+    for gauge, (help_text, field) in GAUGES.items():
+        metric = f"{DOMAIN}_{gauge}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        for label, (_, _, ctrl) in zip(labels, controllers):
+            lines.append(f"{metric}{{{label}}} {_format_value(getattr(ctrl.snapshot, field))}")
+    return "\n".join(lines) + "\n"
+
+
+class WasserResiduumMetricsView(HomeAssistantView):
+    """Prometheus-Scrape-Endpunkt für alle Config-Entries der Domain."""
+
+    url = METRICS_URL
+    name = f"api:{DOMAIN}:metrics"
+    requires_auth = True
+
+    async def get(self, request: web.Request) -> web.Response:
+        hass: HomeAssistant = request.app[KEY_HASS]
+        controllers = []
+        for entry in hass.config_entries.async_entries(DOMAIN):
+            data = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+            if data is not None:
+                controllers.append((entry.entry_id, entry.data.get(CONF_NAME, entry.title), data[DATA_CTRL]))
+        return web.Response(body=render_metrics(controllers), headers={"Content-Type": CONTENT_TYPE})
+
+
+@callback
+def async_register_metrics_view(hass: HomeAssistant) -> None:
+    """View einmal pro HA-Lauf registrieren (aiohttp kennt kein Entfernen)."""
+    if hass.data.get(DATA_METRICS_VIEW):
+        return
+    hass.http.register_view(WasserResiduumMetricsView())
+    hass.data[DATA_METRICS_VIEW] = True
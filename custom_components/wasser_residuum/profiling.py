@@ -0,0 +1,77 @@
+"""
+Optionale Laufzeit-Messung des Temperatur-Hot-Paths.
+
+Der Controller hält ``profiler = None``, solange die Messung aus ist; jeder
+Messpunkt ist dann nur ein ``is not None``-Vergleich.
+"""
+from __future__ import annotations
+
+import time
+from array import array
+from bisect import bisect_left
+
+STAGES = ("kalman", "baseline", "variance", "mad_gate", "decision", "integration", "notify")
+
+# Obergrenzen der Histogramm-Buckets in Sekunden (letzter Bucket: darüber)
+STAGE_BUCKETS_S = (1e-6, 2e-6, 5e-6, 10e-6, 20e-6, 50e-6, 100e-6, 200e-6, 500e-6, 1e-3, 5e-3)
+LAG_BUCKETS_S = (1e-3, 2e-3, 5e-3, 10e-3, 20e-3, 50e-3, 0.1, 0.2, 0.5, 1.0, 5.0)
+
+
+def _label(bound_s: float) -> str:
+    if bound_s < 1e-3:
+        return f"<={bound_s * 1e6:g}us"
+    if bound_s < 1.0:
+        return f"<={bound_s * 1e3:g}ms"
+    return f"<={bound_s:g}s"
+
+
+class LatencyHistogram:
+    """Bucket-Zähler plus Summe/Maximum, O(log Buckets) pro Wert."""
+
+    __slots__ = ("bounds", "counts", "count", "total", "max")
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = array("Q", bytes(8 * (len(bounds) + 1)))
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def as_dict(self) -> dict:
+        buckets = {_label(b): n for b, n in zip(self.bounds, self.counts)}
+        buckets[f">{_label(self.bounds[-1])[2:]}"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "mean_us": round(self.total / self.count * 1e6, 2) if self.count else None,
+            "max_us": round(self.max * 1e6, 2),
+            "buckets": buckets,
+        }
+
+
+class StageProfiler:
+    """Latenz je Pipeline-Stufe und Event-Loop-Verzögerung (Zähler: controller.counters)."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.stages = {name: LatencyHistogram(STAGE_BUCKETS_S) for name in STAGES}
+        self.loop_lag = LatencyHistogram(LAG_BUCKETS_S)
+
+    def lap(self, stage: str, start: float) -> float:
+        """Zeit seit start der Stufe zuschreiben; gibt den neuen Startpunkt zurück."""
+        now = time.perf_counter()
+        self.stages[stage].add(now - start)
+        return now
+
+    def as_dict(self) -> dict:
+        return {
+            "since": self.started_at,
+            "loop_lag": self.loop_lag.as_dict(),
+            "stages": {name: hist.as_dict() for name, hist in self.stages.items()},
+        }
@@ -0,0 +1,136 @@
+"""
+Offline-Replay direkt aus einer Home-Assistant-SQLite-Datenbank (Kopie von
+``home-assistant_v2.db``, Schema mit ``states_meta`` ab HA 2023.4).
+
+    python -m custom_components.wasser_residuum.recorder_db home-assistant_v2.db \\
+        --temp-entity sensor.rohr_temp --total-entity sensor.wasser_total --out trace/
+
+Je Entity läuft ein eigener Cursor in Index-Reihenfolge (metadata_id,
+last_updated_ts); beide Ströme werden in Python zusammengeführt. SQLite muss
+so nichts sortieren, und es liegen nie mehr als ``chunk_rows`` Zeilen pro
+Cursor im Speicher. Der Trace wird blockweise als Spalten-Dateien geschrieben.
+"""
+from __future__ import annotations
+
+import argparse
+import heapq
+import sqlite3
+import time
+from collections.abc import Iterator
+
+from .const import CHANNEL_TEMP, CHANNEL_TOTAL
+from .replay import ReplayClock, Sample, _parse_options, create_controller, feed
+from .trace import TickTrace
+
+CHUNK_ROWS = 10_000
+TRACE_FLUSH_ROWS = 65_536
+
+
+class RowCounter:
+    """Gelesene DB-Zeilen (auch nicht-numerische States) für die Durchsatz-Ausgabe."""
+
+    __slots__ = ("rows",)
+
+    def __init__(self):
+        self.rows = 0
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Nur lesend öffnen; die Datenbank wird nie verändert."""
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+
+def metadata_id(conn: sqlite3.Connection, entity_id: str) -> int:
+    row = conn.execute(
+        "SELECT metadata_id FROM states_meta WHERE entity_id = ?", (entity_id,)
+    ).fetchone()
+    if row is None:
+        raise SystemExit(f"Entity {entity_id} nicht in states_meta")
+    return row[0]
+
+
+def _entity_rows(conn: sqlite3.Connection, meta_id: int, channel: int, start: float, end: float,
+                 chunk_rows: int, counter: RowCounter) -> Iterator[Sample]:
+    cursor = conn.execute(
+        "SELECT last_updated_ts, state FROM states"
+        " WHERE metadata_id = ? AND last_updated_ts >= ? AND last_updated_ts < ?"
+        " ORDER BY last_updated_ts",
+        (meta_id, start, end),
+    )
+    while rows := cursor.fetchmany(chunk_rows):
+        counter.rows += len(rows)
+        for ts, state in rows:
+            try:
+                yield ts, channel, float(state)
+            except (TypeError, ValueError):
+                continue  # unavailable/unknown
+
+
+def load_db(conn: sqlite3.Connection, temp_entity: str, total_entity: str,
+            start: float = 0.0, end: float = float("inf"), chunk_rows: int = CHUNK_ROWS,
+            counter: RowCounter | None = None) -> Iterator[Sample]:
+    """Samples beider Entities zeitlich gemischt (bei gleichem ts Temperatur zuerst)."""
+    counter = counter or RowCounter()
+    return heapq.merge(
+        _entity_rows(conn, metadata_id(conn, temp_entity), CHANNEL_TEMP, start, end, chunk_rows, counter),
+        _entity_rows(conn, metadata_id(conn, total_entity), CHANNEL_TOTAL, start, end, chunk_rows, counter),
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Wasser-Residuum Replay aus home-assistant_v2.db")
+    parser.add_argument("database", help="Pfad zur SQLite-Datenbank (Kopie)")
+    parser.add_argument("--temp-entity", required=True)
+    parser.add_argument("--total-entity", required=True)
+    parser.add_argument("--total-unit", default="L", choices=["L", "m3"])
+    parser.add_argument("--start", type=float, default=0.0, help="Unix-Sekunden (inklusive)")
+    parser.add_argument("--end", type=float, default=float("inf"), help="Unix-Sekunden (exklusive)")
+    parser.add_argument("--option", action="append", default=[], metavar="KEY=VALUE",
+                        help="Controller-Option, z.B. k_warm=4.5 (mehrfach möglich)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Zeilen pro fetchmany")
+    parser.add_argument("--out", help="Verzeichnis für den Spalten-Trace (<spalte>.f64)")
+    args = parser.parse_args(argv)
+
+    clock = ReplayClock()
+    ctrl = create_controller(_parse_options(args.option), args.total_unit, clock)
+    trace = TickTrace()
+    ticks = 0
+    written = False
+
+    def _flush() -> None:
+        nonlocal written
+        if args.out:
+            trace.write_columns(args.out, append=written)
+            written = True
+        trace.clear()
+
+    def _on_tick() -> None:
+        nonlocal ticks
+        trace.append_snapshot(ctrl.snapshot)
+        ticks += 1
+        if len(trace) >= TRACE_FLUSH_ROWS:
+            _flush()
+
+    ctrl.register_entity_listener(_on_tick)
+    counter = RowCounter()
+    conn = connect(args.database)
+    start = time.perf_counter()
+    try:
+        samples = feed(ctrl, clock, load_db(
+            conn, args.temp_entity, args.total_entity, args.start, args.end, args.chunk_rows, counter
+        ))
+    finally:
+        conn.close()
+    _flush()
+    elapsed = time.perf_counter() - start
+
+    print(f"{counter.rows:,} Zeilen, {samples:,} Samples, {ticks:,} Ticks in {elapsed:.2f} s "
+          f"({counter.rows / max(elapsed, 1e-9):,.0f} Zeilen/s)")
+    snap = ctrl.snapshot
+    print(f"Volume {snap.volume_l:.3f} L, Residuum {snap.residuum_l:.3f} L")
+    if args.out:
+        print(f"Trace: {args.out}/<spalte>.f64 (float64 little-endian)")
+
+
+if __name__ == "__main__":
+    main()
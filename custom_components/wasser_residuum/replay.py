@@ -0,0 +1,168 @@
+"""
+Offline-Replay: treibt den WasserResiduumController aus einem Zeitstempel-Stream
+von Temperatur- und Zählerwerten, ohne HA-Event-Loop und mit simulierter Uhr.
+
+    python -m custom_components.wasser_residuum.replay samples.csv --out trace.csv
+    python -m custom_components.wasser_residuum.replay --synthetic-days 30
+
+samples.csv: Zeilen ``ts,channel,value`` mit ts in Unix-Sekunden und
+channel ``temp`` oder ``total``.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import math
+import random
+import time
+from collections.abc import Iterable, Iterator
+
+from . import WasserResiduumController
+from .const import (
+    CHANNEL_TEMP,
+    CHANNEL_TOTAL,
+    CONF_NAME,
+    CONF_TEMP_ENTITY,
+    CONF_TOTAL_ENTITY,
+    CONF_TOTAL_UNIT,
+)
+from .trace import TickTrace
+
+_CHANNEL_NAMES = {"temp": CHANNEL_TEMP, "total": CHANNEL_TOTAL}
+
+Sample = tuple[float, int, float]  # (ts, channel, value)
+
+
+class ReplayClock:
+    """Simulierte Uhr; der Replay setzt ``now`` vor jedem Sample."""
+
+    __slots__ = ("now",)
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class ReplayEntry:
+    """Minimaler ConfigEntry-Ersatz (data/options/entry_id) für den Replay."""
+
+    def __init__(self, options: dict | None = None, total_unit: str = "L", entry_id: str = "replay"):
+        self.entry_id = entry_id
+        self.data = {
+            CONF_NAME: "Replay",
+            CONF_TEMP_ENTITY: "replay.temp",
+            CONF_TOTAL_ENTITY: "replay.total",
+            CONF_TOTAL_UNIT: total_unit,
+        }
+        self.options = dict(options or {})
+
+
+def create_controller(options: dict | None = None, total_unit: str = "L",
+                      clock: ReplayClock | None = None) -> WasserResiduumController:
+    """Controller ohne hass, gesteuert über eine ReplayClock."""
+    return WasserResiduumController(None, ReplayEntry(options, total_unit), clock=clock or ReplayClock())
+
+
+def feed(ctrl: WasserResiduumController, clock: ReplayClock, samples: Iterable[Sample]) -> int:
+    """Samples in Zeitreihenfolge in den Controller geben; gibt die Anzahl zurück."""
+    n = 0
+    process_temperature = ctrl.process_temperature
+    process_total = ctrl.process_total
+    for ts, channel, value in samples:
+        clock.now = ts
+        if channel == CHANNEL_TEMP:
+            process_temperature(value)
+        else:
+            process_total(value)
+        n += 1
+    return n
+
+
+def replay(samples: Iterable[Sample], options: dict | None = None, total_unit: str = "L") -> TickTrace:
+    """Kompletter Replay; liefert pro Tick Flow, Volume, Residuum und K."""
+    clock = ReplayClock()
+    ctrl = create_controller(options, total_unit, clock)
+    trace = TickTrace()
+    ctrl.register_entity_listener(lambda: trace.append_snapshot(ctrl.snapshot))
+    feed(ctrl, clock, samples)
+    return trace
+
+
+def load_csv(path: str) -> Iterator[Sample]:
+    """Samples aus ``ts,channel,value``-CSV streamen (Header optional)."""
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if not row or row[0] == "ts":
+                continue
+            yield float(row[0]), _CHANNEL_NAMES[row[1].strip()], float(row[2])
+
+
+def synthetic_samples(hours: float = 24.0, interval_s: float = 16.0, seed: int = 0,
+                      start_ts: float = 1_700_000_000.0) -> Iterator[Sample]:
+    """
+    Reproduzierbare Testdaten: Rohr folgt einer Tagesgang-Umgebung, Zapfungen
+    ziehen es Richtung Zulauftemperatur; der Zähler meldet in 10L-Schritten.
+    """
+    rng = random.Random(seed)
+    temp = 16.0
+    used_l = 0.0
+    flow = 0.0
+    remaining_s = 0.0
+    ts = start_ts
+    for _ in range(int(hours * 3600.0 / interval_s)):
+        ts += interval_s
+        ambient = 16.0 + 2.0 * math.sin(2.0 * math.pi * (ts % 86400.0) / 86400.0)
+        if remaining_s <= 0.0 and rng.random() < 0.01:
+            flow = rng.uniform(2.0, 8.0)
+            remaining_s = rng.uniform(30.0, 300.0)
+        if remaining_s > 0.0:
+            temp += (10.0 - temp) * min(1.0, 0.02 * flow)
+            used_l += flow * interval_s / 60.0
+            remaining_s -= interval_s
+        else:
+            temp += (ambient - temp) * 0.02
+        yield ts, CHANNEL_TEMP, round(temp + rng.gauss(0.0, 0.01), 2)
+        yield ts, CHANNEL_TOTAL, 10_000.0 + (used_l // 10.0) * 10.0
+
+
+def _parse_options(pairs: list[str]) -> dict:
+    options = {}
+    for pair in pairs:
+        key, _, value = pair.partition("=")
+        options[key] = float(value)
+    return options
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Wasser-Residuum Offline-Replay")
+    parser.add_argument("samples", nargs="?", help="CSV mit ts,channel,value")
+    parser.add_argument("--synthetic-days", type=float, help="Synthetische Daten statt CSV")
+    parser.add_argument("--total-unit", default="L", choices=["L", "m3"])
+    parser.add_argument("--option", action="append", default=[], metavar="KEY=VALUE",
+                        help="Controller-Option, z.B. k_warm=4.5 (mehrfach möglich)")
+    parser.add_argument("--out", help="Trace als CSV schreiben")
+    args = parser.parse_args(argv)
+
+    if args.synthetic_days:
+        samples = synthetic_samples(hours=args.synthetic_days * 24.0)
+    elif args.samples:
+        samples = load_csv(args.samples)
+    else:
+        parser.error("samples oder --synthetic-days angeben")
+
+    start = time.perf_counter()
+    trace = replay(samples, _parse_options(args.option), args.total_unit)
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(trace)} Ticks in {elapsed:.2f} s ({len(trace) / max(elapsed, 1e-9):,.0f} Ticks/s)")
+    if len(trace):
+        cols = trace.columns
+        print(f"Volume {cols['volume_l'][-1]:.3f} L, Residuum {cols['residuum_l'][-1]:.3f} L")
+    if args.out:
+        trace.write_csv(args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from homeassistant.helpers.event import async_track_state_change_event
+import time
+
+from homeassistant.helpers.event import async_call_later, async_track_state_change_event
 from homeassistant.components.sensor import SensorEntity, SensorDeviceClass, SensorStateClass
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant, callback
@@ -49,6 +51,12 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_e
 
 class BaseEntity(SensorEntity):
     _attr_should_poll = False
+    # Wertänderung (in Einheit des Sensors), ab der geschrieben wird; skaliert mit
+    # der Option publish_deadband. Nicht-numerische States: nur bei Änderung.
+    _publish_deadband = 0.0
+    # Attribute ändern sich auch bei gleichem State (z.B. idle_hours): dann
+    # zählen geänderte Attribute wie ein geänderter Wert.
+    _publish_attributes = False
 
     def __init__(self, ctrl, name: str, key: str, unit=None, icon=None,
                  state_class=None, device_class=None, entity_category=None):
@@ -67,19 +75,115 @@ class BaseEntity(SensorEntity):
             manufacturer="Custom",
             model="Î”Tâ†’Volumen Kalman",
         )
+        self._last_published = None
+        self._last_attributes = None
+        self._last_publish_ts = None
+        self._unsub_trailing = None
+        self._unsub_heartbeat = None
 
     async def async_added_to_hass(self):
         self.ctrl.register_entity_listener(self._on_ctrl_update)
 
+    async def async_will_remove_from_hass(self):
+        if self._unsub_trailing is not None:
+            self._unsub_trailing()
+            self._unsub_trailing = None
+        if self._unsub_heartbeat is not None:
+            self._unsub_heartbeat()
+            self._unsub_heartbeat = None
+
     @callback
     def _on_ctrl_update(self):
+        now = time.monotonic()
+        value = self.native_value
+        if not self._should_publish(value, now):
+            self.ctrl.publish_skipped += 1
+            return
+        self._publish(value, now)
+
+    def _publish(self, value, now: float) -> None:
+        if self._unsub_trailing is not None:
+            self._unsub_trailing()
+            self._unsub_trailing = None
+        self._last_published = value
+        if self._publish_attributes:
+            self._last_attributes = self.extra_state_attributes
+        self._last_publish_ts = now
+        self.ctrl.publish_written += 1
         self.async_write_ha_state()
+        heartbeat = self._policy()[1]
+        if heartbeat and self._unsub_heartbeat is None:
+            self._unsub_heartbeat = async_call_later(self.hass, heartbeat, self._async_heartbeat)
+
+    def _unchanged(self, value) -> bool:
+        """Wert (und ggf. Attribute) wie zuletzt geschrieben."""
+        if value != self._last_published:
+            return False
+        return not self._publish_attributes or self.extra_state_attributes == self._last_attributes
+
+    def _policy(self) -> tuple[float, float, float]:
+        """(Mindestabstand, Heartbeat, Deadband-Faktor) der Entity-Klasse: Haupt- oder Diagnose-Sensor."""
+        ctrl = self.ctrl
+        if self._attr_entity_category == EntityCategory.DIAGNOSTIC:
+            return ctrl.diag_publish_min_interval, ctrl.diag_publish_heartbeat, ctrl.diag_publish_deadband
+        return ctrl.publish_min_interval, ctrl.publish_heartbeat, ctrl.publish_deadband
+
+    def _should_publish(self, value, now: float) -> bool:
+        """Publish-Policy: Heartbeat > Change-only/0-Übergang > Deadband > Mindestabstand."""
+        if self._last_publish_ts is None:
+            return True
+        min_interval, heartbeat, deadband = self._policy()
+        elapsed = now - self._last_publish_ts
+        if heartbeat and elapsed >= heartbeat:
+            return True
+
+        if self._unchanged(value):
+            return False
+        last = self._last_published
+        if isinstance(value, (int, float)) and isinstance(last, (int, float)):
+            # Übergänge auf/von 0 (z.B. Flow-Ende) immer sofort schreiben, auch im Mindestabstand
+            if value == 0 or last == 0:
+                return True
+            if abs(value - last) < self._publish_deadband * deadband:
+                return False
+        if elapsed < min_interval:
+            # Unterdrückten Wert nach Ablauf des Mindestabstands nachreichen
+            if self._unsub_trailing is None:
+                self._unsub_trailing = async_call_later(
+                    self.hass, min_interval - elapsed, self._async_trailing_write
+                )
+            return False
+        return True
+
+    @callback
+    def _async_trailing_write(self, _now=None) -> None:
+        """Nachzügler: aktuellen Wert schreiben, falls er vom zuletzt geschriebenen abweicht."""
+        self._unsub_trailing = None
+        value = self.native_value
+        if not self._unchanged(value):
+            self._publish(value, time.monotonic())
+
+    @callback
+    def _async_heartbeat(self, _now=None) -> None:
+        """Heartbeat auch ohne Controller-Update (z.B. Urlaub ohne Temperatur-Events)."""
+        self._unsub_heartbeat = None
+        heartbeat = self._policy()[1]
+        if not heartbeat:
+            return
+        now = time.monotonic()
+        remaining = heartbeat - (now - self._last_publish_ts)
+        if remaining > 0:
+            self._unsub_heartbeat = async_call_later(self.hass, remaining, self._async_heartbeat)
+            return
+        self._publish(self.native_value, now)
 
 
 # --- Haupt-Sensoren -----------------------------------------------------------
 
 class FlowSensor(BaseEntity):
     """Aktueller geschÃ¤tzter Durchfluss."""
+    _publish_deadband = 0.05
+
     def __init__(self, ctrl, name: str):
         super().__init__(
             ctrl, name, "Flow",
@@ -90,12 +194,14 @@ class FlowSensor(BaseEntity):
 
     @property
     def native_value(self) -> float | None:
-        val = getattr(self.ctrl, '_last_flow', None)
+        val = self.ctrl.snapshot.flow_l_min
         return None if val is None else round(val, 3)
 
 
 class VolumeSensor(BaseEntity, RestoreEntity):
     """Kumuliertes Volumen (ohne Offset)."""
+    _publish_deadband = 0.01
+
     def __init__(self, ctrl, name: str):
         super().__init__(
             ctrl, name, "Volume",
@@ -118,26 +224,21 @@ class VolumeSensor(BaseEntity, RestoreEntity):
 
             if last_val is not None:
                 # Controller auf den exakten alten Wert setzen
-                self.ctrl._volume_l = last_val
-                # Optional: Offset so setzen, dass Residuum nicht „platzt“
-                if self.ctrl._offset_l == 0.0 or self.ctrl._offset_l > self.ctrl._volume_l:
-                    self.ctrl._offset_l = self.ctrl._volume_l
-
-                # Merker: Wir haben restauriert → Controller soll Initialisierung NICHT überschreiben
-                setattr(self.ctrl, "_restored_volume", True)
+                self.ctrl.restore_volume(last_val)
 
         # Gleich nach dem Restore einmal State schreiben
         self.async_write_ha_state()
 
     @property
     def native_value(self) -> float | None:
-        val = getattr(self.ctrl, '_volume_l', None)
-        return None if val is None else round(val, 3)
+        return round(self.ctrl.snapshot.volume_l, 3)
 
 
 
 class ResiduumSensor(BaseEntity):
     """Residuum = Volume - Offset, geclampt [0..max_res_l]."""
+    _publish_deadband = 0.01
+
     def __init__(self, ctrl, name: str):
         super().__init__(
             ctrl, name, "Residuum",
@@ -148,14 +249,15 @@ class ResiduumSensor(BaseEntity):
 
     @property
     def native_value(self) -> float | None:
-        return round(self.ctrl.residuum_l, 3)
+        return round(self.ctrl.snapshot.residuum_l, 3)
 
     @property
     def extra_state_attributes(self):
+        snap = self.ctrl.snapshot
         return {
-            "offset_l": round(getattr(self.ctrl, '_offset_l', 0.0), 3),
-            "max_residuum_l": round(self.ctrl.max_res_l, 3),
-            "uncertainty_l": round(getattr(self.ctrl, '_volume_uncertainty', 0.0), 3),
+            "offset_l": round(snap.offset_l, 3),
+            "max_residuum_l": round(snap.max_res_l, 3),
+            "uncertainty_l": round(snap.uncertainty_l, 3),
         }
 
 
@@ -172,7 +274,7 @@ class KWarmSensor(BaseEntity):
 
     @property
     def native_value(self) -> float | None:
-        return round(self.ctrl.k_warm, 2)
+        return round(self.ctrl.snapshot.k_warm, 2)
 
 
 class KColdSensor(BaseEntity):
@@ -188,11 +290,13 @@ class KColdSensor(BaseEntity):
 
     @property
     def native_value(self) -> float | None:
-        return round(self.ctrl.k_cold, 2)
+        return round(self.ctrl.snapshot.k_cold, 2)
 
 
 class DiagKActive(BaseEntity):
     """Aktuell verwendeter K-Faktor (interpoliert)."""
+    _publish_deadband = 0.01
+
     def __init__(self, ctrl, name: str):
         super().__init__(
             ctrl, name, "K Active",
@@ -204,22 +308,21 @@ class DiagKActive(BaseEntity):
 
     @property
     def native_value(self) -> float | None:
-        val = getattr(self.ctrl, '_last_k_used', None)
+        val = self.ctrl.snapshot.k_active
         return None if val is None else round(val, 2)
     
     @property
     def extra_state_attributes(self):
-        if not hasattr(self.ctrl, '_kalman') or self.ctrl._kalman is None:
+        snap = self.ctrl.snapshot
+        if snap.filt_temp is None:
             return {}
         
-        filt_temp, _ = self.ctrl._kalman.get_state()
-        
         return {
-            "k_warm": round(self.ctrl.k_warm, 2),
-            "k_cold": round(self.ctrl.k_cold, 2),
-            "t_warm": round(self.ctrl.t_warm, 1),
-            "t_cold": round(self.ctrl.t_cold, 1),
-            "current_temp": round(filt_temp, 1),
+            "k_warm": round(snap.k_warm, 2),
+            "k_cold": round(snap.k_cold, 2),
+            "t_warm": round(snap.t_warm, 1),
+            "t_cold": round(snap.t_cold, 1),
+            "current_temp": round(snap.filt_temp, 1),
         }
 
 
@@ -228,6 +331,8 @@ class DiagKActive(BaseEntity):
 
 class DiagTempRaw(BaseEntity):
     """Rohe Temperatur vom Sensor."""
+    _publish_deadband = 0.01
+
     def __init__(self, ctrl, name: str):
         super().__init__(
             ctrl, name, "Temp Raw",
@@ -240,12 +345,14 @@ class DiagTempRaw(BaseEntity):
 
     @property
     def native_value(self) -> float | None:
-        val = getattr(self.ctrl, '_last_temp', None)
+        val = self.ctrl.snapshot.raw_temp
         return None if val is None else round(val, 2)
 
 
 class DiagTempFilt(BaseEntity):
     """Kalman-gefilterte Temperatur."""
+    _publish_deadband = 0.01
+
     def __init__(self, ctrl, name: str):
         super().__init__(
             ctrl, name, "Temp Filtered",
@@ -258,14 +365,14 @@ class DiagTempFilt(BaseEntity):
 
     @property
     def native_value(self) -> float | None:
-        if not hasattr(self.ctrl, '_kalman') or self.ctrl._kalman is None:
-            return None
-        filt_temp, _ = self.ctrl._kalman.get_state()
-        return round(filt_temp, 2)
+        val = self.ctrl.snapshot.filt_temp
+        return None if val is None else round(val, 2)
 
 
 class DiagDtUsed(BaseEntity):
     """Letzter verwendeter Temperaturgradient."""
+    _publish_deadband = 0.0005
+
     def __init__(self, ctrl, name: str):
         super().__init__(
             ctrl, name, "dT Used",
@@ -277,32 +384,21 @@ class DiagDtUsed(BaseEntity):
 
     @property
     def native_value(self) -> float | None:
-        val = getattr(self.ctrl, '_last_dt_used', None)
+        val = self.ctrl.snapshot.dt_used
         return None if val is None else round(val, 4)
 
     @property
     def extra_state_attributes(self):
-        night_mode = getattr(self.ctrl, "_night_mode_active", False)
-        deep_sleep = self.ctrl.deep_sleep_active
-
-        # Dynamischen Schwellwert aus Controller holen
-        if hasattr(self.ctrl, '_kalman') and self.ctrl._kalman is not None:
-            filt_temp, _ = self.ctrl._kalman.get_state()
-            threshold = self.ctrl._get_dynamic_threshold(filt_temp)
-        else:
-            threshold = -0.006  # Fallback
-
-        # Deep-Sleep macht Schwellwert strenger (20%)
-        if deep_sleep:
-            threshold *= 1.2
-
+        snap = self.ctrl.snapshot
         return {
-            "flow_active": getattr(self.ctrl, "_flow_active", False),
-            "night_mode": night_mode,
-            "deep_sleep": deep_sleep,
-            "current_threshold": round(threshold, 4),
-            "pipe_temp": round(filt_temp, 1) if hasattr(self.ctrl, '_kalman') and self.ctrl._kalman else None,
+            "flow_active": snap.flow_active,
+            "night_mode": snap.night_mode,
+            "deep_sleep": snap.deep_sleep,
+            "current_threshold": round(snap.threshold, 4),  # inkl. Deep-Sleep-Faktor
+            "pipe_temp": round(snap.filt_temp, 1) if snap.filt_temp is not None else None,
             "detection": "Temperaturabhängiger Schwellwert (kalt=sensitiv, warm=normal)",
+            "publish_written": snap.publish_written,
+            "publish_skipped": snap.publish_skipped,
         }
 
 
@@ -320,12 +416,13 @@ class DiagOffset(BaseEntity):
 
     @property
     def native_value(self) -> float | None:
-        val = getattr(self.ctrl, '_offset_l', None)
-        return None if val is None else round(val, 3)
+        return round(self.ctrl.snapshot.offset_l, 3)
 
 
 class DiagUncertainty(BaseEntity):
     """GeschÃ¤tzte Unsicherheit des Residuums."""
+    _publish_deadband = 0.01
+
     def __init__(self, ctrl, name: str):
         super().__init__(
             ctrl, name, "Uncertainty",
@@ -337,8 +434,7 @@ class DiagUncertainty(BaseEntity):
 
     @property
     def native_value(self) -> float | None:
-        val = getattr(self.ctrl, '_volume_uncertainty', None)
-        return None if val is None else round(val, 3)
+        return round(self.ctrl.snapshot.uncertainty_l, 3)
 
 
 # --- Optional: LastSync & RSSI -----------------------------------------------
@@ -420,6 +516,8 @@ class RssiSensor(BaseEntity):
 
 class DiagNightMode(BaseEntity):
     """Zeigt an ob Nacht-Modus aktiv ist (nur Diagnostik, kein Einfluss mehr auf Erkennung)."""
+    _publish_attributes = True
+
     def __init__(self, ctrl, name: str):
         super().__init__(
             ctrl, name, "Night Mode",
@@ -430,21 +528,17 @@ class DiagNightMode(BaseEntity):
     @property
     def native_value(self) -> str:
         """Gibt 'Active' oder 'Inactive' zurück."""
-        is_active = getattr(self.ctrl, '_night_mode_active', False)
-        return "Active" if is_active else "Inactive"
+        return "Active" if self.ctrl.snapshot.night_mode else "Inactive"
 
     @property
     def icon(self) -> str:
         """Dynamisches Icon basierend auf Status."""
-        is_active = getattr(self.ctrl, '_night_mode_active', False)
-        return "mdi:weather-night" if is_active else "mdi:white-balance-sunny"
+        return "mdi:weather-night" if self.ctrl.snapshot.night_mode else "mdi:white-balance-sunny"
 
     @property
     def extra_state_attributes(self):
-        from datetime import datetime
-        now = datetime.now()
         return {
-            "current_hour": now.hour,
+            "current_hour": self.ctrl.snapshot.current_hour,
             "night_hours": "22:00-06:00",
             "threshold_multiplier": "1x (nur Diagnostik, kein Einfluss auf Erkennung)",
             "detection_method": "Gradient-basiert (d²T/dt²)",
@@ -453,6 +547,8 @@ class DiagNightMode(BaseEntity):
 
 class DiagDeepSleep(BaseEntity):
     """Zeigt an ob Deep-Sleep-Modus aktiv ist (>2h keine Zapfung)."""
+    _publish_attributes = True
+
     def __init__(self, ctrl, name: str):
         super().__init__(
             ctrl, name, "Deep Sleep",
@@ -463,34 +559,29 @@ class DiagDeepSleep(BaseEntity):
     @property
     def native_value(self) -> str:
         """Gibt 'Active' oder 'Inactive' zurück."""
-        is_active = self.ctrl.deep_sleep_active
-        return "Active" if is_active else "Inactive"
+        return "Active" if self.ctrl.snapshot.deep_sleep else "Inactive"
 
     @property
     def icon(self) -> str:
         """Dynamisches Icon basierend auf Status."""
-        is_active = self.ctrl.deep_sleep_active
-        return "mdi:sleep" if is_active else "mdi:sleep-off"
+        return "mdi:sleep" if self.ctrl.snapshot.deep_sleep else "mdi:sleep-off"
 
     @property
     def extra_state_attributes(self):
-        import time
-        last_flow_time = getattr(self.ctrl, '_last_flow_time', None)
-        if last_flow_time:
-            idle_hours = (time.time() - last_flow_time) / 3600.0
-        else:
-            idle_hours = 999.9
-
+        snap = self.ctrl.snapshot
         return {
-            "idle_hours": round(idle_hours, 1),
+            "idle_hours": round(snap.idle_hours, 1),
             "threshold_hours": 2.0,
-            "threshold_multiplier": "1.2x (minimal strenger)" if self.ctrl.deep_sleep_active else "1x",
+            "threshold_multiplier": "1.2x (minimal strenger)" if snap.deep_sleep else "1x",
+            "idle_throttled": snap.idle_throttled,
             "note": "Haupterkennung über Gradient (d²T/dt²)",
         }
 
 
 class DiagHydrusTotal(BaseEntity):
     """Aktueller Wert des Wasserzählers (Hydrus)."""
+    _publish_attributes = True
+
     def __init__(self, ctrl, name: str):
         super().__init__(
             ctrl, name, "Hydrus Total",
@@ -503,38 +594,24 @@ class DiagHydrusTotal(BaseEntity):
 
     @property
     def native_value(self) -> float | None:
-        val = getattr(self.ctrl, '_last_hydrus_total', None)
+        val = self.ctrl.snapshot.hydrus_total
         return None if val is None else round(val, 3)
 
     @property
     def extra_state_attributes(self):
-        import time
-
-        # Zeit seit letztem 10L-Tick
-        last_tick_time = getattr(self.ctrl, '_last_hydrus_change_time', None)
-        if last_tick_time:
-            time_since_tick_min = (time.time() - last_tick_time) / 60.0
-        else:
-            time_since_tick_min = None
-
-        # Differenz zwischen thermischem Volume und Hydrus
-        volume = getattr(self.ctrl, '_volume_l', 0.0)
-        hydrus = getattr(self.ctrl, '_last_hydrus_total', None)
-        if hydrus is not None:
-            delta_to_hydrus = volume - hydrus
-        else:
-            delta_to_hydrus = None
-
+        snap = self.ctrl.snapshot
         attrs = {
-            "thermal_volume_l": round(volume, 3),
-            "residuum_l": round(self.ctrl.residuum_l, 3),
+            "thermal_volume_l": round(snap.volume_l, 3),
+            "residuum_l": round(snap.residuum_l, 3),
         }
 
-        if delta_to_hydrus is not None:
-            attrs["delta_thermal_vs_hydrus"] = round(delta_to_hydrus, 3)
+        # Differenz zwischen thermischem Volume und Hydrus
+        if snap.hydrus_total is not None:
+            attrs["delta_thermal_vs_hydrus"] = round(snap.volume_l - snap.hydrus_total, 3)
 
-        if time_since_tick_min is not None:
-            attrs["minutes_since_last_tick"] = round(time_since_tick_min, 1)
+        # Zeit seit letztem 10L-Tick
+        if snap.minutes_since_tick is not None:
+            attrs["minutes_since_last_tick"] = round(snap.minutes_since_tick, 1)
 
         return attrs
 
@@ -551,20 +628,20 @@ class DiagVariance(BaseEntity):
     @property
     def native_value(self) -> str:
         """Gibt 'Active' oder 'Inactive' zurück."""
-        is_active = getattr(self.ctrl, 'variance_flow_detected', False)
-        return "Active" if is_active else "Inactive"
+        return "Active" if self.ctrl.snapshot.variance_detected else "Inactive"
 
     @property
     def icon(self) -> str:
         """Dynamisches Icon basierend auf Status."""
-        is_active = getattr(self.ctrl, 'variance_flow_detected', False)
+        is_active = self.ctrl.snapshot.variance_detected
         return "mdi:chart-bell-curve-cumulative" if is_active else "mdi:chart-bell-curve"
 
     @property
     def extra_state_attributes(self):
-        variance_ratio = getattr(self.ctrl, 'current_variance_ratio', 0.0)
-        baseline_variance = getattr(self.ctrl, '_baseline_variance', 0.001)
-        pipe_temp = getattr(self.ctrl, '_last_temp', None)
+        snap = self.ctrl.snapshot
+        variance_ratio = snap.variance_ratio
+        baseline_variance = snap.baseline_variance
+        pipe_temp = snap.raw_temp
 
         # Schwellwert abhängig von Temperatur
         if pipe_temp is not None and pipe_temp < 10.0:
@@ -0,0 +1,111 @@
+"""Services der Integration (einmal pro Domain registriert)."""
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import logging
+import time
+
+import voluptuous as vol
+
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
+import homeassistant.helpers.config_validation as cv
+
+from .const import (
+    ATTR_APPLY, ATTR_CONFIG_ENTRY_ID, ATTR_DAYS, ATTR_FIT_THRESHOLDS, ATTR_SECONDS,
+    CONF_K_COLD, CONF_K_WARM, CONF_T_COLD, CONF_T_WARM, DATA_CTRL,
+    DEFAULT_PROFILE_SECONDS, DEFAULT_RECALIBRATE_DAYS, DOMAIN, SERVICE_PROFILE, SERVICE_RECALIBRATE,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_SECONDS, default=DEFAULT_PROFILE_SECONDS): vol.All(
+            vol.Coerce(float), vol.Range(min=1.0, max=3600.0)
+        ),
+    }
+)
+
+RECALIBRATE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_DAYS, default=DEFAULT_RECALIBRATE_DAYS): vol.All(
+            vol.Coerce(float), vol.Range(min=1.0, max=90.0)
+        ),
+        vol.Optional(ATTR_FIT_THRESHOLDS, default=False): cv.boolean,
+        vol.Optional(ATTR_APPLY, default=False): cv.boolean,
+    }
+)
+
+_profile_lock = asyncio.Lock()
+
+
+def _get_controller(hass: HomeAssistant, entry_id: str | None):
+    entries = hass.data.get(DOMAIN, {})
+    if entry_id is None:
+        if len(entries) != 1:
+            raise HomeAssistantError("config_entry_id angeben (mehrere oder keine Einträge geladen)")
+        entry_id = next(iter(entries))
+    if entry_id not in entries:
+        raise HomeAssistantError(f"Kein geladener Eintrag {entry_id}")
+    return entries[entry_id][DATA_CTRL]
+
+
+def async_register_services(hass: HomeAssistant) -> None:
+    if hass.services.has_service(DOMAIN, SERVICE_PROFILE):
+        return
+
+    async def _async_profile(call: ServiceCall) -> ServiceResponse:
+        """cProfile des Event-Loop-Threads für N Sekunden → .prof im Config-Verzeichnis."""
+        seconds = call.data[ATTR_SECONDS]
+        if _profile_lock.locked():
+            raise HomeAssistantError("Profiling läuft bereits")
+        async with _profile_lock:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profiler.disable()
+            path = hass.config.path(f"{DOMAIN}_profile_{int(time.time())}.prof")
+            await hass.async_add_executor_job(profiler.dump_stats, path)
+        _LOGGER.info("cProfile (%.0f s) gespeichert: %s", seconds, path)
+        return {"path": path}
+
+    async def _async_recalibrate(call: ServiceCall) -> ServiceResponse:
+        """K (optional T-Schwellen) aus N Tagen Recorder-Historie fitten; Vorschau, optional übernehmen."""
+        from .calibration import async_recalibrate
+
+        ctrl = _get_controller(hass, call.data.get(ATTR_CONFIG_ENTRY_ID))
+        result = await async_recalibrate(hass, ctrl, call.data[ATTR_DAYS], call.data[ATTR_FIT_THRESHOLDS])
+        result["applied"] = False
+        if call.data[ATTR_APPLY]:
+            fitted = result["fitted"]
+            await ctrl.async_apply_calibration(
+                {key: fitted[key] for key in (CONF_K_WARM, CONF_K_COLD, CONF_T_WARM, CONF_T_COLD)}
+            )
+            result["applied"] = True
+            _LOGGER.info("Rekalibrierung übernommen: %s", fitted)
+        return result
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE,
+        _async_profile,
+        schema=PROFILE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_RECALIBRATE,
+        _async_recalibrate,
+        schema=RECALIBRATE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+
+def async_unregister_services(hass: HomeAssistant) -> None:
+    hass.services.async_remove(DOMAIN, SERVICE_PROFILE)
+    hass.services.async_remove(DOMAIN, SERVICE_RECALIBRATE)
@@ -0,0 +1,44 @@
+"""Unveränderlicher Zustands-Snapshot pro Tick für alle Entities."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class ControllerSnapshot:
+    """
+    Alle abgeleiteten Werte eines Ticks, einmal vom Controller berechnet.
+
+    Entities lesen ausschließlich hieraus, statt selbst Kalman-Zustand,
+    Schwellwerte oder Uhrzeit abzufragen.
+    """
+
+    timestamp: float
+    raw_temp: float | None
+    filt_temp: float | None
+    dt_used: float | None
+    flow_l_min: float | None
+    volume_l: float
+    offset_l: float
+    residuum_l: float
+    max_res_l: float
+    uncertainty_l: float
+    k_warm: float
+    k_cold: float
+    t_warm: float
+    t_cold: float
+    k_active: float | None
+    threshold: float  # Eintritts-Schwellwert inkl. Deep-Sleep-Faktor
+    flow_active: bool
+    night_mode: bool
+    deep_sleep: bool
+    idle_throttled: bool  # Idle-Modus: volle Pipeline pausiert
+    idle_hours: float
+    current_hour: int
+    hydrus_total: float | None
+    minutes_since_tick: float | None
+    variance_detected: bool
+    variance_ratio: float
+    baseline_variance: float
+    publish_written: int  # Stand nach dem vorherigen Entity-Fan-out
+    publish_skipped: int
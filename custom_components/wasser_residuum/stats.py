@@ -0,0 +1,375 @@
+"""Gleitende Fenster-Statistiken für den Temperatur-Hot-Path."""
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left, insort
+
+
+class RingBuffer:
+    """
+    Ringpuffer fester Kapazität auf array('d') (8 Byte pro Wert, keine Float-Objekte).
+
+    Speicherbedarf ist ab dem Anlegen konstant.
+    """
+
+    __slots__ = ("capacity", "_data", "_start", "_size")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = array("d", bytes(8 * capacity))
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self):
+        data = self._data
+        cap = self.capacity
+        for i in range(self._start, self._start + self._size):
+            yield data[i % cap]
+
+    def __getitem__(self, index: int) -> float:
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("ring buffer index out of range")
+        return self._data[(self._start + index) % self.capacity]
+
+    def push(self, value: float) -> float | None:
+        """Wert anhängen; gibt den verdrängten ältesten Wert zurück (oder None)."""
+        if self._size < self.capacity:
+            self._data[(self._start + self._size) % self.capacity] = value
+            self._size += 1
+            return None
+        evicted = self._data[self._start]
+        self._data[self._start] = value
+        self._start = (self._start + 1) % self.capacity
+        return evicted
+
+    def append(self, value: float) -> None:
+        self.push(value)
+
+    def clear(self) -> None:
+        self._start = 0
+        self._size = 0
+
+
+class TickAccumulator:
+    """
+    Laufende Statistik seit dem letzten 10L-Tick in O(1) Speicher:
+    zeitgewichteter Mittelwert, Anzahl, Minimum und Maximum.
+    """
+
+    __slots__ = ("weighted_sum", "weight", "count", "min", "max")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.weighted_sum = 0.0
+        self.weight = 0.0
+        self.count = 0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def add(self, value: float, dt_s: float) -> None:
+        self.weighted_sum += value * dt_s
+        self.weight += dt_s
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float | None:
+        if self.weight <= 0.0:
+            return None
+        return self.weighted_sum / self.weight
+
+    def as_list(self) -> list:
+        if not self.count:
+            return [0.0, 0.0, 0, None, None]  # ±inf ist nicht JSON-tauglich
+        return [self.weighted_sum, self.weight, self.count, self.min, self.max]
+
+    def load_list(self, values) -> None:
+        self.reset()
+        weighted_sum, weight, count, vmin, vmax = values
+        if count:
+            self.weighted_sum = weighted_sum
+            self.weight = weight
+            self.count = int(count)
+            self.min = vmin
+            self.max = vmax
+
+
+class SampleAggregator:
+    """
+    Mittelwert, Populations-Varianz und Anzahl der Samples zwischen zwei Ticks
+    (Welford, O(1) Speicher). Bei einem einzigen Sample: Mittelwert = Wert, Varianz 0.
+    """
+
+    __slots__ = ("count", "mean", "_m2")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self) -> float:
+        if self.count < 2:
+            return 0.0
+        return self._m2 / self.count
+
+    def as_list(self) -> list:
+        return [self.count, self.mean, self._m2]
+
+    def load_list(self, values) -> None:
+        count, self.mean, self._m2 = values
+        self.count = int(count)
+
+
+class RollingMean:
+    """Gleitender Mittelwert über Laufsumme, O(1) pro Sample, periodisch exakt neu summiert."""
+
+    def __init__(self, maxlen: int):
+        self.maxlen = maxlen
+        self._window = RingBuffer(maxlen)
+        self._sum = 0.0
+        self._since_resync = 0
+
+    def __len__(self) -> int:
+        return len(self._window)
+
+    def values(self) -> RingBuffer:
+        """Fensterinhalt in Einfüge-Reihenfolge (nicht verändern)."""
+        return self._window
+
+    def extend(self, values) -> None:
+        for v in values:
+            self.append(v)
+
+    def append(self, value: float) -> None:
+        oldest = self._window.push(value)
+        if oldest is not None:
+            self._sum -= oldest
+        self._sum += value
+        self._since_resync += 1
+        if self._since_resync >= self.maxlen:
+            self._since_resync = 0
+            self._sum = sum(self._window)
+
+    def sums(self) -> list:
+        """Laufsumme und Resync-Phase; nach extend() + load_sums() rechnet das Fenster bit-gleich weiter."""
+        return [self._sum, self._since_resync]
+
+    def load_sums(self, values) -> None:
+        self._sum, since_resync = values
+        self._since_resync = int(since_resync)
+
+    @property
+    def mean(self) -> float:
+        n = len(self._window)
+        return self._sum / n if n else 0.0
+
+
+class RollingPercentile:
+    """
+    Gleitendes Fenster mit sortierter Kopie für Perzentil-Abfragen.
+
+    Append/Evict kosten eine binäre Suche (O(log n)) plus ein memmove,
+    die Perzentil-Abfrage ist O(1). Interpolation wie np.percentile (linear).
+    """
+
+    def __init__(self, maxlen: int):
+        self.maxlen = maxlen
+        self._window = RingBuffer(maxlen)
+        self._sorted = array("d")
+
+    def __len__(self) -> int:
+        return len(self._window)
+
+    def values(self) -> RingBuffer:
+        """Fensterinhalt in Einfüge-Reihenfolge (nicht verändern)."""
+        return self._window
+
+    def extend(self, values) -> None:
+        for v in values:
+            self.append(v)
+
+    def append(self, value: float) -> None:
+        oldest = self._window.push(value)
+        if oldest is not None:
+            del self._sorted[bisect_left(self._sorted, oldest)]
+        insort(self._sorted, value)
+
+    def percentile(self, q: float) -> float:
+        """q-tes Perzentil (0..100) des aktuellen Fensters."""
+        n = len(self._sorted)
+        if n == 0:
+            raise ValueError("percentile of empty window")
+        pos = (n - 1) * q / 100.0
+        lo = int(pos)
+        frac = pos - lo
+        low = self._sorted[lo]
+        if frac == 0.0 or lo + 1 >= n:
+            return low
+        return low + frac * (self._sorted[lo + 1] - low)
+
+
+class RollingVariance:
+    """
+    Gleitende Populations-Varianz (wie np.var) über Laufsummen, O(1) pro Sample.
+
+    Die Summen laufen relativ zu einem Referenzwert (gegen Auslöschung) und
+    werden nach jeweils maxlen Samples exakt neu aufgebaut, damit sich keine
+    Rundungsfehler aufsummieren.
+    """
+
+    def __init__(self, maxlen: int):
+        self.maxlen = maxlen
+        self._window = RingBuffer(maxlen)
+        self._ref = 0.0
+        self._sum = 0.0
+        self._sumsq = 0.0
+        self._since_resync = 0
+
+    def __len__(self) -> int:
+        return len(self._window)
+
+    def values(self) -> RingBuffer:
+        """Fensterinhalt in Einfüge-Reihenfolge (nicht verändern)."""
+        return self._window
+
+    def extend(self, values) -> None:
+        for v in values:
+            self.append(v)
+
+    def append(self, value: float) -> None:
+        if not len(self._window):
+            self._ref = value
+        oldest = self._window.push(value)
+        if oldest is not None:
+            old = oldest - self._ref
+            self._sum -= old
+            self._sumsq -= old * old
+        d = value - self._ref
+        self._sum += d
+        self._sumsq += d * d
+
+        self._since_resync += 1
+        if self._since_resync >= self.maxlen:
+            self._resync()
+
+    def _resync(self) -> None:
+        self._since_resync = 0
+        self._ref = self._window[-1]
+        self._sum = 0.0
+        self._sumsq = 0.0
+        for v in self._window:
+            d = v - self._ref
+            self._sum += d
+            self._sumsq += d * d
+
+    def sums(self) -> list:
+        """Referenz, Laufsummen und Resync-Phase (siehe RollingMean.sums)."""
+        return [self._ref, self._sum, self._sumsq, self._since_resync]
+
+    def load_sums(self, values) -> None:
+        self._ref, self._sum, self._sumsq, since_resync = values
+        self._since_resync = int(since_resync)
+
+    @property
+    def variance(self) -> float:
+        n = len(self._window)
+        if n == 0:
+            return 0.0
+        mean = self._sum / n
+        return max(0.0, self._sumsq / n - mean * mean)
+
+
+class RollingMedianMAD:
+    """
+    Gleitender Median + MAD (Median der absoluten Abweichungen) über ein
+    festes Fenster, z.B. für robuste Ausreißer-Gates.
+
+    Das Fenster wird sortiert gehalten. Die Abstände zum Median bilden dann zwei
+    bereits sortierte Folgen (links/rechts vom Median); der MAD ergibt sich per
+    k-tem Element zweier sortierter Folgen in O(log n) statt neuer Liste + Sortieren.
+    """
+
+    def __init__(self, maxlen: int):
+        self.maxlen = maxlen
+        self._window = RingBuffer(maxlen)
+        self._sorted = array("d")
+
+    def __len__(self) -> int:
+        return len(self._window)
+
+    def values(self) -> RingBuffer:
+        """Fensterinhalt in Einfüge-Reihenfolge (nicht verändern)."""
+        return self._window
+
+    def extend(self, values) -> None:
+        for v in values:
+            self.append(v)
+
+    def append(self, value: float) -> None:
+        oldest = self._window.push(value)
+        if oldest is not None:
+            del self._sorted[bisect_left(self._sorted, oldest)]
+        insort(self._sorted, value)
+
+    def median(self) -> float:
+        s = self._sorted
+        n = len(s)
+        if n == 0:
+            raise ValueError("median of empty window")
+        mid = n // 2
+        if n % 2:
+            return s[mid]
+        return (s[mid - 1] + s[mid]) / 2.0
+
+    def median_mad(self) -> tuple[float, float]:
+        """(Median, MAD) des aktuellen Fensters; identisch zu statistics.median."""
+        med = self.median()
+        n = len(self._sorted)
+        split = bisect_left(self._sorted, med)
+        mid = n // 2
+        if n % 2:
+            return med, self._kth_deviation(mid, med, split)
+        low = self._kth_deviation(mid - 1, med, split)
+        high = self._kth_deviation(mid, med, split)
+        return med, (low + high) / 2.0
+
+    def _kth_deviation(self, k: int, med: float, split: int) -> float:
+        """k-kleinster (0-basiert) Wert von |x - med| über das Fenster."""
+        s = self._sorted
+        n_left = split  # Abstände links: med - s[split-1-i], aufsteigend
+        n_right = len(s) - split  # Abstände rechts: s[split+j] - med, aufsteigend
+
+        # i = Anzahl Elemente aus der linken Folge unter den k+1 kleinsten
+        lo = max(0, k + 1 - n_right)
+        hi = min(k + 1, n_left)
+        while True:
+            i = (lo + hi) // 2
+            j = k + 1 - i
+            if i < n_left and j > 0 and s[split + j - 1] - med > med - s[split - 1 - i]:
+                lo = i + 1
+            elif i > 0 and j < n_right and med - s[split - i] > s[split + j] - med:
+                hi = i - 1
+            else:
+                left = med - s[split - i] if i > 0 else float("-inf")
+                right = s[split + j - 1] - med if j > 0 else float("-inf")
+                return max(left, right)
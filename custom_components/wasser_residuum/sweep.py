@@ -0,0 +1,187 @@
+"""
+Parameter-Sweep für K/Schwellwert-Kalibrierung über aufgezeichnete Historie.
+
+Jeder Parametersatz wird per Offline-Replay durchgerechnet (Auto-Kalibrierung
+aus, damit die Parameter fix bleiben) und gegen die 10L-Hydrus-Ticks bewertet:
+derselbe Vergleich thermal_measured (Residuum beim Tick) vs. 10 L wie in der
+Auto-Kalibrierung. Die Sätze laufen parallel in einem Prozess-Pool.
+
+    python -m custom_components.wasser_residuum.sweep samples.csv \\
+        --grid k_warm=3,4,5 --grid thresh_warm=-0.010,-0.008,-0.006
+    python -m custom_components.wasser_residuum.sweep --synthetic-days 14 \\
+        --random 64 --range k_warm=2:8 --range clip=1:4
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from .const import CONF_CLIP, CONF_K_COLD, CONF_K_WARM, CONF_T_COLD, CONF_T_WARM
+from .replay import CHANNEL_TEMP, ReplayClock, Sample, create_controller, load_csv, synthetic_samples
+
+# Optionen des Config-Entries
+OPTION_PARAMS = (CONF_K_WARM, CONF_K_COLD, CONF_T_WARM, CONF_T_COLD, CONF_CLIP)
+# Controller-Attribute der Schwellwert-Kurve (_get_dynamic_threshold)
+THRESHOLD_PARAMS = ("thresh_temp_warm", "thresh_temp_cold", "thresh_warm", "thresh_cold")
+SWEEP_PARAMS = OPTION_PARAMS + THRESHOLD_PARAMS
+
+TICK_L = 10.0
+PLAUSIBLE_RANGE_L = (4.0, 16.0)  # wie in der Auto-Kalibrierung
+
+_samples: list[Sample] = []
+_total_unit = "L"
+
+
+def score(samples: list[Sample], params: dict, total_unit: str = "L") -> dict:
+    """Replay mit festen Parametern; Fehler thermal_measured - 10 L je Hydrus-Tick."""
+    clock = ReplayClock()
+    ctrl = create_controller(
+        {key: value for key, value in params.items() if key in OPTION_PARAMS}, total_unit, clock
+    )
+    for key in THRESHOLD_PARAMS:
+        if key in params:
+            setattr(ctrl, key, params[key])
+    ctrl.auto_calibrate = False
+
+    errors = []
+    process_temperature = ctrl.process_temperature
+    process_total = ctrl.process_total
+    for ts, channel, value in samples:
+        clock.now = ts
+        if channel == CHANNEL_TEMP:
+            process_temperature(value)
+            continue
+        last_total = ctrl.last_hydrus_total_l
+        if last_total is not None and 9.5 <= ctrl.total_to_l(value) - last_total <= 10.5:
+            errors.append(ctrl.residuum_l - TICK_L)
+        process_total(value)
+
+    n = len(errors)
+    lo, hi = PLAUSIBLE_RANGE_L
+    return {
+        "params": params,
+        "ticks": n,
+        "plausible": sum(1 for e in errors if lo <= e + TICK_L <= hi),
+        "rmse_l": math.sqrt(sum(e * e for e in errors) / n) if n else math.inf,
+        "bias_l": sum(errors) / n if n else math.nan,
+    }
+
+
+def _init_worker(samples: list[Sample], total_unit: str) -> None:
+    global _samples, _total_unit
+    _samples = samples
+    _total_unit = total_unit
+
+
+def _score_worker(params: dict) -> dict:
+    return score(_samples, params, _total_unit)
+
+
+def grid_params(grid: dict[str, list[float]]) -> list[dict]:
+    """Kartesisches Produkt aller Werte-Listen."""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def random_params(ranges: dict[str, tuple[float, float]], n: int, seed: int = 0) -> list[dict]:
+    """n gleichverteilte Zufallssätze innerhalb der Bereiche."""
+    rng = random.Random(seed)
+    return [{key: rng.uniform(lo, hi) for key, (lo, hi) in ranges.items()} for _ in range(n)]
+
+
+def run_sweep(samples: list[Sample], param_sets: list[dict], total_unit: str = "L",
+              workers: int | None = None) -> list[dict]:
+    """Alle Sätze parallel bewerten; Ergebnis nach RMSE aufsteigend sortiert."""
+    with ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(),
+        initializer=_init_worker,
+        initargs=(samples, total_unit),
+    ) as pool:
+        results = list(pool.map(_score_worker, param_sets, chunksize=1))
+    results.sort(key=lambda r: (r["rmse_l"], -r["ticks"]))
+    return results
+
+
+def _check_key(key: str) -> str:
+    if key not in SWEEP_PARAMS:
+        raise argparse.ArgumentTypeError(f"Unbekannter Parameter {key!r} (erlaubt: {', '.join(SWEEP_PARAMS)})")
+    return key
+
+
+def _parse_grid(pairs: list[str]) -> dict[str, list[float]]:
+    grid = {}
+    for pair in pairs:
+        key, _, values = pair.partition("=")
+        grid[_check_key(key)] = [float(v) for v in values.split(",")]
+    return grid
+
+
+def _parse_ranges(pairs: list[str]) -> dict[str, tuple[float, float]]:
+    ranges = {}
+    for pair in pairs:
+        key, _, bounds = pair.partition("=")
+        lo, _, hi = bounds.partition(":")
+        ranges[_check_key(key)] = (float(lo), float(hi))
+    return ranges
+
+
+def format_table(results: list[dict], limit: int = 20) -> str:
+    keys = sorted({key for r in results for key in r["params"]}, key=SWEEP_PARAMS.index)
+    lines = ["rank  rmse_l  bias_l  ticks  plaus  " + "  ".join(f"{k:>16}" for k in keys)]
+    for rank, r in enumerate(results[:limit], 1):
+        values = "  ".join(f"{r['params'].get(k, float('nan')):>16.4f}" for k in keys)
+        lines.append(
+            f"{rank:>4}  {r['rmse_l']:6.3f}  {r['bias_l']:+6.3f}  {r['ticks']:>5}  {r['plausible']:>5}  {values}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Wasser-Residuum Parameter-Sweep")
+    parser.add_argument("samples", nargs="?", help="CSV mit ts,channel,value")
+    parser.add_argument("--synthetic-days", type=float, help="Synthetische Daten statt CSV")
+    parser.add_argument("--total-unit", default="L", choices=["L", "m3"])
+    parser.add_argument("--grid", action="append", default=[], metavar="KEY=V1,V2,...")
+    parser.add_argument("--random", type=int, metavar="N", help="N Zufallssätze aus --range")
+    parser.add_argument("--range", action="append", default=[], metavar="KEY=MIN:MAX")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, help="Prozesse (Standard: alle Kerne)")
+    parser.add_argument("--top", type=int, default=20, help="Zeilen in der Rangliste")
+    args = parser.parse_args(argv)
+
+    if args.synthetic_days:
+        samples = list(synthetic_samples(hours=args.synthetic_days * 24.0))
+    elif args.samples:
+        samples = list(load_csv(args.samples))
+    else:
+        parser.error("samples oder --synthetic-days angeben")
+
+    try:
+        if args.random:
+            param_sets = random_params(_parse_ranges(args.range), args.random, args.seed)
+        else:
+            param_sets = grid_params(_parse_grid(args.grid))
+    except argparse.ArgumentTypeError as err:
+        parser.error(str(err))
+    if not param_sets or param_sets == [{}]:
+        parser.error("--grid oder --random/--range angeben")
+
+    results = run_sweep(samples, param_sets, args.total_unit, args.workers)
+    print(format_table(results, args.top))
+
+    best = results[0]["params"]
+    print("\nBeste Optionen:")
+    print(json.dumps({k: round(v, 4) for k, v in best.items() if k in OPTION_PARAMS}, indent=2))
+    thresholds = {k: round(v, 5) for k, v in best.items() if k in THRESHOLD_PARAMS}
+    if thresholds:
+        print("Schwellwert-Kurve (THRESH_* in __init__.py):")
+        print(json.dumps(thresholds, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Spaltenweise Tick-Traces des Controllers (z.B. Ausgabe des Offline-Replays)."""
+from __future__ import annotations
+
+import csv
+import io
+import os
+import sys
+from array import array
+
+from .snapshot import ControllerSnapshot
+
+TRACE_COLUMNS = ("ts", "raw_temp", "flow_l_min", "volume_l", "residuum_l", "k_active")
+
+# Interne Werte pro Tick für den Diagnose-Ring (float32, außer TICK_RING_FLOAT64); ts separat als float64
+TICK_RING_COLUMNS = (
+    "raw_temp", "filt_temp", "baseline", "dt_baseline_corrected", "dt_gradient", "variance_ratio",
+    "threshold_enter", "threshold_exit", "flow_active", "flow_confirmations", "variance_flow",
+    "mode", "flow_l_min", "volume_l", "k",
+)
+# float32 hat 24 Bit Mantisse: Zählerstände > 100 m³ nur noch auf ~8 L genau, K auf 1e-7 relativ
+TICK_RING_FLOAT64 = frozenset(("volume_l", "k"))
+TICK_RING_SPAN_S = 24 * 3600.0  # Ring-Spanne und Export in den Diagnosedaten
+TICK_RING_INITIAL_ROWS = 256  # wächst bis max_rows, solange der Ring weniger als die Spanne hält
+
+# Spalte "mode"
+TICK_MODE_MAD_REJECTED = -1.0
+TICK_MODE_IDLE = 0.0
+TICK_MODE_GRADIENT = 1.0
+TICK_MODE_PLATEAU = 2.0
+
+_NAN = float("nan")
+
+
+class TickTrace:
+    """Eine Zeile pro Tick, gespeichert als ein array('d') pro Spalte (None → NaN)."""
+
+    def __init__(self):
+        self.columns: dict[str, array] = {name: array("d") for name in TRACE_COLUMNS}
+
+    def __len__(self) -> int:
+        return len(self.columns["ts"])
+
+    def append_snapshot(self, snap: ControllerSnapshot) -> None:
+        c = self.columns
+        c["ts"].append(snap.timestamp)
+        c["raw_temp"].append(_NAN if snap.raw_temp is None else snap.raw_temp)
+        c["flow_l_min"].append(_NAN if snap.flow_l_min is None else snap.flow_l_min)
+        c["volume_l"].append(snap.volume_l)
+        c["residuum_l"].append(snap.residuum_l)
+        c["k_active"].append(_NAN if snap.k_active is None else snap.k_active)
+
+    def clear(self) -> None:
+        for col in self.columns.values():
+            del col[:]
+
+    def to_numpy(self) -> dict:
+        """Spalten als float64-NumPy-Arrays (ohne Kopie)."""
+        import numpy as np
+
+        return {name: np.frombuffer(col, dtype=np.float64) for name, col in self.columns.items()}
+
+    def write_csv(self, path: str) -> None:
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(TRACE_COLUMNS)
+            writer.writerows(zip(*(self.columns[name] for name in TRACE_COLUMNS)))
+
+    def write_columns(self, directory: str, append: bool = False) -> None:
+        """
+        Je Spalte eine Datei ``<name>.f64`` (float64 little-endian, ohne Header),
+        lesbar mit ``np.fromfile(path, "<f8")``. append=True hängt an (Streaming).
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name, col in self.columns.items():
+            if sys.byteorder != "little":
+                col = array("d", col)
+                col.byteswap()
+            with open(os.path.join(directory, f"{name}.f64"), "ab" if append else "wb") as f:
+                col.tofile(f)
+
+
+def _column(name: str, rows: int) -> array:
+    if name in TICK_RING_FLOAT64:
+        return array("d", bytes(8 * rows))
+    return array("f", bytes(4 * rows))
+
+
+class TickRing:
+    """
+    Ring über die letzten Ticks mit allen Zwischenwerten der Pipeline, eine
+    Spalte pro Wert; kein Recorder, keine Allokation pro Tick.
+
+    Die Kapazität verdoppelt sich, wenn der volle Ring noch keine
+    TICK_RING_SPAN_S abdeckt, höchstens bis max_rows. Der Speicher folgt so der
+    tatsächlichen Tick-Rate statt der schlimmstmöglichen.
+    """
+
+    def __init__(self, max_rows: int):
+        self.max_rows = max_rows
+        rows = min(TICK_RING_INITIAL_ROWS, max_rows)
+        self.rows = rows
+        self.ts = array("d", bytes(8 * rows))
+        self.columns: dict[str, array] = {name: _column(name, rows) for name in TICK_RING_COLUMNS}
+        self._cols = tuple(self.columns.values())
+        self._next = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, ts: float, values: tuple) -> None:
+        """values in der Reihenfolge von TICK_RING_COLUMNS (NaN für fehlende Werte)."""
+        i = self._next
+        if self._size == self.rows and self.rows < self.max_rows and ts - self.ts[i] < TICK_RING_SPAN_S:
+            # Älteste Zeile liegt noch in der Spanne: wachsen statt überschreiben
+            self.resize(min(2 * self.rows, self.max_rows))
+            i = self._next
+        self.ts[i] = ts
+        for col, value in zip(self._cols, values):
+            col[i] = value
+        self._next = i + 1 if i + 1 < self.rows else 0
+        if self._size < self.rows:
+            self._size += 1
+
+    def set_max_rows(self, max_rows: int) -> None:
+        """Obergrenze ändern (Option); ein größerer Ring wird sofort gekürzt."""
+        self.max_rows = max_rows
+        if self.rows > max_rows:
+            self.resize(max_rows)
+
+    def resize(self, rows: int) -> None:
+        """Neue Kapazität; die jüngsten Zeilen bleiben erhalten."""
+        if rows == self.rows:
+            return
+        keep = min(self._size, rows)
+        order = [(self._next - keep + j) % self.rows for j in range(keep)]
+        ts = array("d", bytes(8 * rows))
+        for j, i in enumerate(order):
+            ts[j] = self.ts[i]
+        columns = {}
+        for name, old in self.columns.items():
+            col = _column(name, rows)
+            for j, i in enumerate(order):
+                col[j] = old[i]
+            columns[name] = col
+        self.rows = rows
+        self.ts = ts
+        self.columns = columns
+        self._cols = tuple(columns.values())
+        self._next = keep if keep < rows else 0
+        self._size = keep
+
+    def export(self, since_ts: float = float("-inf")) -> dict:
+        """Zeitlich sortierte NumPy-Kopien ab since_ts (im Event-Loop aufrufen)."""
+        import numpy as np
+
+        order = np.arange(self._next - self._size, self._next) % self.rows
+        ts = np.frombuffer(self.ts, dtype=np.float64)[order]
+        keep = ts >= since_ts
+        data = {"ts": ts[keep]}
+        for name, col in self.columns.items():
+            dtype = np.float64 if col.typecode == "d" else np.float32
+            data[name] = np.frombuffer(col, dtype=dtype)[order][keep]
+        return data
+
+
+def encode_npz(data: dict) -> bytes:
+    """Spalten als komprimiertes .npz (blockierend, für den Executor)."""
+    import numpy as np
+
+    buf = io.BytesIO()
+    np.savez_compressed(buf, **data)
+    return buf.getvalue()
@@ -0,0 +1,5 @@
+"""Repository-Wurzel importierbar machen (custom_components.wasser_residuum)."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,116 @@
+"""Speicherbudget des Controllers: feste Ringpuffer, kein Wachstum zwischen Ticks."""
+from __future__ import annotations
+
+import asyncio
+import gc
+import itertools
+import tracemalloc
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.wasser_residuum import WasserResiduumController
+from custom_components.wasser_residuum.const import DEFAULT_TICK_RING_ROWS
+from custom_components.wasser_residuum.replay import (
+    CHANNEL_TEMP,
+    CHANNEL_TOTAL,
+    ReplayClock,
+    ReplayEntry,
+    create_controller,
+    feed,
+    synthetic_samples,
+)
+from custom_components.wasser_residuum.trace import TICK_RING_COLUMNS, TICK_RING_FLOAT64
+
+INTERVAL_S = 16.0
+DAY_SAMPLES = int(86400 / INTERVAL_S)
+
+# Ganzer Controller nach einem Tag inkl. Fenster, Tick-Records und Kalman.
+# Eine wachsende Liste seit dem letzten Tick allein bräuchte pro Tag ~170 KiB.
+CONTROLLER_BUDGET_B = 64 * 1024
+# Zusätzlicher Speicher über zwei Urlaubstage ohne Hydrus-Tick
+IDLE_GROWTH_BUDGET_B = 4 * 1024
+# Diagnose-Ring: ts plus eine Spalte pro Wert, höchstens DEFAULT_TICK_RING_ROWS Zeilen
+TICK_RING_ROW_B = 8 + sum(8 if name in TICK_RING_FLOAT64 else 4 for name in TICK_RING_COLUMNS)
+
+
+def _traced() -> int:
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def _idle_samples(days: float, start_ts: float = 1_700_000_000.0):
+    """Kein Verbrauch: Rohr auf Umgebungstemperatur, Zählerstand konstant."""
+    for i in range(int(days * DAY_SAMPLES)):
+        ts = start_ts + (i + 1) * INTERVAL_S
+        yield ts, CHANNEL_TEMP, 16.0 + 0.01 * (i % 3)
+        yield ts, CHANNEL_TOTAL, 10_000.0
+
+
+def test_controller_memory_budget_one_day():
+    tracemalloc.start()
+    try:
+        base = _traced()
+        clock = ReplayClock()
+        ctrl = create_controller({}, "L", clock)
+        samples = synthetic_samples(hours=48.0, interval_s=INTERVAL_S, seed=3)
+        feed(ctrl, clock, itertools.islice(samples, 2 * DAY_SAMPLES))
+        after_day = _traced() - base
+        feed(ctrl, clock, samples)
+        after_two_days = _traced() - base
+    finally:
+        tracemalloc.stop()
+
+    assert ctrl.counters["events_processed"] > 0
+    assert after_day < CONTROLLER_BUDGET_B, after_day
+    assert after_two_days < CONTROLLER_BUDGET_B, after_two_days
+
+
+def test_no_growth_without_ticks():
+    tracemalloc.start()
+    try:
+        clock = ReplayClock()
+        ctrl = create_controller({}, "L", clock)
+        samples = _idle_samples(days=3.0)
+        # Erster Tag füllt die Fenster bis zur Kapazität
+        feed(ctrl, clock, itertools.islice(samples, 2 * DAY_SAMPLES))
+        before = _traced()
+        feed(ctrl, clock, samples)
+        growth = _traced() - before
+    finally:
+        tracemalloc.stop()
+
+    assert ctrl._temp_since_tick.count >= 2 * DAY_SAMPLES
+    assert growth < IDLE_GROWTH_BUDGET_B, growth
+
+
+def _feed_with_ring(tmp_path, interval_s: float) -> tuple[int, int]:
+    """Controller mit hass (Diagnose-Ring an) über zwei Tage; (Speicher, Ring-Zeilen)."""
+
+    async def run():
+        hass = HomeAssistant(str(tmp_path))
+        tracemalloc.start()
+        try:
+            base = _traced()
+            clock = ReplayClock()
+            ctrl = WasserResiduumController(hass, ReplayEntry({}, "L"), clock=clock)
+            feed(ctrl, clock, synthetic_samples(hours=48.0, interval_s=interval_s, seed=3))
+            used = _traced() - base
+        finally:
+            tracemalloc.stop()
+            await hass.async_stop(force=True)
+        return used, ctrl.tick_ring.rows
+
+    return asyncio.run(run())
+
+
+def test_controller_memory_budget_with_tick_ring(tmp_path):
+    used, rows = _feed_with_ring(tmp_path, INTERVAL_S)
+    assert rows == DEFAULT_TICK_RING_ROWS
+    assert used < CONTROLLER_BUDGET_B + DEFAULT_TICK_RING_ROWS * TICK_RING_ROW_B, used
+
+
+def test_tick_ring_follows_tick_rate(tmp_path):
+    # Ein Tick pro Minute: 1440 Zeilen decken 24 h, der Ring bleibt unter der Obergrenze
+    used, rows = _feed_with_ring(tmp_path, 60.0)
+    assert rows == 2048
+    assert used < CONTROLLER_BUDGET_B + rows * TICK_RING_ROW_B, used
@@ -0,0 +1,51 @@
+"""Publish-Policy der Entities: Attribut-Änderungen und Heartbeat ohne Updates."""
+from __future__ import annotations
+
+import asyncio
+import types
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.wasser_residuum import WasserResiduumController
+from custom_components.wasser_residuum.sensor import DiagHydrusTotal
+
+HEARTBEAT_S = 0.2
+
+
+def test_attribute_change_and_timer_heartbeat(tmp_path) -> None:
+    async def run() -> tuple[list, int]:
+        hass = HomeAssistant(str(tmp_path))
+        entry = types.SimpleNamespace(
+            entry_id="e",
+            options={"diag_publish_heartbeat": HEARTBEAT_S},
+            data={"temp_entity": "sensor.t", "total_entity": "sensor.v", "total_unit": "L", "name": "W"},
+        )
+        ctrl = WasserResiduumController(hass, entry)
+        entity = DiagHydrusTotal(ctrl, "W")
+        entity.hass = hass
+        entity.entity_id = "sensor.w_hydrus_total"
+        writes = []
+        entity.async_write_ha_state = lambda: writes.append(entity.extra_state_attributes)
+        await entity.async_added_to_hass()
+        await ctrl.async_start()
+
+        ctrl.process_total(1000.0)
+        ctrl.process_temperature(20.0)
+        await asyncio.sleep(0)
+        # Gleicher Zählerstand, aber thermisches Volumen/Residuum geändert
+        ctrl._volume_l = 1003.0
+        ctrl.notify_entities()
+        await asyncio.sleep(0)
+        attr_writes = list(writes)
+
+        await asyncio.sleep(HEARTBEAT_S * 2.5)
+        heartbeats = len(writes) - len(attr_writes)
+
+        await entity.async_will_remove_from_hass()
+        await ctrl.async_stop()
+        await hass.async_stop(force=True)
+        return attr_writes, heartbeats
+
+    attr_writes, heartbeats = asyncio.run(run())
+    assert attr_writes[-1]["residuum_l"] == 3.0
+    assert heartbeats >= 1